@@ -36,7 +36,8 @@ app_include_js = [
 	"/assets/leetrental/js/advanced_link_picker.js",
 	"/assets/leetrental/js/sidebar_toggle.js",
 	"/assets/leetrental/js/icons.js",
-	"/assets/leetrental/js/vehicle_listview.js"
+	"/assets/leetrental/js/vehicle_listview.js",
+	"/assets/leetrental/js/columnar.js"
 ]
 
 app_include_icons = "leetrental/icons/rental-icons.svg"
@@ -96,6 +97,12 @@ app_include_icons = "leetrental/icons/rental-icons.svg"
 # before_install = "leetrental.install.before_install"
 # after_install = "leetrental.install.after_install"
 
+# Build the vehicle search index once for fleets that predate it
+after_migrate = [
+    "leetrental.leetrental.api.vehicle_search.ensure_vehicle_search_index",
+    "leetrental.leetrental.api.customer_identity.ensure_customer_identity_index"
+]
+
 # Uninstallation
 # ------------
 
@@ -160,9 +167,94 @@ doc_events = {
         'update_odometer': [
             'leetrental.leetrental.doctype.vehicles.vehicles.update_odometer'   
             ],
+        'after_insert': [
+            'leetrental.leetrental.api.vehicles_kanban.bump_fleet_version'
+            ],
+        'on_update': [
+            'leetrental.leetrental.api.vehicles_kanban.record_status_change',
+            'leetrental.leetrental.api.vehicles_kanban.bump_fleet_version',
+            'leetrental.leetrental.api.vehicle_search.update_search_index'
+            ],
+        'on_trash': [
+            'leetrental.leetrental.api.vehicles_kanban.bump_fleet_version',
+            'leetrental.leetrental.api.vehicle_search.remove_from_search_index'
+            ],
+    },
+    'File': {
+        'after_insert': [
+            'leetrental.leetrental.api.vehicle_thumbnails.queue_thumbnail'
+            ],
+        'on_trash': [
+            'leetrental.leetrental.api.vehicle_thumbnails.clear_thumbnail'
+            ],
+    },
+    'Manufacturers': {
+        'on_update': [
+            'leetrental.leetrental.doctype.vehicles.catalog.clear_catalog_cache'
+            ],
+        'on_trash': [
+            'leetrental.leetrental.doctype.vehicles.catalog.clear_catalog_cache'
+            ],
+        'after_rename': [
+            'leetrental.leetrental.doctype.vehicles.catalog.clear_catalog_cache'
+            ],
+    },
+    'Vehicles Model': {
+        'on_update': [
+            'leetrental.leetrental.doctype.vehicles.catalog.clear_catalog_cache'
+            ],
+        'on_trash': [
+            'leetrental.leetrental.doctype.vehicles.catalog.clear_catalog_cache'
+            ],
+        'after_rename': [
+            'leetrental.leetrental.doctype.vehicles.catalog.clear_catalog_cache'
+            ],
+    },
+    'DocType': {
+        'on_update': [
+            'leetrental.leetrental.api.vehicle_schema.clear_on_doctype_change'
+            ],
+    },
+    'Custom Field': {
+        'on_update': [
+            'leetrental.leetrental.api.vehicle_schema.clear_on_customization_change'
+            ],
+        'on_trash': [
+            'leetrental.leetrental.api.vehicle_schema.clear_on_customization_change'
+            ],
+    },
+    'Property Setter': {
+        'on_update': [
+            'leetrental.leetrental.api.vehicle_schema.clear_on_customization_change'
+            ],
+        'on_trash': [
+            'leetrental.leetrental.api.vehicle_schema.clear_on_customization_change'
+            ],
+    },
+    'Workflow': {
+        'on_update': [
+            'leetrental.leetrental.api.vehicles_kanban.clear_on_workflow_change'
+            ],
+        'on_trash': [
+            'leetrental.leetrental.api.vehicles_kanban.clear_on_workflow_change'
+            ],
+    },
+    'Customer': {
+        'on_update': [
+            'leetrental.leetrental.api.customer_identity.update_identity_index'
+            ],
+        'on_trash': [
+            'leetrental.leetrental.api.customer_identity.remove_from_identity_index'
+            ],
     },
 };
 
+# Drop compiled caches on bench clear-cache
+clear_cache = [
+    'leetrental.leetrental.api.vehicle_schema.clear_vehicle_schema',
+    'leetrental.leetrental.api.vehicles_kanban.clear_transition_graph'
+]
+
 
 # Scheduled Tasks
 # ---------------
@@ -188,7 +280,8 @@ doc_events = {
 
 scheduler_events = {
     "daily": [
-      "leetrental.leetrental.doctype.contract_information.contract_information.asd"
+      "leetrental.leetrental.doctype.contract_information.contract_information.asd",
+      "leetrental.leetrental.doctype.id_scan_cache.id_scan_cache.purge_expired_scans"
     ],
 }
 
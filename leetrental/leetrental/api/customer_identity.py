@@ -0,0 +1,218 @@
+# leetrental/leetrental/api/customer_identity.py
+import re
+
+import frappe
+
+IDENTITY_INDEX_DOCTYPE = "Customer Identity Index"
+# Customer field -> document type stored in the fingerprint
+IDENTITY_FIELDS = {
+    "passport_number": "passport",
+    "license_number": "license",
+    "id_number": "id",
+}
+INDEX_BATCH_SIZE = 1000
+
+INDEX_COLUMNS = ["name", "customer", "document_type", "fingerprint", "creation", "modified", "owner", "modified_by"]
+
+_separators = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_document_number(value):
+    """
+    Uppercase and drop spaces, dashes and any other separators
+    """
+    return _separators.sub("", str(value or "")).upper()
+
+
+def get_fingerprints(values):
+    """
+    (document_type, fingerprint) for every document number in `values`,
+    fingerprint being type:NUMBER:date of birth (blank when unknown)
+    """
+    dob = ""
+    if values.get("date_of_birth"):
+        try:
+            dob = str(frappe.utils.getdate(values.get("date_of_birth")))
+        except Exception:
+            pass
+
+    fingerprints = []
+    for field, document_type in IDENTITY_FIELDS.items():
+        number = normalize_document_number(values.get(field))
+        if number:
+            fingerprints.append((document_type, f"{document_type}:{number}:{dob}"))
+    return fingerprints
+
+
+def get_index_rows(customer, values):
+    now = frappe.utils.now()
+    user = frappe.session.user
+    return [
+        (frappe.generate_hash(length=10), customer, document_type, fingerprint, now, now, user, user)
+        for document_type, fingerprint in get_fingerprints(values)
+    ]
+
+
+def insert_index_rows(rows):
+    if rows:
+        frappe.db.bulk_insert(IDENTITY_INDEX_DOCTYPE, INDEX_COLUMNS, rows, chunk_size=INDEX_BATCH_SIZE)
+
+
+def update_identity_index(doc, method=None):
+    """
+    Reindex a customer whose document numbers or date of birth changed
+    Hooked on Customer on_update (which also runs on insert)
+    """
+    fields = list(IDENTITY_FIELDS) + ["date_of_birth"]
+    previous = doc.get_doc_before_save()
+    if previous and all(previous.get(f) == doc.get(f) for f in fields):
+        return
+
+    frappe.db.delete(IDENTITY_INDEX_DOCTYPE, {"customer": doc.name})
+    insert_index_rows(get_index_rows(doc.name, doc.as_dict()))
+
+
+def remove_from_identity_index(doc, method=None):
+    """Hooked on Customer on_trash"""
+    frappe.db.delete(IDENTITY_INDEX_DOCTYPE, {"customer": doc.name})
+
+
+def find_customer_by_identity(values):
+    """
+    Name of the customer holding any of the document numbers in `values`
+    with the same date of birth, the most recently modified one if several
+    """
+    fingerprints = [fingerprint for _, fingerprint in get_fingerprints(values)]
+    if not fingerprints:
+        return None
+
+    match = frappe.db.sql("""
+        SELECT i.customer
+        FROM `tabCustomer Identity Index` i
+        JOIN `tabCustomer` c ON c.name = i.customer
+        WHERE i.fingerprint IN %(fingerprints)s
+        ORDER BY c.modified DESC
+        LIMIT 1
+    """, {"fingerprints": fingerprints})
+    return match[0][0] if match else None
+
+
+@frappe.whitelist()
+def rebuild_customer_identity_index():
+    """
+    Rebuild the whole identity index in a background job
+    """
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "leetrental.leetrental.api.customer_identity.build_customer_identity_index",
+        queue="long",
+        timeout=3600
+    )
+    return {"queued": True}
+
+
+def build_customer_identity_index():
+    """
+    Index every customer from scratch, in batches ordered by name
+    """
+    fields = ["name", "date_of_birth"] + list(IDENTITY_FIELDS)
+    frappe.db.delete(IDENTITY_INDEX_DOCTYPE)
+
+    last_name = ""
+    indexed = 0
+    while True:
+        customers = frappe.get_all(
+            "Customer",
+            fields=fields,
+            filters={"name": (">", last_name)},
+            order_by="name asc",
+            limit=INDEX_BATCH_SIZE
+        )
+        if not customers:
+            break
+
+        rows = []
+        for customer in customers:
+            rows += get_index_rows(customer.name, customer)
+        insert_index_rows(rows)
+        frappe.db.commit()
+
+        indexed += len(customers)
+        last_name = customers[-1].name
+
+    return indexed
+
+
+def ensure_customer_identity_index():
+    """
+    Hooked on after_migrate, builds the index once for existing customers
+    """
+    if frappe.db.count("Customer") and not frappe.db.count(IDENTITY_INDEX_DOCTYPE):
+        frappe.enqueue(
+            "leetrental.leetrental.api.customer_identity.build_customer_identity_index",
+            queue="long",
+            timeout=3600
+        )
+
+
+@frappe.whitelist()
+def get_duplicate_customers(limit=500):
+    """
+    Merge report: customers sharing a document number and date of birth
+
+    One entry per fingerprint, customers oldest first; the first is the
+    suggested record to keep and merge the others into (Rename with
+    "Merge with existing").
+    """
+    frappe.only_for("System Manager")
+
+    groups = frappe.db.sql("""
+        SELECT fingerprint, document_type, GROUP_CONCAT(DISTINCT customer SEPARATOR '\n') AS customers
+        FROM `tabCustomer Identity Index`
+        GROUP BY fingerprint, document_type
+        HAVING COUNT(DISTINCT customer) > 1
+        ORDER BY COUNT(DISTINCT customer) DESC, fingerprint
+        LIMIT %(limit)s
+    """, {"limit": frappe.utils.cint(limit) or 500}, as_dict=True)
+
+    names = {name for group in groups for name in group.customers.split("\n")}
+    details = {
+        c.name: c for c in frappe.get_all(
+            "Customer",
+            fields=["name", "customer_name", "creation", "modified"],
+            filters={"name": ("in", list(names))}
+        )
+    } if names else {}
+
+    report = []
+    for group in groups:
+        _, number, dob = group.fingerprint.split(":", 2)
+        customers = sorted(
+            (details[name] for name in group.customers.split("\n") if name in details),
+            key=lambda c: c.creation
+        )
+        report.append({
+            "document_type": group.document_type,
+            "document_number": number,
+            "date_of_birth": dob or None,
+            "keep": customers[0].name if customers else None,
+            "customers": customers,
+        })
+    return report
+
+
+def backfill_customer_identity_index():
+    """
+    One-off: index existing customers and print the duplicates found
+
+        bench --site <site> execute leetrental.leetrental.api.customer_identity.backfill_customer_identity_index
+    """
+    print(f"Indexed {build_customer_identity_index()} customers")
+
+    report = get_duplicate_customers(limit=10000)
+    print(f"{len(report)} document numbers shared by several customers")
+    for entry in report:
+        duplicates = ", ".join(c.name for c in entry["customers"][1:])
+        print(f"{entry['document_type']:<8} {entry['document_number']:<20} {entry['date_of_birth'] or '-':<10} "
+              f"keep {entry['keep']} <- {duplicates}")
+    return report
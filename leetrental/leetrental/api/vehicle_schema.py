@@ -0,0 +1,159 @@
+# leetrental/leetrental/api/vehicle_schema.py
+import frappe
+
+# Redis keys (frappe.cache() prefixes them with the site)
+SCHEMA_PLAN_KEY = "leetrental_vehicle_schema_plan"
+SCHEMA_VERSION_KEY = "leetrental_vehicle_schema_version"
+
+# Compiled plans kept in this worker, keyed by site
+_process_plans = {}
+
+STATUS_STYLES = {
+    "Available": "Success",
+    "Reserved": "Info",
+    "Out for Delivery": "Primary",
+    "Rented Out": "Warning",
+    "Due for Return": "Warning",
+    "Returned (Inspection)": "Info",
+    "At Garage": "default",
+    "Under Maintenance": "Warning",
+    "Accident/Repair": "Danger",
+    "Deactivated": "default"
+}
+
+# Card field -> alias, the first image field found wins
+KANBAN_OPTIONAL_FIELDS = {
+    "model": "model",
+    "driver": "driver",
+    "location": "location",
+    "last_odometer_value": "last_odometer_value",
+    "color": "color",
+    "model_year": "model_year",
+    "fuel_type": "fuel_type",
+    "tags": "tags",
+    "upload_photo": "image",
+    "image_5": "image"
+}
+
+
+def get_status_style(status):
+    """
+    Map vehicle status to visual style
+    """
+    return STATUS_STYLES.get(status, "default")
+
+
+def get_vehicle_schema():
+    """
+    Return the compiled Vehicles schema plan for the current site
+
+    The plan is built from the Vehicles meta once, stored in Redis and kept
+    in the worker process. A Redis version key tells workers when it changed.
+    """
+    cache = frappe.cache()
+    site = frappe.local.site
+    version = cache.get_value(SCHEMA_VERSION_KEY)
+
+    plan = _process_plans.get(site)
+    if version and plan and plan.version == version:
+        return plan
+
+    plan = version and cache.get_value(SCHEMA_PLAN_KEY)
+    if not plan or plan.version != version:
+        plan = build_vehicle_schema()
+        cache.set_value(SCHEMA_PLAN_KEY, plan)
+        cache.set_value(SCHEMA_VERSION_KEY, plan.version)
+
+    _process_plans[site] = plan
+    return plan
+
+
+def build_vehicle_schema():
+    """
+    Derive everything the fleet endpoints need from the Vehicles meta
+    """
+    vehicles_meta = frappe.get_meta("Vehicles")
+
+    available_fields = {field.fieldname for field in vehicles_meta.fields}
+    available_fields.add("name")  # Always available
+
+    # Use vehicle_status instead of workflow_state
+    status_field = None
+    if "vehicle_status" in available_fields:
+        status_field = "vehicle_status"
+    elif "workflow_state" in available_fields:
+        status_field = "workflow_state"
+
+    # Options are stored as newline-separated values
+    status_options = []
+    workflow_states = []
+    vehicle_status_field = vehicles_meta.get_field("vehicle_status")
+    if vehicle_status_field and vehicle_status_field.options:
+        for idx, option in enumerate(vehicle_status_field.options.split("\n")):
+            option = option.strip()
+            if option:  # Skip empty lines
+                status_options.append(option)
+                workflow_states.append({
+                    "name": option,
+                    "style": get_status_style(option),
+                    "idx": idx
+                })
+
+    # Fallback if no options found
+    if not workflow_states:
+        workflow_states = [{"name": "Available", "style": "default", "idx": 0}]
+
+    # Kanban card fields
+    fields_to_fetch = ["name", "license_plate", "chassis_number"]
+    if status_field:
+        fields_to_fetch.append(status_field)
+
+    image_field = None
+    for field, alias in KANBAN_OPTIONAL_FIELDS.items():
+        if field in available_fields:
+            if alias == "image" and not image_field:
+                image_field = field
+                fields_to_fetch.append(field)
+            elif alias != "image":
+                fields_to_fetch.append(field)
+
+    # Quick search fields
+    search_fields = [f for f in ("license_plate", "model", "chassis_number") if f in available_fields]
+    search_select_fields = ["name"] + search_fields
+    if status_field:
+        search_select_fields.append(status_field)
+    search_select_fields += [f for f in ("driver", "location") if f in available_fields]
+    if image_field:
+        search_select_fields.append(image_field)
+
+    return frappe._dict({
+        "version": frappe.generate_hash(length=10),
+        "available_fields": frozenset(available_fields),
+        "status_field": status_field,
+        "status_options": status_options,
+        "workflow_states": workflow_states,
+        "fields_to_fetch": fields_to_fetch,
+        "image_field": image_field,
+        "search_fields": search_fields,
+        "search_select_fields": search_select_fields
+    })
+
+
+def clear_vehicle_schema():
+    """
+    Drop the compiled plan everywhere, workers rebuild it on next use
+    """
+    frappe.cache().delete_value([SCHEMA_PLAN_KEY, SCHEMA_VERSION_KEY])
+    _process_plans.pop(getattr(frappe.local, "site", None), None)
+
+
+def clear_on_doctype_change(doc, method=None):
+    """Hooked on DocType on_update"""
+    if doc.name == "Vehicles":
+        clear_vehicle_schema()
+
+
+def clear_on_customization_change(doc, method=None):
+    """Hooked on Custom Field and Property Setter on_update / on_trash"""
+    if (doc.get("dt") or doc.get("doc_type")) == "Vehicles":
+        clear_vehicle_schema()
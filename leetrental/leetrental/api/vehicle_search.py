@@ -0,0 +1,199 @@
+# leetrental/leetrental/api/vehicle_search.py
+import re
+
+import frappe
+
+from leetrental.leetrental.api.vehicle_schema import get_vehicle_schema
+
+SEARCH_INDEX_DOCTYPE = "Vehicle Search Index"
+SEARCH_LIMIT = 20
+# Suffixes shorter than this are not stored; shorter queries match prefixes only
+MIN_INFIX_LENGTH = 3
+# Data fields are varchar(140)
+MAX_TOKEN_LENGTH = 140
+INDEX_BATCH_SIZE = 1000
+
+INDEX_COLUMNS = ["name", "vehicle", "source", "position", "token", "creation", "modified", "owner", "modified_by"]
+
+_separators = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_search_text(value):
+    """
+    Uppercase and drop spaces, dashes and any other separators
+    """
+    return _separators.sub("", str(value or "")).upper()
+
+
+def get_search_tokens(value):
+    """
+    Yield (position, token) for every indexed suffix of a value
+    Position 0 is the whole normalized value
+    """
+    value = normalize_search_text(value)
+    for position in range(len(value)):
+        token = value[position:]
+        if position and len(token) < MIN_INFIX_LENGTH:
+            break
+        yield position, token[:MAX_TOKEN_LENGTH]
+
+
+def get_index_rows(vehicle_name, values, search_fields):
+    """
+    Build Vehicle Search Index rows (in INDEX_COLUMNS order) for one vehicle
+    """
+    now = frappe.utils.now()
+    user = frappe.session.user
+    rows = []
+    for source in search_fields:
+        for position, token in get_search_tokens(values.get(source)):
+            rows.append([
+                frappe.generate_hash(length=12), vehicle_name, source, position, token,
+                now, now, user, user
+            ])
+    return rows
+
+
+def insert_index_rows(rows):
+    if rows:
+        frappe.db.bulk_insert(SEARCH_INDEX_DOCTYPE, INDEX_COLUMNS, rows)
+
+
+def update_search_index(doc, method=None):
+    """
+    Reindex a vehicle whose plate, VIN or model changed
+    Hooked on Vehicles on_update (which also runs on insert)
+    """
+    search_fields = get_vehicle_schema().search_fields
+    previous = doc.get_doc_before_save()
+    if previous and all(previous.get(f) == doc.get(f) for f in search_fields):
+        return
+
+    frappe.db.delete(SEARCH_INDEX_DOCTYPE, {"vehicle": doc.name})
+    insert_index_rows(get_index_rows(doc.name, doc.as_dict(), search_fields))
+
+
+def remove_from_search_index(doc, method=None):
+    """Hooked on Vehicles on_trash"""
+    frappe.db.delete(SEARCH_INDEX_DOCTYPE, {"vehicle": doc.name})
+
+
+def search_vehicle_index(query, filters=None, limit=SEARCH_LIMIT):
+    """
+    Find vehicles by plate, VIN or model through the search index
+
+    Ranked exact plate first, then plate prefix, then other prefixes,
+    then infix matches; most recently modified first within a rank.
+    Filters and Vehicles read permission apply as in the Kanban.
+    """
+    from leetrental.leetrental.api.vehicles_kanban import get_filter_conditions, get_permission_conditions
+
+    schema = get_vehicle_schema()
+    token = normalize_search_text(query)
+    if not token:
+        return []
+
+    # token only holds word characters, so it needs no LIKE escaping
+    values = {"token": token, "prefix": f"{token}%", "limit": limit}
+    conditions = ["idx.`token` LIKE %(prefix)s"]
+    if len(token) < MIN_INFIX_LENGTH:
+        conditions.append("idx.`position` = 0")
+
+    # Vehicles keeps its table name, the permission conditions refer to it
+    conditions += get_filter_conditions(filters, schema.available_fields, values, table="tabVehicles")
+    conditions += get_permission_conditions()
+
+    select_clause = ", ".join(f"`tabVehicles`.`{f}`" for f in schema.search_select_fields)
+
+    vehicles = frappe.db.sql(f"""
+        SELECT {select_clause},
+            MIN(CASE
+                WHEN idx.`position` = 0 AND idx.`source` = 'license_plate' AND idx.`token` = %(token)s THEN 0
+                WHEN idx.`position` = 0 AND idx.`source` = 'license_plate' THEN 1
+                WHEN idx.`position` = 0 THEN 2
+                ELSE 3
+            END) AS `search_rank`
+        FROM `tabVehicle Search Index` idx
+        INNER JOIN `tabVehicles` ON `tabVehicles`.`name` = idx.`vehicle`
+        WHERE {" AND ".join(conditions)}
+        GROUP BY `tabVehicles`.`name`
+        ORDER BY `search_rank`, `tabVehicles`.`modified` DESC
+        LIMIT %(limit)s
+    """, values, as_dict=True)
+
+    for vehicle in vehicles:
+        del vehicle["search_rank"]
+
+    return vehicles
+
+
+def reindex_vehicles(vehicle_names):
+    """
+    Rebuild the index rows of some vehicles after writes that skip on_update
+    """
+    if not vehicle_names:
+        return
+
+    search_fields = get_vehicle_schema().search_fields
+    for start in range(0, len(vehicle_names), INDEX_BATCH_SIZE):
+        names = vehicle_names[start:start + INDEX_BATCH_SIZE]
+        frappe.db.delete(SEARCH_INDEX_DOCTYPE, {"vehicle": ("in", names)})
+
+        rows = []
+        for vehicle in frappe.get_all("Vehicles", fields=["name"] + search_fields, filters={"name": ("in", names)}):
+            rows += get_index_rows(vehicle.name, vehicle, search_fields)
+        insert_index_rows(rows)
+
+
+@frappe.whitelist()
+def rebuild_vehicle_search_index():
+    """
+    Rebuild the whole search index in a background job
+    """
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "leetrental.leetrental.api.vehicle_search.build_vehicle_search_index",
+        queue="long",
+        timeout=3600
+    )
+    return {"queued": True}
+
+
+def build_vehicle_search_index():
+    """
+    Index every vehicle from scratch, in batches ordered by name
+    """
+    search_fields = get_vehicle_schema().search_fields
+    frappe.db.delete(SEARCH_INDEX_DOCTYPE)
+
+    last_name = ""
+    while True:
+        vehicles = frappe.get_all(
+            "Vehicles",
+            fields=["name"] + search_fields,
+            filters={"name": (">", last_name)},
+            order_by="name asc",
+            limit=INDEX_BATCH_SIZE
+        )
+        if not vehicles:
+            break
+
+        rows = []
+        for vehicle in vehicles:
+            rows += get_index_rows(vehicle.name, vehicle, search_fields)
+        insert_index_rows(rows)
+        frappe.db.commit()
+
+        last_name = vehicles[-1].name
+
+
+def ensure_vehicle_search_index():
+    """
+    Hooked on after_migrate, builds the index once for an existing fleet
+    """
+    if frappe.db.count("Vehicles") and not frappe.db.count(SEARCH_INDEX_DOCTYPE):
+        frappe.enqueue(
+            "leetrental.leetrental.api.vehicle_search.build_vehicle_search_index",
+            queue="long",
+            timeout=3600
+        )
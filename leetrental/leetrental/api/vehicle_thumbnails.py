@@ -0,0 +1,159 @@
+# leetrental/leetrental/api/vehicle_thumbnails.py
+import io
+import os
+import pickle
+
+import frappe
+
+# Redis hash of original file_url -> thumbnail url ("" when none can be made)
+THUMBNAIL_CACHE_KEY = "leetrental_vehicle_thumbnails"
+
+THUMBNAIL_SIZE = (320, 240)
+THUMBNAIL_QUALITY = 70
+THUMBNAIL_SUFFIX = "_thumb"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff", ".heic")
+
+
+def attach_thumbnails(vehicles):
+    """
+    Add a `thumbnail` URL to normalized Kanban and search vehicles
+
+    Thumbnails that do not exist yet are queued for generation, the card
+    falls back to the original image until the job has run.
+    """
+    thumbnails = get_thumbnail_urls({v["image"] for v in vehicles if v.get("image")})
+    for vehicle in vehicles:
+        vehicle["thumbnail"] = thumbnails.get(vehicle.get("image")) or None
+    return vehicles
+
+
+def get_thumbnail_urls(file_urls):
+    """
+    Map original file URLs to their thumbnail URLs
+    """
+    cache = frappe.cache()
+    file_urls = list(file_urls)
+    thumbnails = {}
+    missing = []
+    if not file_urls:
+        return thumbnails
+
+    # One round trip for the page; values are pickled as cache.hset stores them
+    cached = cache.hmget(cache.make_key(THUMBNAIL_CACHE_KEY), file_urls)
+    for file_url, thumbnail in zip(file_urls, cached):
+        if thumbnail is not None:
+            thumbnail = pickle.loads(thumbnail)
+        if thumbnail is None:
+            missing.append(file_url)
+        else:
+            thumbnails[file_url] = thumbnail
+
+    if not missing:
+        return thumbnails
+
+    files = frappe.get_all(
+        "File",
+        fields=["name", "file_url", "thumbnail_url"],
+        filters={"file_url": ("in", missing)}
+    )
+    for file in files:
+        if file.thumbnail_url:
+            thumbnails[file.file_url] = file.thumbnail_url
+            cache.hset(THUMBNAIL_CACHE_KEY, file.file_url, file.thumbnail_url)
+        else:
+            # Lazy backfill for photos uploaded before thumbnails existed
+            enqueue_thumbnail(file.name)
+
+    # External or unknown URLs have nothing to derive from
+    found = {file.file_url for file in files}
+    for file_url in missing:
+        if file_url not in found:
+            cache.hset(THUMBNAIL_CACHE_KEY, file_url, "")
+
+    return thumbnails
+
+
+def enqueue_thumbnail(file_name):
+    frappe.enqueue(
+        "leetrental.leetrental.api.vehicle_thumbnails.generate_thumbnail",
+        queue="short",
+        job_id=f"leetrental_vehicle_thumbnail::{file_name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        file_name=file_name
+    )
+
+
+def queue_thumbnail(doc, method=None):
+    """Hooked on File after_insert"""
+    if doc.attached_to_doctype == "Vehicles" and is_image(doc.file_url):
+        enqueue_thumbnail(doc.name)
+
+
+def clear_thumbnail(doc, method=None):
+    """
+    Hooked on File on_trash, the File itself removes the thumbnail on disk
+    """
+    if doc.attached_to_doctype == "Vehicles" and doc.file_url:
+        frappe.cache().hdel(THUMBNAIL_CACHE_KEY, doc.file_url)
+
+
+def is_image(file_url):
+    return bool(file_url) and file_url.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def get_local_path(file_url):
+    """
+    Site path of a /files or /private/files URL, None for remote files
+    """
+    if file_url.startswith("/private/files/"):
+        return frappe.get_site_path("private", "files", file_url[len("/private/files/"):])
+    if file_url.startswith("/files/"):
+        return frappe.get_site_path("public", "files", file_url[len("/files/"):])
+    return None
+
+
+def generate_thumbnail(file_name):
+    """
+    Write a fixed-size WebP derivative next to the File and store its URL
+    in File.thumbnail_url. Falls back to JPEG when Pillow has no WebP support.
+    """
+    from PIL import Image, ImageOps, features
+
+    file = frappe.get_doc("File", file_name)
+    path = get_local_path(file.file_url or "")
+    if not path or not os.path.exists(path) or not is_image(file.file_url):
+        frappe.cache().hset(THUMBNAIL_CACHE_KEY, file.file_url, "")
+        return
+
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(THUMBNAIL_SIZE)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+            if features.check("webp"):
+                extension, image_format = "webp", "WEBP"
+            else:
+                extension, image_format = "jpg", "JPEG"
+                image = image.convert("RGB")
+
+            output = io.BytesIO()
+            image.save(output, image_format, quality=THUMBNAIL_QUALITY, optimize=True)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "Vehicle Thumbnail Error")
+        frappe.cache().hset(THUMBNAIL_CACHE_KEY, file.file_url, "")
+        return
+
+    base_url = file.file_url.rsplit(".", 1)[0]
+    thumbnail_url = f"{base_url}{THUMBNAIL_SUFFIX}.{extension}"
+    with open(get_local_path(thumbnail_url), "wb") as f:
+        f.write(output.getvalue())
+
+    frappe.db.set_value("File", file.name, "thumbnail_url", thumbnail_url, update_modified=False)
+    frappe.cache().hset(THUMBNAIL_CACHE_KEY, file.file_url, thumbnail_url)
+
+    # Board ETags must change so clients pick up the thumbnail
+    from leetrental.leetrental.api.vehicles_kanban import bump_fleet_version
+    bump_fleet_version()
@@ -1,115 +1,123 @@
 # leetrental/leetrental/api/vehicles_kanban.py
 import frappe
 from frappe import _
+from frappe.model.db_query import DatabaseQuery
+from frappe.model.document import Document
+from frappe.model.workflow import get_workflow_name
+from frappe.realtime import get_doctype_room
+import base64
+import hashlib
 import json
 
+from leetrental.leetrental.api.vehicle_schema import get_status_style, get_vehicle_schema
+from leetrental.leetrental.api.vehicle_search import normalize_search_text, search_vehicle_index
+from leetrental.leetrental.api.vehicle_thumbnails import attach_thumbnails
+
+KANBAN_PAGE_LENGTH = 20
+KANBAN_MAX_PAGE_LENGTH = 200
+KANBAN_CHANGES_LIMIT = 500
+# get_kanban_changes re-reads this many seconds before the watermark, for
+# transactions that committed after a poll with an older `modified`
+KANBAN_CHANGES_OVERLAP = 10
+
+KANBAN_BULK_MOVE_LIMIT = 200
+# Document methods and doc_events that rule a doctype out of insert_documents_in_batches
+INSERT_HOOKS = (
+    "autoname", "before_naming", "before_validate", "validate", "before_insert",
+    "before_save", "after_insert", "on_update", "on_change"
+)
+KANBAN_COUNTS_TTL = 30
+KANBAN_COUNT_BREAKDOWNS = ("location", "fuel_type")
+
+# Realtime events published when vehicles change column
+KANBAN_MOVE_EVENT = "vehicle_kanban_move"
+KANBAN_BULK_MOVE_EVENT = "vehicle_kanban_bulk_move"
+# Redis hash of vehicle name -> column it left on its last status change
+KANBAN_PREVIOUS_STATE_KEY = "leetrental_kanban_previous_state"
+# Redis key of a token that changes on every Vehicles write
+FLEET_VERSION_KEY = "leetrental_fleet_version"
+# Redis hash of language -> compiled transition graph
+TRANSITION_GRAPH_KEY = "leetrental_vehicle_transition_graph"
+
+# Card fields every Kanban vehicle carries, even if Vehicles lacks them
+KANBAN_CARD_DEFAULTS = {
+    "model": None,
+    "driver": None,
+    "location": None,
+    "last_odometer_value": 0,
+    "color": None,
+    "model_year": None,
+    "fuel_type": None,
+    "tags": None
+}
+
+# Operators accepted in list-style Kanban filters, as frappe.get_all takes them
+FILTER_OPERATORS = ("=", "!=", "<", ">", "<=", ">=", "like", "not like", "in", "not in", "is")
+
+# format=columnar: fields sent once per response as value dictionaries
+COLUMNAR_FORMAT = "columnar"
+COLUMNAR_DICTIONARY_FIELDS = ("model", "location", "fuel_type", "color")
+
+# Moves that are never allowed, whatever the workflow says
+FORBIDDEN_TRANSITIONS = [
+    # Example: ("Available", "Accident/Repair"),  # Can't go directly to Accident/Repair
+]
+
+
 @frappe.whitelist()
-def get_kanban_data(filters=None):
+def get_kanban_data(filters=None, page_length=None, format=None, etag=None):
     """
     Fetch vehicles grouped by workflow state for Kanban view
+
+    Without page_length every vehicle is returned (legacy behaviour). With
+    page_length each column holds at most that many cards plus a keyset
+    cursor that can be passed to get_kanban_column for the next page.
+    Pass format=columnar for the compact encoding (see pack_columnar), and
+    etag (or an If-None-Match header) for a conditional response.
     """
     if filters and isinstance(filters, str):
         filters = json.loads(filters)
     
-    # Get workflow states from vehicle_status field options in Vehicles doctype
-    vehicles_meta = frappe.get_meta("Vehicles")
-    vehicle_status_field = vehicles_meta.get_field("vehicle_status")
-    
-    workflow_states = []
-    if vehicle_status_field and vehicle_status_field.options:
-        # Options are stored as newline-separated values
-        options_list = vehicle_status_field.options.split('\n')
-        for idx, option in enumerate(options_list):
-            option = option.strip()
-            if option:  # Skip empty lines
-                workflow_states.append({
-                    "name": option,
-                    "style": get_status_style(option),
-                    "idx": idx
-                })
+    frappe.has_permission("Vehicles", "read", throw=True)
     
-    # Fallback if no options found
-    if not workflow_states:
-        workflow_states = [{"name": "Available", "style": "default", "idx": 0}]
-    
-    # Get available fields
-    available_fields = {field.fieldname for field in vehicles_meta.fields}
-    available_fields.add("name")  # Always available
-    
-    # Build field list dynamically
-    base_fields = ["name", "license_plate", "chassis_number"]
-    
-    # Use vehicle_status instead of workflow_state
-    if "vehicle_status" in available_fields:
-        base_fields.append("vehicle_status")
-    elif "workflow_state" in available_fields:
-        base_fields.append("workflow_state")
-    
-    optional_fields = {
-        "model": "model",
-        "driver": "driver", 
-        "location": "location",
-        "last_odometer_value": "last_odometer_value",
-        "color": "color",
-        "model_year": "model_year",
-        "fuel_type": "fuel_type",
-        "tags": "tags",
-        "upload_photo": "image",
-        "image_5": "image"
-    }
+    client_etag = get_if_none_match(etag)
+    if client_etag is not None:
+        return conditional_response(
+            client_etag,
+            get_fleet_etag(filters, "get_kanban_data", page_length, format),
+            lambda: build_kanban_data(filters, page_length, format)
+        )
     
-    fields_to_fetch = base_fields.copy()
-    image_field = None
+    return build_kanban_data(filters, page_length, format)
+
+
+def build_kanban_data(filters, page_length, format):
+    workflow_states = get_kanban_states()
     
-    for field, alias in optional_fields.items():
-        if field in available_fields:
-            if alias == "image" and not image_field:
-                image_field = field
-                fields_to_fetch.append(field)
-            elif alias != "image":
-                fields_to_fetch.append(field)
+    if page_length:
+        kanban_data = get_kanban_page(workflow_states, filters, get_page_length(page_length))
+        return pack_kanban_columns(kanban_data) if format == COLUMNAR_FORMAT else kanban_data
+    
+    fields_to_fetch, image_field, available_fields, status_field = get_kanban_fields()
     
     # Build filters
-    query_filters = {}
-    if filters:
-        for key, value in filters.items():
-            if value and key in available_fields:
-                query_filters[key] = value
+    query_filters = [
+        ["Vehicles", key, operator, value]
+        for key, operator, value in iter_filters(filters)
+        if key in available_fields
+    ]
     
     # Get vehicles
     try:
-        vehicles = frappe.get_all(
+        vehicles = frappe.get_list(
             "Vehicles",
             fields=fields_to_fetch,
             filters=query_filters,
             order_by="modified desc"
         )
         
-        # Normalize data
-        for vehicle in vehicles:
-            # Handle image field
-            if image_field and image_field in vehicle:
-                vehicle["image"] = vehicle.get(image_field)
-                if image_field != "image":
-                    del vehicle[image_field]
-            else:
-                vehicle["image"] = None
-            
-            # Ensure all expected fields exist with defaults
-            vehicle.setdefault("model", None)
-            vehicle.setdefault("driver", None)
-            vehicle.setdefault("location", None)
-            vehicle.setdefault("last_odometer_value", 0)
-            vehicle.setdefault("color", None)
-            vehicle.setdefault("model_year", None)
-            vehicle.setdefault("fuel_type", None)
-            vehicle.setdefault("tags", None)
-            
-            # Normalize status field name
-            if "vehicle_status" in vehicle:
-                vehicle["workflow_state"] = vehicle.get("vehicle_status") or "Available"
-            else:
-                vehicle.setdefault("workflow_state", "Available")
+        normalize_kanban_vehicles(vehicles, image_field)
+        attach_thumbnails(vehicles)
         
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "Get Kanban Data Error")
@@ -139,26 +147,672 @@ def get_kanban_data(filters=None):
                 }
             kanban_data["Other"]["vehicles"].append(vehicle)
     
+    if format == COLUMNAR_FORMAT:
+        return pack_kanban_columns(kanban_data)
+    
     return kanban_data
 
 
-def get_status_style(status):
+@frappe.whitelist()
+def get_kanban_column(state, cursor=None, filters=None, page_length=None):
+    """
+    Fetch the next page of a single Kanban column
+
+    `cursor` is the opaque value returned with the previous page of the column.
+    """
+    if filters and isinstance(filters, str):
+        filters = json.loads(filters)
+    
+    frappe.has_permission("Vehicles", "read", throw=True)
+    
+    state_names = [s["name"] for s in get_kanban_states()]
+    vehicles, next_cursor = fetch_kanban_column(
+        state, state_names, filters, get_page_length(page_length), cursor
+    )
+    
+    return {
+        "state": state,
+        "vehicles": vehicles,
+        "cursor": next_cursor,
+        "has_more": bool(next_cursor)
+    }
+
+
+@frappe.whitelist()
+def get_kanban_changes(since=None, limit=None):
+    """
+    Return vehicles modified after the `since` watermark with their old and new column
+
+    Call without `since` to obtain a watermark for the current state of the
+    fleet. Every response carries the watermark to pass on the next call.
+    Each call looks KANBAN_CHANGES_OVERLAP seconds back, so a change that
+    committed late with an older `modified` is still delivered; rows the
+    watermark records as already sent are skipped. Deletions follow their
+    own position in the watermark (Deleted Document creation) the same way.
+    """
+    frappe.has_permission("Vehicles", "read", throw=True)
+    permission_conditions = get_permission_conditions()
+    
+    if not since:
+        # Rows inside the overlap window are already visible, count them as sent
+        latest = frappe.db.sql(f"""
+            SELECT `name`, `modified`
+            FROM `tabVehicles`
+            WHERE {" AND ".join(["1=1"] + permission_conditions)}
+            ORDER BY `modified` DESC, `name` DESC
+            LIMIT %(limit)s
+        """, {"limit": KANBAN_CHANGES_LIMIT}, as_dict=True)
+        last_modified = str(latest[0]["modified"]) if latest else frappe.utils.now()
+        deletions = frappe.get_all(
+            "Deleted Document",
+            fields=["name", "creation"],
+            filters={"deleted_doctype": "Vehicles"},
+            order_by="creation desc",
+            limit=KANBAN_CHANGES_LIMIT
+        )
+        last_deleted = str(deletions[0].creation) if deletions else frappe.utils.now()
+        return {
+            "watermark": encode_changes_watermark(
+                last_modified, [(v["name"], str(v["modified"])) for v in latest],
+                last_deleted, [(d.name, str(d.creation)) for d in deletions]
+            ),
+            "vehicles": [],
+            "deleted": [],
+            "has_more": False
+        }
+    
+    limit = frappe.utils.cint(limit) or KANBAN_CHANGES_LIMIT
+    limit = max(1, min(limit, KANBAN_CHANGES_LIMIT))
+    since_modified, sent, since_deleted, deleted_sent = decode_changes_watermark(since)
+    window_start = str(frappe.utils.add_to_date(since_modified, seconds=-KANBAN_CHANGES_OVERLAP))
+    
+    fields_to_fetch, image_field, available_fields, status_field = get_kanban_fields()
+    select_clause = ", ".join(f"`{f}`" for f in fields_to_fetch + ["modified"])
+    conditions = ["`modified` > %(window_start)s"] + permission_conditions
+    
+    rows = frappe.db.sql(f"""
+        SELECT {select_clause}
+        FROM `tabVehicles`
+        WHERE {" AND ".join(conditions)}
+        ORDER BY `modified` ASC, `name` ASC
+        LIMIT %(limit)s
+    """, {"window_start": window_start, "limit": limit + len(sent) + 1}, as_dict=True)
+    
+    vehicles = [v for v in rows if (v["name"], str(v["modified"])) not in sent]
+    has_more = len(vehicles) > limit
+    vehicles = vehicles[:limit]
+    
+    last_modified = max([since_modified] + [str(v["modified"]) for v in vehicles])
+    
+    state_names = {s["name"] for s in get_kanban_states()}
+    
+    normalize_kanban_vehicles(vehicles, image_field)
+    for vehicle in vehicles:
+        new_state = vehicle["workflow_state"]
+        vehicle["new_state"] = new_state if new_state in state_names else "Other"
+        
+        # Only report a different old column if the move happened inside the window
+        old_state = vehicle["new_state"]
+        change = frappe.cache().hget(KANBAN_PREVIOUS_STATE_KEY, vehicle["name"])
+        if change and change["modified"] > window_start:
+            old_state = change["state"] if change["state"] in state_names else "Other"
+        vehicle["old_state"] = old_state
+    
+    attach_thumbnails(vehicles)
+    
+    deleted_window_start = str(frappe.utils.add_to_date(since_deleted, seconds=-KANBAN_CHANGES_OVERLAP))
+    deletions = frappe.get_all(
+        "Deleted Document",
+        # Restricted users only hear about vehicles they could read
+        fields=["name", "creation", "deleted_name"] + (["data"] if permission_conditions else []),
+        filters={"deleted_doctype": "Vehicles", "creation": (">", deleted_window_start)},
+        order_by="creation asc, name asc",
+        limit=limit + len(deleted_sent) + 1
+    )
+    deletions = [d for d in deletions if (d.name, str(d.creation)) not in deleted_sent]
+    has_more = has_more or len(deletions) > limit
+    deletions = deletions[:limit]
+    last_deleted = max([since_deleted] + [str(d.creation) for d in deletions])
+    
+    watermark = encode_changes_watermark(
+        last_modified, list(sent) + [(v["name"], str(v["modified"])) for v in vehicles],
+        last_deleted, list(deleted_sent) + [(d.name, str(d.creation)) for d in deletions]
+    )
+    
+    return {
+        "watermark": watermark,
+        "vehicles": vehicles,
+        "deleted": [d.deleted_name for d in deletions if not permission_conditions or can_read_deleted_vehicle(d)],
+        "has_more": has_more
+    }
+
+
+def can_read_deleted_vehicle(deletion):
+    """
+    Whether the user could read a vehicle before it was deleted, judged on
+    the copy kept in its Deleted Document
+    """
+    try:
+        doc = frappe.get_doc(json.loads(deletion.data))
+    except Exception:
+        return False
+    return frappe.has_permission("Vehicles", "read", doc=doc)
+
+
+def encode_changes_watermark(modified, sent, deleted=None, deleted_sent=()):
+    """
+    Opaque get_kanban_changes position: the newest `modified` delivered and
+    the (name, modified) pairs already sent inside the overlap window, and
+    the same for deletions (Deleted Document name and creation)
+    """
+    def in_window(position, pairs):
+        window_start = str(frappe.utils.add_to_date(position, seconds=-KANBAN_CHANGES_OVERLAP))
+        return sorted({(name, m) for name, m in pairs if m > window_start})
+    
+    modified = str(modified)
+    deleted = str(deleted or modified)
+    raw = json.dumps({
+        "modified": modified,
+        "sent": in_window(modified, sent),
+        "deleted": deleted,
+        "deleted_sent": in_window(deleted, deleted_sent)
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_changes_watermark(watermark):
+    """
+    Inverse of encode_changes_watermark, returns (modified, set of (name, modified),
+    deleted, set of (Deleted Document name, creation))
+    Plain Kanban cursors from older clients are accepted too
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(watermark.encode()))
+    except Exception:
+        frappe.throw(_("Invalid Kanban watermark"))
+    
+    if isinstance(data, list):
+        modified, name = data
+        return modified, {(name, modified)}, modified, set()
+    return (
+        data["modified"],
+        {tuple(pair) for pair in data.get("sent") or []},
+        data.get("deleted") or data["modified"],
+        {tuple(pair) for pair in data.get("deleted_sent") or []}
+    )
+
+
+@frappe.whitelist()
+def get_kanban_counts(filters=None, breakdown=None):
+    """
+    Count vehicles per Kanban column with a single GROUP BY query
+
+    `breakdown` optionally lists fields (location, fuel_type) to sub-count
+    each column by. Results are cached briefly and keyed by the fleet
+    version, so any Vehicles write invalidates them.
+    """
+    if filters and isinstance(filters, str):
+        filters = json.loads(filters)
+    if breakdown and isinstance(breakdown, str):
+        breakdown = json.loads(breakdown) if breakdown.startswith("[") else breakdown.split(",")
+    
+    frappe.has_permission("Vehicles", "read", throw=True)
+    
+    available_fields, status_field = get_kanban_fields()[2:]
+    breakdown = [f for f in KANBAN_COUNT_BREAKDOWNS if f in (breakdown or []) and f in available_fields]
+    
+    # Permission conditions differ per user, so are the counts
+    cache_key = "leetrental_kanban_counts:{0}:{1}".format(
+        get_fleet_version(),
+        hashlib.md5(json.dumps([filters, breakdown, frappe.session.user], sort_keys=True, default=str).encode()).hexdigest()
+    )
+    counts = frappe.cache().get_value(cache_key)
+    if counts is not None:
+        return counts
+    
+    values = {}
+    conditions = ["1=1"] + get_filter_conditions(filters, available_fields, values) + get_permission_conditions()
+    group_fields = ([status_field] if status_field else []) + breakdown
+    select_clause = "".join(f"`{f}`, " for f in group_fields)
+    group_clause = f"GROUP BY {', '.join(f'`{f}`' for f in group_fields)}" if group_fields else ""
+    
+    rows = frappe.db.sql(f"""
+        SELECT {select_clause}COUNT(*) AS `count`
+        FROM `tabVehicles`
+        WHERE {" AND ".join(conditions)}
+        {group_clause}
+    """, values, as_dict=True)
+    
+    state_names = [s["name"] for s in get_kanban_states()]
+    blank_state = "Available" if "Available" in state_names else "Other"
+    
+    columns = {}
+    for state in state_names:
+        columns[state] = {"count": 0}
+        for field in breakdown:
+            columns[state][field] = {}
+    
+    total = 0
+    for row in rows:
+        state = (row.get(status_field) if status_field else None) or blank_state
+        if state not in columns:
+            state = "Other"
+        if state not in columns:
+            columns[state] = {"count": 0}
+            for field in breakdown:
+                columns[state][field] = {}
+        
+        columns[state]["count"] += row["count"]
+        total += row["count"]
+        for field in breakdown:
+            sub_counts = columns[state][field]
+            key = row.get(field) or ""
+            sub_counts[key] = sub_counts.get(key, 0) + row["count"]
+    
+    counts = {"columns": columns, "total": total}
+    frappe.cache().set_value(cache_key, counts, expires_in_sec=KANBAN_COUNTS_TTL)
+    return counts
+
+
+def get_fleet_version():
+    """
+    Token that changes on every Vehicles write
+    """
+    version = frappe.cache().get_value(FLEET_VERSION_KEY)
+    if not version:
+        version = bump_fleet_version()
+    return version
+
+
+def get_fleet_etag(filters, *params):
+    """
+    Version token for a fleet response under the given filters
+
+    Combines one aggregate over Vehicles (MAX(modified) catches edits made
+    without hooks, COUNT(*) catches deletes) with the Redis fleet version,
+    the request parameters, user and language.
+    """
+    available_fields = get_kanban_fields()[2]
+    values = {}
+    conditions = ["1=1"] + get_filter_conditions(filters, available_fields, values) + get_permission_conditions()
+    
+    last_modified, count = frappe.db.sql(f"""
+        SELECT MAX(`modified`), COUNT(*)
+        FROM `tabVehicles`
+        WHERE {" AND ".join(conditions)}
+    """, values)[0]
+    
+    key = json.dumps([
+        get_fleet_version(), get_vehicle_schema().version, last_modified, count,
+        filters, params, frappe.session.user, frappe.local.lang
+    ], sort_keys=True, default=str)
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def get_if_none_match(etag=None):
+    """
+    ETag the client already holds, from the etag argument or If-None-Match
+    Returns None when the client did not ask for a conditional response
+    """
+    if etag is None:
+        request = getattr(frappe.local, "request", None)
+        etag = request and request.headers.get("If-None-Match")
+        if not etag:
+            return None
+    
+    return etag.strip().removeprefix("W/").strip('"')
+
+
+def conditional_response(client_etag, etag, build):
+    """
+    {"etag", "unchanged": True} when the client is up to date, otherwise
+    {"etag", "unchanged": False, "data": build()}
+    """
+    response_headers = getattr(frappe.local, "response_headers", None)
+    if response_headers is not None:
+        response_headers["ETag"] = f'"{etag}"'
+    
+    if client_etag == etag:
+        return {"etag": etag, "unchanged": True}
+    
+    return {"etag": etag, "unchanged": False, "data": build()}
+
+
+def bump_fleet_version(doc=None, method=None):
+    """
+    Hooked on Vehicles after_insert / on_update / on_trash
+    """
+    version = frappe.generate_hash(length=10)
+    frappe.cache().set_value(FLEET_VERSION_KEY, version)
+    return version
+
+
+def record_status_change(doc, method=None):
+    """
+    Remember the column a vehicle left so get_kanban_changes can report it
+    Hooked on Vehicles on_update
+    """
+    status_field = get_kanban_fields()[3]
+    previous = doc.get_doc_before_save()
+    if not status_field or not previous:
+        return
+    
+    old_state = previous.get(status_field) or "Available"
+    new_state = doc.get(status_field) or "Available"
+    if old_state != new_state:
+        remember_previous_state(doc.name, old_state, doc.modified)
+
+
+def remember_previous_state(vehicle_name, old_state, modified):
+    frappe.cache().hset(KANBAN_PREVIOUS_STATE_KEY, vehicle_name, {
+        "state": old_state,
+        "modified": str(modified)
+    })
+
+
+def publish_vehicle_move(vehicle_name, from_state, to_state, modified):
+    """
+    Tell open Kanban boards that a single card changed column
+    Only users subscribed to the Vehicles doctype room (which requires read
+    permission) receive it
+    """
+    frappe.publish_realtime(KANBAN_MOVE_EVENT, {
+        "vehicle": vehicle_name,
+        "from_state": from_state,
+        "to_state": to_state,
+        "modified": str(modified)
+    }, room=get_doctype_room("Vehicles"))
+
+
+def get_kanban_states():
+    """
+    Get Kanban columns from vehicle_status field options in Vehicles doctype
+    """
+    return get_vehicle_schema().workflow_states
+
+
+def get_kanban_fields():
+    """
+    Work out which Vehicles columns the Kanban cards can be built from
+    Returns (fields_to_fetch, image_field, available_fields, status_field)
+    """
+    schema = get_vehicle_schema()
+    return list(schema.fields_to_fetch), schema.image_field, schema.available_fields, schema.status_field
+
+
+def normalize_kanban_vehicles(vehicles, image_field):
+    """
+    Give fetched Vehicles rows the shape the Kanban cards expect
+
+    Rows of one query share their keys, so the missing card fields are
+    worked out from the first row and merged into every row at once.
+    """
+    if not vehicles:
+        return vehicles
+    
+    first = vehicles[0]
+    has_image = bool(image_field) and image_field in first
+    missing = {field: default for field, default in KANBAN_CARD_DEFAULTS.items() if field not in first}
+    if not has_image:
+        missing["image"] = None
+    status_key = "vehicle_status" if "vehicle_status" in first else "workflow_state"
+    
+    for vehicle in vehicles:
+        if has_image and image_field != "image":
+            vehicle["image"] = vehicle.pop(image_field)
+        if missing:
+            vehicle.update(missing)
+        # Normalize status field name, blank statuses sit in Available
+        vehicle["workflow_state"] = vehicle.get(status_key) or "Available"
+    
+    return vehicles
+
+
+def pack_columnar(row_groups):
+    """
+    Encode lists of same-shaped dicts as one field header plus row lists
+
+    Values of COLUMNAR_DICTIONARY_FIELDS are replaced by their index in a
+    per-field dictionary shared by all groups; None stays None.
+    Returns (fields, dictionaries, packed_groups).
+    """
+    fields = []
+    for rows in row_groups:
+        if rows:
+            fields = list(rows[0])
+            break
+    
+    dictionaries = {f: [] for f in COLUMNAR_DICTIONARY_FIELDS if f in fields}
+    positions = {f: {} for f in dictionaries}
+    
+    packed_groups = []
+    for rows in row_groups:
+        packed = []
+        for row in rows:
+            values = [row.get(f) for f in fields]
+            for idx, field in enumerate(fields):
+                if field in positions and values[idx] is not None:
+                    value = values[idx]
+                    position = positions[field].get(value)
+                    if position is None:
+                        position = positions[field][value] = len(dictionaries[field])
+                        dictionaries[field].append(value)
+                    values[idx] = position
+            packed.append(values)
+        packed_groups.append(packed)
+    
+    return fields, dictionaries, packed_groups
+
+
+def pack_kanban_columns(kanban_data):
     """
-    Map vehicle status to visual style
+    Columnar form of a Kanban board, decoded by leetrental.columnar.decode
     """
-    style_map = {
-        "Available": "Success",
-        "Reserved": "Info",
-        "Out for Delivery": "Primary",
-        "Rented Out": "Warning",
-        "Due for Return": "Warning",
-        "Returned (Inspection)": "Info",
-        "At Garage": "default",
-        "Under Maintenance": "Warning",
-        "Accident/Repair": "Danger",
-        "Deactivated": "default"
+    fields, dictionaries, packed = pack_columnar([column["vehicles"] for column in kanban_data.values()])
+    for column, rows in zip(kanban_data.values(), packed):
+        column["vehicles"] = rows
+    
+    return {
+        "format": COLUMNAR_FORMAT,
+        "fields": fields,
+        "dictionaries": dictionaries,
+        "columns": kanban_data
     }
-    return style_map.get(status, "default")
+
+
+def get_page_length(page_length):
+    """
+    Clamp a client supplied page length to a sane range
+    """
+    page_length = frappe.utils.cint(page_length) or KANBAN_PAGE_LENGTH
+    return max(1, min(page_length, KANBAN_MAX_PAGE_LENGTH))
+
+
+def get_kanban_page(workflow_states, filters, page_length):
+    """
+    Build the first page of every Kanban column, one bounded query per column
+    """
+    state_names = [s["name"] for s in workflow_states]
+    
+    kanban_data = {}
+    for state in workflow_states:
+        vehicles, cursor = fetch_kanban_column(state["name"], state_names, filters, page_length)
+        kanban_data[state["name"]] = {
+            "label": state["name"],
+            "style": state.get("style", "default"),
+            "vehicles": vehicles,
+            "cursor": cursor,
+            "has_more": bool(cursor)
+        }
+    
+    # Vehicles whose status is not one of the options
+    vehicles, cursor = fetch_kanban_column("Other", state_names, filters, page_length)
+    if vehicles:
+        kanban_data["Other"] = {
+            "label": "Other",
+            "style": "default",
+            "vehicles": vehicles,
+            "cursor": cursor,
+            "has_more": bool(cursor)
+        }
+    
+    return kanban_data
+
+
+def fetch_kanban_column(state, state_names, filters, page_length, cursor=None):
+    """
+    Fetch one page of a Kanban column ordered by (modified, name) descending
+    Returns (vehicles, next_cursor); next_cursor is None on the last page
+    """
+    fields_to_fetch, image_field, available_fields, status_field = get_kanban_fields()
+    
+    conditions = []
+    values = {"page_length": page_length + 1}
+    
+    # Vehicles without a status are shown under Available (or Other if there is none)
+    blank_state = "Available" if "Available" in state_names else "Other"
+    
+    if not status_field:
+        conditions.append("1=1" if state == blank_state else "1=0")
+    elif state == "Other":
+        status_condition = f"`{status_field}` NOT IN %(state_names)s"
+        values["state_names"] = tuple(state_names) or ("",)
+        if blank_state != "Other":
+            status_condition = f"(IFNULL(`{status_field}`, '') != '' AND {status_condition})"
+        conditions.append(status_condition)
+    else:
+        values["state"] = state
+        if state == blank_state:
+            conditions.append(f"(`{status_field}` = %(state)s OR IFNULL(`{status_field}`, '') = '')")
+        else:
+            conditions.append(f"`{status_field}` = %(state)s")
+    
+    conditions += get_filter_conditions(filters, available_fields, values)
+    conditions += get_permission_conditions()
+    
+    if cursor:
+        values["cursor_modified"], values["cursor_name"] = decode_kanban_cursor(cursor)
+        conditions.append(
+            "(`modified` < %(cursor_modified)s"
+            " OR (`modified` = %(cursor_modified)s AND `name` < %(cursor_name)s))"
+        )
+    
+    select_clause = ", ".join(f"`{f}`" for f in fields_to_fetch + ["modified"])
+    
+    try:
+        vehicles = frappe.db.sql(f"""
+            SELECT {select_clause}
+            FROM `tabVehicles`
+            WHERE {" AND ".join(conditions)}
+            ORDER BY `modified` DESC, `name` DESC
+            LIMIT %(page_length)s
+        """, values, as_dict=True)
+    except Exception as e:
+        frappe.log_error(frappe.get_traceback(), "Get Kanban Column Error")
+        return [], None
+    
+    next_cursor = None
+    if len(vehicles) > page_length:
+        vehicles = vehicles[:page_length]
+        next_cursor = encode_kanban_cursor(vehicles[-1])
+    
+    normalize_kanban_vehicles(vehicles, image_field)
+    attach_thumbnails(vehicles)
+    
+    return vehicles, next_cursor
+
+
+def iter_filters(filters):
+    """
+    Yield (field, operator, value) for Kanban filters given like
+    frappe.get_all takes them: {field: value}, {field: [operator, value]}
+    or a list of [field, operator, value] (optionally led by the doctype).
+    Plain {field: value} pairs with an empty value are skipped.
+    """
+    if isinstance(filters, dict):
+        items = [
+            [key] + list(value) if isinstance(value, (list, tuple)) else [key, "=", value]
+            for key, value in filters.items()
+        ]
+    else:
+        items = [list(f[1:]) if len(f) == 4 else list(f) for f in filters or []]
+    
+    for item in items:
+        if len(item) == 2:
+            item.append(None)
+        if len(item) != 3:
+            frappe.throw(_("Invalid Kanban filter: {0}").format(item))
+        
+        key, operator, value = item
+        operator = str(operator).strip().lower()
+        if operator not in FILTER_OPERATORS:
+            frappe.throw(_("Unsupported Kanban filter operator: {0}").format(operator))
+        if operator == "=" and not value:
+            continue
+        yield key, operator, value
+
+
+def get_filter_conditions(filters, available_fields, values, table=None):
+    """
+    SQL conditions for the Kanban filters on known Vehicles fields
+    Adds the parameters to `values`; pass `table` to qualify the columns
+    in queries that join other tables
+    """
+    conditions = []
+    for idx, (key, operator, value) in enumerate(iter_filters(filters)):
+        if key not in available_fields:
+            continue
+        
+        column = f"`{table}`.`{key}`" if table else f"`{key}`"
+        param = f"filter_{idx}"
+        if operator == "is":
+            # "set" / "not set", blank strings count as not set
+            comparison = "!=" if value == "set" else "="
+            conditions.append(f"IFNULL({column}, '') {comparison} ''")
+        elif operator in ("in", "not in"):
+            if isinstance(value, str):
+                value = [v.strip() for v in value.split(",")]
+            value = tuple(value or ())
+            if not value:
+                conditions.append("1=0" if operator == "in" else "1=1")
+                continue
+            conditions.append(f"{column} {operator.upper()} %({param})s")
+            values[param] = value
+        else:
+            conditions.append(f"{column} {operator.upper()} %({param})s")
+            values[param] = value
+    return conditions
+
+
+def get_permission_conditions():
+    """
+    Vehicles read permission as SQL conditions: user permissions, owner
+    rules and permission query conditions, as frappe.get_list applies them
+    Throws if the user cannot read Vehicles at all
+    """
+    frappe.has_permission("Vehicles", "read", throw=True)
+    condition = DatabaseQuery("Vehicles").build_match_conditions()
+    # The conditions go into queries with named parameters
+    return [f"({condition.replace('%', '%%')})"] if condition else []
+
+
+def encode_kanban_cursor(vehicle):
+    """
+    Opaque keyset cursor pointing just after the given row
+    """
+    raw = json.dumps([str(vehicle["modified"]), vehicle["name"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_kanban_cursor(cursor):
+    """
+    Inverse of encode_kanban_cursor, returns (modified, name)
+    """
+    try:
+        modified, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        frappe.throw(_("Invalid Kanban cursor"))
+    return modified, name
 
 
 def get_vehicle_status_options():
@@ -166,14 +820,7 @@ def get_vehicle_status_options():
     Get the vehicle_status field options from Vehicles doctype
     Returns a list of status options
     """
-    vehicles_meta = frappe.get_meta("Vehicles")
-    vehicle_status_field = vehicles_meta.get_field("vehicle_status")
-    
-    if vehicle_status_field and vehicle_status_field.options:
-        options_list = [opt.strip() for opt in vehicle_status_field.options.split('\n') if opt.strip()]
-        return options_list
-    
-    return []
+    return get_vehicle_schema().status_options
 
 
 @frappe.whitelist()
@@ -183,15 +830,8 @@ def move_vehicle(vehicle_name, from_state, to_state):
     Returns required fields for the transition
     """
     try:
-        # Get the vehicle document
-        vehicle = frappe.get_doc("Vehicles", vehicle_name)
-        
-        # Determine which field contains the status
-        vehicles_meta = frappe.get_meta("Vehicles")
-        status_field = "vehicle_status" if "vehicle_status" in [f.fieldname for f in vehicles_meta.fields] else "workflow_state"
-        
-        # Get current status from the vehicle
-        current_status = getattr(vehicle, status_field, None)
+        # Only the status is needed, not the whole document
+        current_status = get_current_status(vehicle_name)
         
         # Validate that from_state matches current status
         if current_status != from_state:
@@ -201,7 +841,7 @@ def move_vehicle(vehicle_name, from_state, to_state):
             }
         
         # Validate transition is allowed
-        allowed = validate_transition(vehicle, from_state, to_state)
+        allowed = validate_transition(vehicle_name, from_state, to_state)
         if not allowed["valid"]:
             return {
                 "success": False,
@@ -232,113 +872,50 @@ def move_vehicle(vehicle_name, from_state, to_state):
 def complete_vehicle_move(vehicle_name, from_state, to_state, form_data=None):
     """
     Complete the vehicle move and create necessary documents
+
+    The status is claimed with a conditional UPDATE, so when two users move
+    the same vehicle only the first one wins. The Vehicles document is never
+    loaded; only transitions with a form create a side-effect document.
     """
     if form_data and isinstance(form_data, str):
         form_data = json.loads(form_data)
     
+    # Statuses are written directly, so check permission on the doctype
+    frappe.has_permission("Vehicles", "write", throw=True)
+    
     try:
-        vehicle = frappe.get_doc("Vehicles", vehicle_name)
+        license_plate = frappe.db.get_value("Vehicles", vehicle_name, "license_plate")
+        if license_plate is None:
+            return {"success": False, "message": _("Vehicle {0} not found").format(vehicle_name)}
+        
+        allowed = validate_transition(vehicle_name, from_state, to_state)
+        if not allowed["valid"]:
+            return {"success": False, "message": allowed["message"]}
         
-        # Determine which field to update
-        vehicles_meta = frappe.get_meta("Vehicles")
-        status_field = "vehicle_status" if "vehicle_status" in [f.fieldname for f in vehicles_meta.fields] else "workflow_state"
+        modified = transition_vehicle_status(vehicle_name, from_state, to_state)
+        if not modified:
+            return {
+                "success": False,
+                "message": _("Vehicle status mismatch. Current status is {0}, but attempting to move from {1}").format(get_current_status(vehicle_name), from_state)
+            }
         
         # Create documents based on transition
         created_docs = []
-        
-        # Available -> Reserved: Create reservation
-        if from_state == "Available" and to_state == "Reserved":
-            if form_data:
-                reservation = create_car_reservation(vehicle, form_data)
-                created_docs.append({"doctype": "Car Reservations", "name": reservation.name})
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-        
-        # Reserved -> Out for Delivery: Update vehicle
-        elif from_state == "Reserved" and to_state == "Out for Delivery":
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-            created_docs.append({"doctype": "Vehicles", "name": vehicle.name})
-        
-        # Out for Delivery -> Rented Out OR Reserved -> Rented Out: Create movement record
-        elif to_state == "Rented Out":
-            if form_data:
-                movement = create_vehicle_movement(vehicle, form_data, "Out - Customer")
-                created_docs.append({"doctype": "Vehicle Movements", "name": movement.name})
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-        
-        # Rented Out -> Due for Return: Update vehicle
-        elif from_state == "Rented Out" and to_state == "Due for Return":
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-            created_docs.append({"doctype": "Vehicles", "name": vehicle.name})
-        
-        # Due for Return -> Returned (Inspection): Create return movement
-        elif from_state == "Due for Return" and to_state == "Returned (Inspection)":
-            if form_data:
-                movement = create_vehicle_movement(vehicle, form_data, "In - Customer")
-                created_docs.append({"doctype": "Vehicle Movements", "name": movement.name})
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-        
-        # Returned (Inspection) -> Available: Complete inspection
-        elif from_state == "Returned (Inspection)" and to_state == "Available":
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-            created_docs.append({"doctype": "Vehicles", "name": vehicle.name})
-        
-        # Returned (Inspection) -> At Garage OR Available -> At Garage: Move to garage
-        elif to_state == "At Garage":
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-            created_docs.append({"doctype": "Vehicles", "name": vehicle.name})
-        
-        # At Garage -> Under Maintenance: Create service record
-        elif from_state == "At Garage" and to_state == "Under Maintenance":
-            if form_data:
-                service = create_service_record(vehicle, form_data)
-                created_docs.append({"doctype": "Services", "name": service.name})
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-        
-        # At Garage -> Accident/Repair OR Rented Out -> Accident/Repair: Create accident record
-        elif to_state == "Accident/Repair":
-            if form_data:
-                accident = create_accident_record(vehicle, form_data)
-                created_docs.append({"doctype": "Vehicle Accidents", "name": accident.name})
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-        
-        # Under Maintenance -> Available OR Accident/Repair -> Available: Complete service
-        elif to_state == "Available" and from_state in ["Under Maintenance", "Accident/Repair"]:
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-            created_docs.append({"doctype": "Vehicles", "name": vehicle.name})
-        
-        # Any -> Deactivated: Deactivate vehicle
-        elif to_state == "Deactivated":
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-            created_docs.append({"doctype": "Vehicles", "name": vehicle.name})
-        
-        # Deactivated -> Available: Reactivate vehicle
-        elif from_state == "Deactivated" and to_state == "Available":
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-            created_docs.append({"doctype": "Vehicles", "name": vehicle.name})
-        
-        else:
-            # Default: just update state
-            setattr(vehicle, status_field, to_state)
-            vehicle.save(ignore_permissions=True)
-            created_docs.append({"doctype": "Vehicles", "name": vehicle.name})
+        values = get_transition_side_effect(from_state, to_state, vehicle_name, form_data or {})
+        if values is None:
+            created_docs.append({"doctype": "Vehicles", "name": vehicle_name})
+        elif form_data:
+            doc = frappe.get_doc(values).insert(ignore_permissions=True)
+            created_docs.append({"doctype": doc.doctype, "name": doc.name})
         
         frappe.db.commit()
+        bump_fleet_version()
+        remember_previous_state(vehicle_name, from_state, modified)
+        publish_vehicle_move(vehicle_name, from_state, to_state, modified)
         
         return {
             "success": True,
-            "message": _("Vehicle {0} moved to {1}").format(vehicle.license_plate or vehicle.name, to_state),
+            "message": _("Vehicle {0} moved to {1}").format(license_plate or vehicle_name, to_state),
             "created_docs": created_docs
         }
         
@@ -351,42 +928,302 @@ def complete_vehicle_move(vehicle_name, from_state, to_state, form_data=None):
         }
 
 
+def get_current_status(vehicle_name):
+    """
+    Kanban column of a vehicle, blank statuses sit in Available
+    """
+    status_field = get_vehicle_schema().status_field or "workflow_state"
+    return frappe.db.get_value("Vehicles", vehicle_name, status_field) or "Available"
+
+
+def transition_vehicle_status(vehicle_name, from_state, to_state):
+    """
+    Move one vehicle from from_state to to_state with a conditional UPDATE
+
+    Returns the new `modified` timestamp if this call made the change, or
+    None if the vehicle was not in from_state any more (someone else moved
+    it first). The row stays locked until the caller commits. The change is
+    recorded as a Version like a regular save would, but no document is
+    loaded and no Vehicles hooks run.
+    """
+    status_field = get_vehicle_schema().status_field or "workflow_state"
+    modified = frappe.utils.now()
+    
+    frappe.db.sql(f"""
+        UPDATE `tabVehicles`
+        SET `{status_field}` = %(to_state)s, `modified` = %(modified)s, `modified_by` = %(user)s
+        WHERE `name` = %(name)s
+            AND (`{status_field}` = %(from_state)s
+                OR (%(from_state)s = 'Available' AND IFNULL(`{status_field}`, '') = ''))
+    """, {
+        "name": vehicle_name,
+        "from_state": from_state,
+        "to_state": to_state,
+        "modified": modified,
+        "user": frappe.session.user
+    })
+    # Re-read instead of trusting the driver's row count: the row carries our
+    # timestamp only if this UPDATE matched it
+    applied = frappe.db.sql(f"""
+        SELECT COUNT(*)
+        FROM `tabVehicles`
+        WHERE `name` = %(name)s AND `modified` = %(modified)s AND `{status_field}` = %(to_state)s
+    """, {"name": vehicle_name, "modified": modified, "to_state": to_state})[0][0]
+    if not applied:
+        return None
+    
+    frappe.get_doc({
+        "doctype": "Version",
+        "ref_doctype": "Vehicles",
+        "docname": vehicle_name,
+        "data": frappe.as_json({
+            "changed": [[status_field, from_state, to_state]],
+            "added": [],
+            "removed": [],
+            "row_changed": []
+        })
+    }).insert(ignore_permissions=True)
+    
+    return modified
+
+
+@frappe.whitelist()
+def get_transition_matrix(with_forms=0):
+    """
+    Return every legal Kanban move in one call so the board can grey out
+    illegal drops. Pass with_forms=1 to include the per-move form schemas.
+    """
+    graph = get_transition_graph()
+    
+    return {
+        "states": graph.states,
+        "workflow": graph.workflow,
+        "allowed": graph.allowed,
+        "requires_input": {state: sorted(forms) for state, forms in graph.forms.items()},
+        "forms": graph.forms if frappe.utils.cint(with_forms) else None
+    }
+
+
+@frappe.whitelist()
+def complete_vehicle_moves_bulk(moves):
+    """
+    Complete many Kanban moves in a single transaction
+
+    `moves` is a list of {vehicle_name, from_state, to_state, form_data}.
+    Every move is validated up front, statuses are updated with one UPDATE
+    per (from_state, to_state) pair, Version rows and side-effect documents
+    are inserted in batches and everything is committed once. Transitions
+    with a form need each vehicle's own form_data; moves sharing one are
+    rejected. Returns a result per move.
+    """
+    if isinstance(moves, str):
+        moves = json.loads(moves)
+    moves = moves or []
+    
+    if len(moves) > KANBAN_BULK_MOVE_LIMIT:
+        frappe.throw(_("Cannot move more than {0} vehicles at once").format(KANBAN_BULK_MOVE_LIMIT))
+    
+    # Statuses are written directly, so check permission on the doctype
+    frappe.has_permission("Vehicles", "write", throw=True)
+    
+    status_field = get_vehicle_schema().status_field or "workflow_state"
+    results = [
+        {"vehicle": move.get("vehicle_name"), "success": False, "message": None, "created_docs": []}
+        for move in moves
+    ]
+    
+    try:
+        # Lock the rows so nobody else moves them until we commit
+        vehicle_names = tuple({move.get("vehicle_name") for move in moves if move.get("vehicle_name")})
+        vehicles = {}
+        if vehicle_names:
+            vehicles = {row.name: row for row in frappe.db.sql(f"""
+                SELECT `name`, `license_plate`, `{status_field}` AS status
+                FROM `tabVehicles`
+                WHERE `name` IN %(names)s
+                FOR UPDATE
+            """, {"names": vehicle_names}, as_dict=True)}
+        
+        status_updates = {}  # (from_state, to_state) -> [move index]
+        side_effects = {}  # doctype -> [(move index, values)]
+        seen = set()
+        
+        for move in moves:
+            if move.get("form_data") and isinstance(move["form_data"], str):
+                move["form_data"] = json.loads(move["form_data"])
+        shared_forms = get_shared_form_data(moves)
+        graph = get_transition_graph()
+        
+        for idx, move in enumerate(moves):
+            result = results[idx]
+            vehicle_name = move.get("vehicle_name")
+            from_state = move.get("from_state")
+            to_state = move.get("to_state")
+            form_data = move.get("form_data")
+            
+            vehicle = vehicles.get(vehicle_name)
+            if not vehicle:
+                result["message"] = _("Vehicle {0} not found").format(vehicle_name)
+                continue
+            
+            if vehicle_name in seen:
+                result["message"] = _("Vehicle {0} can only be moved once per batch").format(vehicle_name)
+                continue
+            seen.add(vehicle_name)
+            
+            # Blank statuses sit in Available, as for single moves
+            current_status = vehicle.status or "Available"
+            if current_status != from_state:
+                result["message"] = _("Vehicle status mismatch. Current status is {0}, but attempting to move from {1}").format(current_status, from_state)
+                continue
+            
+            allowed = validate_transition(vehicle, from_state, to_state)
+            if not allowed["valid"]:
+                result["message"] = allowed["message"]
+                continue
+            
+            form_fields = graph.forms.get(from_state, {}).get(to_state, [])
+            missing = [
+                field["label"] for field in form_fields
+                if field.get("reqd") and (form_data or {}).get(field["fieldname"]) in (None, "")
+            ]
+            if missing:
+                result["message"] = _("Vehicle {0} needs {1} for this move").format(vehicle_name, ", ".join(missing))
+                continue
+            if form_fields and idx in shared_forms:
+                result["message"] = _("Vehicle {0} needs its own details for a move from {1} to {2}").format(vehicle_name, from_state, to_state)
+                continue
+            
+            status_updates.setdefault((from_state, to_state), []).append(idx)
+            
+            values = form_data and get_transition_side_effect(from_state, to_state, vehicle_name, form_data)
+            if values:
+                side_effects.setdefault(values["doctype"], []).append((idx, values))
+        
+        now = frappe.utils.now()
+        for (from_state, to_state), indexes in status_updates.items():
+            frappe.db.sql(f"""
+                UPDATE `tabVehicles`
+                SET `{status_field}` = %(to_state)s, `modified` = %(modified)s, `modified_by` = %(user)s
+                WHERE `name` IN %(names)s
+                    AND (`{status_field}` = %(from_state)s
+                        OR (%(from_state)s = 'Available' AND IFNULL(`{status_field}`, '') = ''))
+            """, {
+                "to_state": to_state,
+                "from_state": from_state,
+                "modified": now,
+                "user": frappe.session.user,
+                "names": tuple(moves[idx]["vehicle_name"] for idx in indexes)
+            })
+            
+            for idx in indexes:
+                vehicle = vehicles[moves[idx]["vehicle_name"]]
+                results[idx]["success"] = True
+                results[idx]["message"] = _("Vehicle {0} moved to {1}").format(vehicle.license_plate or vehicle.name, to_state)
+        
+        insert_status_versions(status_field, [
+            (moves[idx]["vehicle_name"], from_state, to_state)
+            for (from_state, to_state), indexes in status_updates.items()
+            for idx in indexes
+        ], now)
+        
+        for doctype, items in side_effects.items():
+            names = insert_documents_in_batches(doctype, [values for idx, values in items])
+            for (idx, values), name in zip(items, names):
+                results[idx]["created_docs"].append({"doctype": doctype, "name": name})
+        
+        frappe.db.commit()
+        bump_fleet_version()
+        
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Bulk Vehicle Move Error")
+        for result in results:
+            if result["success"] or not result["message"]:
+                result.update({"success": False, "message": str(e), "created_docs": []})
+        return {"success": False, "message": str(e), "results": results}
+    
+    moved = [
+        {"vehicle": move["vehicle_name"], "from_state": move["from_state"], "to_state": move["to_state"]}
+        for move, result in zip(moves, results) if result["success"]
+    ]
+    for move in moved:
+        remember_previous_state(move["vehicle"], move["from_state"], now)
+    if moved:
+        frappe.publish_realtime(KANBAN_BULK_MOVE_EVENT, {"moves": moved}, room=get_doctype_room("Vehicles"))
+    
+    return {
+        "success": True,
+        "message": _("{0} of {1} vehicles moved").format(len(moved), len(moves)),
+        "results": results
+    }
+
+
 def validate_transition(vehicle, from_state, to_state):
     """
     Validate if the transition is allowed based on vehicle_status field options
     """
-    # Get available status options from vehicle_status field
-    available_statuses = get_vehicle_status_options()
+    graph = get_transition_graph()
     
-    if not available_statuses:
+    if not graph.states:
         return {"valid": True, "message": "No status options defined"}
     
+    error = get_transition_error(from_state, to_state, graph.state_set, graph.workflow_next)
+    if error:
+        return {"valid": False, "message": error}
+    
+    return {"valid": True, "message": "Transition allowed"}
+
+
+def get_transition_error(from_state, to_state, states, workflow_next):
+    """
+    Return why a move is not allowed, or None if it is
+    """
     # Check if both states exist in the options
-    if from_state not in available_statuses:
-        return {
-            "valid": False,
-            "message": _("Invalid current state: {0}").format(from_state)
-        }
+    if from_state not in states:
+        return _("Invalid current state: {0}").format(from_state)
     
-    if to_state not in available_statuses:
-        return {
-            "valid": False,
-            "message": _("Invalid target state: {0}").format(to_state)
-        }
+    if to_state not in states:
+        return _("Invalid target state: {0}").format(to_state)
     
-    # Optional: Define custom transition rules
-    # You can customize this based on your business logic
-    forbidden_transitions = [
-        # Example: ("Available", "Accident/Repair"),  # Can't go directly to Accident/Repair
-    ]
+    if (from_state, to_state) in FORBIDDEN_TRANSITIONS:
+        return _("Direct transition from {0} to {1} is not allowed").format(from_state, to_state)
     
-    if (from_state, to_state) in forbidden_transitions:
-        return {
-            "valid": False,
-            "message": _("Direct transition from {0} to {1} is not allowed").format(from_state, to_state)
-        }
+    # States without workflow transitions are unrestricted
+    next_states = workflow_next.get(from_state)
+    if next_states and to_state not in next_states:
+        return _("Transition from {0} to {1} is not allowed by workflow").format(from_state, to_state)
+    
+    return None
+
+
+def get_transition_graph():
+    """
+    Return the compiled transition graph for the current site and language
+
+    Rebuilt when the Vehicles schema plan changes or a Vehicles Workflow is saved.
+    """
+    schema_version = get_vehicle_schema().version
+    graph = frappe.cache().hget(TRANSITION_GRAPH_KEY, frappe.local.lang)
+    
+    if not graph or graph.schema_version != schema_version:
+        graph = build_transition_graph(schema_version)
+        frappe.cache().hset(TRANSITION_GRAPH_KEY, frappe.local.lang, graph)
     
-    # If using Workflow doctype as well (optional fallback)
+    return graph
+
+
+def build_transition_graph(schema_version):
+    """
+    Compile status options, the active Vehicles Workflow and the transition
+    forms into an adjacency table
+    """
+    states = get_vehicle_status_options()
+    state_set = frozenset(states)
+    
+    # Allowed next states per state from the Workflow doctype (optional)
+    workflow_name = None
+    workflow_next = {}
     try:
         workflow = frappe.get_all(
             "Workflow",
@@ -396,39 +1233,76 @@ def validate_transition(vehicle, from_state, to_state):
         )
         
         if workflow:
-            # Get allowed transitions from workflow
+            workflow_name = workflow[0].name
             transitions = frappe.get_all(
                 "Workflow Transition",
-                filters={
-                    "parent": workflow[0].name,
-                    "state": from_state
-                },
-                fields=["next_state", "action"]
+                filters={"parent": workflow_name},
+                fields=["state", "next_state"]
             )
-            
-            if transitions:
-                allowed_states = [t.next_state for t in transitions]
-                if to_state not in allowed_states:
-                    return {
-                        "valid": False,
-                        "message": _("Transition from {0} to {1} is not allowed by workflow").format(from_state, to_state)
-                    }
+            for transition in transitions:
+                workflow_next.setdefault(transition.state, set()).add(transition.next_state)
     except Exception as e:
         # If workflow check fails, continue with basic validation
         frappe.log_error(frappe.get_traceback(), "Workflow Validation Error")
     
-    return {"valid": True, "message": "Transition allowed"}
+    allowed = {}
+    for from_state in states:
+        allowed[from_state] = [
+            to_state for to_state in states
+            if to_state != from_state
+            and not get_transition_error(from_state, to_state, state_set, workflow_next)
+        ]
+    
+    forms = {}
+    for (from_state, to_state), fields in get_transition_forms().items():
+        forms.setdefault(from_state, {})[to_state] = fields
+    
+    return frappe._dict({
+        "schema_version": schema_version,
+        "states": states,
+        "state_set": state_set,
+        "workflow": workflow_name,
+        "workflow_next": workflow_next,
+        "allowed": allowed,
+        "forms": forms
+    })
+
+
+def clear_transition_graph():
+    """
+    Drop the compiled transition graph for all languages
+    """
+    frappe.cache().delete_value(TRANSITION_GRAPH_KEY)
+
+
+def clear_on_workflow_change(doc, method=None):
+    """Hooked on Workflow on_update / on_trash"""
+    if doc.document_type == "Vehicles":
+        clear_transition_graph()
 
 
 def get_required_fields_for_transition(from_state, to_state):
     """
     Return required fields based on the transition
     """
-    # Get all available status options from vehicle_status field
-    available_statuses = get_vehicle_status_options()
+    graph = get_transition_graph()
+    
+    # Validate that both states exist in vehicle_status options
+    if graph.states and (from_state not in graph.state_set or to_state not in graph.state_set):
+        frappe.log_error(
+            f"Invalid transition: {from_state} -> {to_state}. "
+            f"Available statuses: {', '.join(graph.states)}",
+            "Invalid Vehicle Status Transition"
+        )
     
-    # Define fields map based on actual vehicle statuses
-    fields_map = {
+    return graph.forms.get(from_state, {}).get(to_state, [])
+
+
+def get_transition_forms():
+    """
+    Form fields to collect for each (from_state, to_state) move
+    """
+    return {
         # Available -> Reserved: Create reservation
         ("Available", "Reserved"): [
             {"fieldname": "driver", "fieldtype": "Link", "options": "Customer", "label": _("Customer"), "reqd": 1},
@@ -559,43 +1433,25 @@ def get_required_fields_for_transition(from_state, to_state):
             {"fieldname": "inspection_completed", "fieldtype": "Check", "label": _("Inspection Completed"), "reqd": 1},
         ],
     }
-    
-    # Validate that both states exist in vehicle_status options
-    if available_statuses and (from_state not in available_statuses or to_state not in available_statuses):
-        frappe.log_error(
-            f"Invalid transition: {from_state} -> {to_state}. "
-            f"Available statuses: {', '.join(available_statuses)}",
-            "Invalid Vehicle Status Transition"
-        )
-    
-    return fields_map.get((from_state, to_state), [])
 
 
-def create_car_reservation(vehicle, data):
-    """
-    Create a Car Reservation document
-    """
-    reservation = frappe.get_doc({
+def get_car_reservation_values(vehicle_name, data):
+    return {
         "doctype": "Car Reservations",
-        "vehicle": vehicle.name,
+        "vehicle": vehicle_name,
         "driver": data.get("driver"),
         "start_time": data.get("start_time"),
         "end_time": data.get("end_time"),
         "pickup_location": data.get("pickup_location"),
         "drop_location": data.get("drop_location"),
         "workflow_state": "New"
-    })
-    reservation.insert(ignore_permissions=True)
-    return reservation
+    }
 
 
-def create_vehicle_movement(vehicle, data, movement_type):
-    """
-    Create a Vehicle Movement document
-    """
-    movement = frappe.get_doc({
+def get_vehicle_movement_values(vehicle_name, data, movement_type):
+    return {
         "doctype": "Vehicle Movements",
-        "vehicle": vehicle.name,
+        "vehicle": vehicle_name,
         "movement_type": movement_type,
         "agreement_no": data.get("agreement_no"),
         "out_customer": data.get("out_customer"),
@@ -604,18 +1460,13 @@ def create_vehicle_movement(vehicle, data, movement_type):
         "out_fuel_level": data.get("out_fuel_level") or data.get("return_fuel_level"),
         "out_from": data.get("out_from"),
         "date": frappe.utils.today()
-    })
-    movement.insert(ignore_permissions=True)
-    return movement
+    }
 
 
-def create_service_record(vehicle, data):
-    """
-    Create a Service document
-    """
-    service = frappe.get_doc({
+def get_service_record_values(vehicle_name, data):
+    return {
         "doctype": "Services",
-        "vehicle": vehicle.name,
+        "vehicle": vehicle_name,
         "service_type": data.get("service_type"),
         "description": data.get("description") or data.get("work_completed"),
         "date": data.get("date") or data.get("start_date") or frappe.utils.today(),
@@ -623,18 +1474,13 @@ def create_service_record(vehicle, data):
         "vendor": data.get("vendor"),
         "note": data.get("note"),
         "workflow_state": "To Do"
-    })
-    service.insert(ignore_permissions=True)
-    return service
+    }
 
 
-def create_accident_record(vehicle, data):
-    """
-    Create a Vehicle Accident/Damage record
-    """
-    accident = frappe.get_doc({
+def get_accident_record_values(vehicle_name, data):
+    return {
         "doctype": "Vehicle Accidents",  # Adjust doctype name if different
-        "vehicle": vehicle.name,
+        "vehicle": vehicle_name,
         "incident_date": data.get("incident_date"),
         "damage_description": data.get("damage_description"),
         "police_report": data.get("police_report"),
@@ -643,59 +1489,214 @@ def create_accident_record(vehicle, data):
         "repair_vendor": data.get("repair_vendor"),
         "customer_liable": data.get("customer_liable", 0),
         "status": "Reported"
-    })
-    accident.insert(ignore_permissions=True)
-    return accident
+    }
+
+
+def get_transition_side_effect(from_state, to_state, vehicle_name, data):
+    """
+    Return the values of the document a move creates, or None
+    Used by complete_vehicle_move and complete_vehicle_moves_bulk
+    """
+    if from_state == "Available" and to_state == "Reserved":
+        return get_car_reservation_values(vehicle_name, data)
+    elif to_state == "Rented Out":
+        return get_vehicle_movement_values(vehicle_name, data, "Out - Customer")
+    elif from_state == "Due for Return" and to_state == "Returned (Inspection)":
+        return get_vehicle_movement_values(vehicle_name, data, "In - Customer")
+    elif to_state == "At Garage":
+        return None
+    elif from_state == "At Garage" and to_state == "Under Maintenance":
+        return get_service_record_values(vehicle_name, data)
+    elif to_state == "Accident/Repair":
+        return get_accident_record_values(vehicle_name, data)
+    return None
+
+
+def get_shared_form_data(moves):
+    """
+    Indexes of moves whose form_data is identical to another move's of the
+    same transition, i.e. one form filled in for several vehicles
+    """
+    by_form = {}
+    for idx, move in enumerate(moves):
+        if move.get("form_data"):
+            key = (move.get("from_state"), move.get("to_state"), json.dumps(move["form_data"], sort_keys=True, default=str))
+            by_form.setdefault(key, []).append(idx)
+    return {idx for indexes in by_form.values() if len(indexes) > 1 for idx in indexes}
+
+
+def insert_status_versions(status_field, changes, modified):
+    """
+    Record (vehicle_name, from_state, to_state) status changes as Version
+    rows with one multi-row INSERT, as transition_vehicle_status does one by one
+    """
+    if not changes:
+        return
+    
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "Version",
+        ["name", "creation", "modified", "owner", "modified_by", "ref_doctype", "docname", "data"],
+        [
+            [
+                frappe.generate_hash(length=10), modified, modified, user, user, "Vehicles", vehicle_name,
+                frappe.as_json({
+                    "changed": [[status_field, from_state, to_state]],
+                    "added": [],
+                    "removed": [],
+                    "row_changed": []
+                })
+            ]
+            for vehicle_name, from_state, to_state in changes
+        ]
+    )
+
+
+def has_insert_hooks(doctype):
+    """
+    Whether inserting a `doctype` document runs anything beyond the row
+    write: controller methods, doc_events of this doctype or a workflow
+    Wildcard ("*") doc_events are not considered
+    """
+    controller = frappe.get_controller(doctype)
+    if any(getattr(controller, method, None) is not getattr(Document, method, None) for method in INSERT_HOOKS):
+        return True
+    
+    doc_events = frappe.get_hooks("doc_events").get(doctype) or {}
+    if any(doc_events.get(event) for event in INSERT_HOOKS):
+        return True
+    
+    return bool(get_workflow_name(doctype))
+
+
+def insert_documents_in_batches(doctype, rows):
+    """
+    Insert new documents of one doctype with multi-row INSERTs
+    Returns the new names in the order of `rows`
+
+    Only doctypes without insert logic (see has_insert_hooks) and named by
+    a plain PREFIX.##### series are written in batches; wildcard doc_events
+    (notifications, assignment rules) do not run for them. Any other
+    doctype falls back to a regular insert per document, controller hooks
+    included.
+    """
+    names = None if has_insert_hooks(doctype) else reserve_series_names(doctype, len(rows))
+    if names is None:
+        return [
+            frappe.get_doc(dict(values, doctype=doctype)).insert(ignore_permissions=True).name
+            for values in rows
+        ]
+    
+    now = frappe.utils.now()
+    user = frappe.session.user
+    meta = frappe.get_meta(doctype)
+    records = []
+    for name, values in zip(names, rows):
+        doc = frappe.new_doc(doctype)  # applies field defaults
+        doc.update(values)
+        doc.update({
+            "name": name,
+            "owner": user,
+            "modified_by": user,
+            "creation": now,
+            "modified": now
+        })
+        missing = [df.label or df.fieldname for df in meta.get("fields", {"reqd": 1}) if doc.get(df.fieldname) in (None, "")]
+        if missing:
+            frappe.throw(
+                _("{0}: value missing for {1}").format(_(doctype), ", ".join(missing)),
+                frappe.MandatoryError
+            )
+        records.append(doc.get_valid_dict(convert_dates_to_str=True))
+    
+    fields = list(records[0])
+    frappe.db.bulk_insert(doctype, fields, [[record.get(f) for f in fields] for record in records])
+    return names
+
+
+def reserve_series_names(doctype, count):
+    """
+    Reserve `count` consecutive names for a doctype autonamed PREFIX.#####
+    in one round trip. Returns None for any other naming rule.
+    """
+    autoname = frappe.get_meta(doctype).autoname or ""
+    prefix, dot, digits = autoname.rpartition(".")
+    if not prefix or set(digits) != {"#"} or "." in prefix or "{" in prefix or ":" in prefix:
+        return None
+    
+    # Same bookkeeping as frappe.model.naming.getseries, advanced by count
+    current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", (prefix,))
+    if current and current[0][0] is not None:
+        start = frappe.utils.cint(current[0][0]) + 1
+        frappe.db.sql("UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name` = %s", (count, prefix))
+    else:
+        start = 1
+        frappe.db.sql("INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)", (prefix, count))
+    
+    return [f"{prefix}{n:0{len(digits)}d}" for n in range(start, start + count)]
 
 
 @frappe.whitelist()
-def search_vehicles(query, filters=None):
+def search_vehicles(query, filters=None, format=None, etag=None):
     """
     Search vehicles for quick filtering in Kanban
+    Pass format=columnar for the compact encoding (see pack_columnar), and
+    etag (or an If-None-Match header) for a conditional response.
     """
     if filters and isinstance(filters, str):
         filters = json.loads(filters)
     
-    # Get available fields
-    vehicles_meta = frappe.get_meta("Vehicles")
-    available_fields = {field.fieldname for field in vehicles_meta.fields}
-    available_fields.add("name")
-    
-    # Build safe field list
-    select_fields = ["name"]
-    search_fields = []
-    
-    if "license_plate" in available_fields:
-        select_fields.append("license_plate")
-        search_fields.append("license_plate")
-    if "model" in available_fields:
-        select_fields.append("model")
-        search_fields.append("model")
-    if "chassis_number" in available_fields:
-        select_fields.append("chassis_number")
-        search_fields.append("chassis_number")
-    if "vehicle_status" in available_fields:
-        select_fields.append("vehicle_status")
-    elif "workflow_state" in available_fields:
-        select_fields.append("workflow_state")
-    if "driver" in available_fields:
-        select_fields.append("driver")
-    if "location" in available_fields:
-        select_fields.append("location")
-    
-    conditions = ["1=1"]
-    values = {}
+    frappe.has_permission("Vehicles", "read", throw=True)
+    
+    client_etag = get_if_none_match(etag)
+    if client_etag is not None:
+        return conditional_response(
+            client_etag,
+            get_fleet_etag(filters, "search_vehicles", query, format),
+            lambda: build_search_results(query, filters, format)
+        )
     
-    if query and search_fields:
-        search_conditions = [f"`{field}` LIKE %(query)s" for field in search_fields]
-        conditions.append(f"({' OR '.join(search_conditions)})")
-        values["query"] = f"%{query}%"
+    return build_search_results(query, filters, format)
+
+
+def build_search_results(query, filters, format):
+    vehicles = find_vehicles(query, filters)
+    # Search rows carry the card image and its thumbnail like Kanban cards
+    image_field = get_vehicle_schema().image_field
+    if image_field and image_field != "image":
+        for vehicle in vehicles:
+            vehicle["image"] = vehicle.pop(image_field, None)
+    attach_thumbnails(vehicles)
+    if format == COLUMNAR_FORMAT:
+        fields, dictionaries, packed = pack_columnar([vehicles])
+        return {
+            "format": COLUMNAR_FORMAT,
+            "fields": fields,
+            "dictionaries": dictionaries,
+            "rows": packed[0]
+        }
     
-    if filters:
-        for key, value in filters.items():
-            if key in available_fields and value:
-                conditions.append(f"`{key}` = %({key})s")
-                values[key] = value
+    return vehicles
+
+
+def find_vehicles(query, filters=None):
+    """
+    Rows for search_vehicles, the latest vehicles when there is no query
+    """
+    # Plate / VIN / model lookups go through the suffix token index
+    if normalize_search_text(query):
+        try:
+            return search_vehicle_index(query, filters)
+        except Exception as e:
+            frappe.log_error(frappe.get_traceback(), "Search Vehicles Error")
+            return []
+    
+    schema = get_vehicle_schema()
+    available_fields = schema.available_fields
+    select_fields = schema.search_select_fields
+    
+    values = {}
+    conditions = ["1=1"] + get_filter_conditions(filters, available_fields, values) + get_permission_conditions()
     
     where_clause = " AND ".join(conditions)
     select_clause = ", ".join([f"`{f}`" for f in select_fields])
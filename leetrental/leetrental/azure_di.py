@@ -1,64 +1,268 @@
-import os, re, json, time, requests
+import os, re, json, time, threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 import frappe
+from leetrental.leetrental import integration_client
 from frappe.utils.file_manager import get_file_path
+from leetrental.leetrental.doctype.id_scan_cache.id_scan_cache import get_cached_scan, get_source_hash, store_scan
+from leetrental.leetrental.scan_preprocess import PreparedScan
+from leetrental.leetrental.mrz import has_local_ocr, parse_mrz, read_mrz_text
+from leetrental.leetrental.api.customer_identity import find_customer_by_identity
 
 API_VERSION = "2024-11-30"
 MODEL_ID    = "prebuilt-idDocument"
-MODEL_READ  = "prebuilt-idDocument"
+MODEL_READ  = "prebuilt-read"
+LOCAL_MRZ_MODEL = "local-mrz"   # scan cache entries of the local OCR
+
+SCAN_ROLES = ("System Manager","Sales Manager","Sales User","Administrator")
+SCAN_EVENT = "id_scan_progress"
+SCAN_JOB_KEY = "leetrental_id_scan_job"   # + job id, last published state
+SCAN_JOB_TTL = 3600
+SCAN_BATCH_EVENT = "id_scan_batch_progress"   # per file of create_customers_from_scans
+BATCH_SCAN_LIMIT = 100
+DEFAULT_BATCH_CONCURRENCY = 4
+
+# Operation polling: first check soon, then back off unless Azure sends Retry-After
+POLL_FIRST_INTERVAL = 0.5
+POLL_BACKOFF = 1.5
+POLL_MAX_INTERVAL = 3
+TURNAROUND_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34)   # seconds, for the stats histogram
 
 def _ensure_field(dt, fieldname):
     """Skip setting a field that doesn't exist on this doctype."""
     return frappe.db.has_column(dt, fieldname)
 
 @frappe.whitelist()
-def create_customer_from_scan(file_url: str, use_urlsource: int = 0, set_docname_to_name: int = 1, debug: int = 0):
+def create_customer_from_scan(file_url: str, use_urlsource: int = 0, set_docname_to_name: int = 1, debug: int = 0, run_async: int = 0):
     """
     1) Sends image/PDF to Azure (ID -> Read fallback)
     2) Maps to your Customer fields
     3) Creates & saves the Customer
     4) Sets appropriate attach/image fields for that doc type
     5) Attaches original file
+
+    run_async=1 queues the work and returns {"job_id"}; progress and the
+    result arrive as SCAN_EVENT realtime messages (see _run_scan_job).
     """
-    frappe.only_for(("System Manager","Sales Manager","Sales User","Administrator"))
+    frappe.only_for(SCAN_ROLES)
+    _cfg_or_throw()
 
-    endpoint, key = _cfg()
-    if not (endpoint and key):
-        raise frappe.ValidationError("Azure endpoint/key missing in site_config.json")
+    if int(run_async):
+        return _enqueue_scan("create", file_url=file_url, use_urlsource=use_urlsource,
+                             set_docname_to_name=set_docname_to_name, debug=debug)
 
-    # Prepare input (private files => bytes; public URLs => urlSource)
-    url_source, file_bytes = None, None
-    if int(use_urlsource) and file_url.lower().startswith(("http://", "https://")):
-        url_source = file_url
-    else:
-        path = get_file_path(file_url)
-        if not os.path.exists(path):
-            raise frappe.ValidationError(f"File not found: {path}")
-        with open(path, "rb") as f:
-            file_bytes = f.read()
+    mapped = _analyze_file(file_url, use_urlsource, debug)
+    return _create_customer(file_url, mapped, set_docname_to_name, debug)
+
+def _analyze_file(file_url, use_urlsource=0, debug=0, progress=None):
+    """Run the ID -> Read analysis of a file, returns the mapped fields."""
+    endpoint, key = _cfg_or_throw()
+    progress = progress or (lambda stage: None)
+
+    # Prepare input (private files => preprocessed copy streamed from disk; public URLs => urlSource)
+    url_source, path, source_hash = _scan_source(file_url, use_urlsource)
+    scan = PreparedScan(path) if path else None
 
     # --- Analyze with prebuilt-id then fallback to prebuilt-read ---
-    mapped = {}
+    source = {"url_source": url_source, "scan": scan}
     try:
-        op = _post_analyze(endpoint, key, MODEL_ID, url_source=url_source, file_bytes=file_bytes)
-        res = _poll(op, key)
-        if res.get("status") == "succeeded":
-            mapped = _map_prebuilt_id(res) or {}
-    except Exception as e:
-        if int(debug):
-            frappe.log_error(f"prebuilt-id failed: {e}", "Azure DI create_customer_from_scan")
-
-    if not mapped.get("customer_name") and not any(mapped.get(k) for k in ("passport_number","license_number","id_number")):
-        # Fallback: prebuilt-read
-        op = _post_analyze(endpoint, key, MODEL_READ, url_source=url_source, file_bytes=file_bytes, overload="analyzeDocument")
-        res = _poll(op, key)
+        mapped = _local_mrz(scan, source_hash) if scan else None
+        if mapped:
+            # Checked MRZ read on this server, Azure is not needed
+            integration_client.record_stat("azure_di.scan_path.local", "mrz")
+            return mapped
+
+        if frappe.utils.cint(frappe.conf.get("azure_di_speculative")):
+            mode = "speculative"
+            path, res, mapped = _analyze_speculative(endpoint, key, source_hash, source, debug, progress)
+        else:
+            mode = "sequential"
+            path, res, mapped = _analyze_sequential(endpoint, key, source_hash, source, debug, progress)
+    finally:
+        if scan:
+            scan.close()
+    integration_client.record_stat(f"azure_di.scan_path.{mode}", path)
+    if mapped.get("mrz"):
+        integration_client.record_stat(f"azure_di.scan_path.{mode}", "mrz")
+
+    if path == "read":
         if res.get("status") != "succeeded":
             raise frappe.ValidationError("Azure reading failed")
-        text = _read_text(res)
         if int(debug):
+            text = _read_text(res)
             blob = text[:3000] + ("…" if len(text) > 3000 else "")
-            frappe.log_error(blob, "Azure Read – raw text (create)")
-        mapped = _map_read_text(text) or {}
+            frappe.log_error(blob, "Azure Read – raw text")
+
+    return mapped
+
+def _scan_source(file_url, use_urlsource=0):
+    """(url_source, local path, source hash) of a scan; one of the first two is None."""
+    if int(use_urlsource) and file_url.lower().startswith(("http://", "https://")):
+        return file_url, None, get_source_hash(url=file_url)
+
+    path = get_file_path(file_url)
+    if not os.path.exists(path):
+        raise frappe.ValidationError(f"File not found: {path}")
+    return None, path, get_source_hash(path=path)
+
+def _local_mrz(scan, source_hash):
+    """MRZ fields from local OCR (pytesseract), None when unavailable or not valid."""
+    if not (has_local_ocr() and frappe.utils.cint(frappe.conf.get("azure_di_local_mrz", 1))):
+        return None
+
+    cached = get_cached_scan(source_hash, LOCAL_MRZ_MODEL)
+    if cached:
+        return cached.mapped_data
+
+    text = read_mrz_text(scan.path)
+    mapped = parse_mrz(text)
+    if mapped:
+        store_scan(source_hash, LOCAL_MRZ_MODEL, {"status": "succeeded", "content": text}, mapped)
+        frappe.db.commit()
+    return mapped
+
+def _is_usable(mapped):
+    return bool(mapped.get("customer_name") or any(mapped.get(k) for k in ("passport_number","license_number","id_number")))
+
+def _map_read_result(res):
+    text = _read_text(res)
+    return parse_mrz(text) or _map_read_text(text)
+
+def _analyze_sequential(endpoint, key, source_hash, source, debug, progress):
+    """prebuilt-id, then the read model only if that found nothing. Returns (path, result, mapped)."""
+    res, mapped = {}, {}
+    try:
+        progress("analyzing")
+        res, mapped = _run_model(endpoint, key, MODEL_ID, source_hash, _map_prebuilt_id, **source)
+    except Exception as e:
+        if int(debug):
+            frappe.log_error(f"prebuilt-id failed: {e}", "Azure DI prebuilt-id")
+
+    if _is_usable(mapped):
+        return "id", res, mapped
+
+    # Fallback: prebuilt-read
+    progress("reading")
+    res, mapped = _run_model(endpoint, key, MODEL_READ, source_hash, _map_read_result, overload="analyzeDocument", **source)
+    return "read", res, mapped
+
+def _analyze_speculative(endpoint, key, source_hash, source, debug, progress):
+    """
+    Opt-in (site config azure_di_speculative): submit prebuilt-id and the
+    read model at once and take the ID result when usable, so documents
+    that need the fallback cost one round trip instead of two. The losing
+    read is stopped polling (Azure has no cancel, the analysis is still
+    billed). Returns (path, result, mapped).
+    """
+    progress("analyzing")
+    steps = {
+        "id": (MODEL_ID, None, _map_prebuilt_id),
+        "read": (MODEL_READ, "analyzeDocument", _map_read_result),
+    }
+    cached = {}
+    for path, (model, overload, mapper) in steps.items():
+        entry = _get_cached(source_hash, _cache_model(model, overload))
+        if entry:
+            cached[path] = (entry.raw_result, entry.mapped_data)
+
+    # A usable cached ID result needs no read leg at all
+    if "id" in cached and _is_usable(cached["id"][1]):
+        return ("id",) + cached["id"]
+
+    site, sites_path = frappe.local.site, frappe.local.sites_path
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="azure-di")
+    futures = {}
+    for path, (model, overload, mapper) in steps.items():
+        if path not in cached:
+            futures[path] = pool.submit(_in_site, site, sites_path, _analyze_remote, endpoint, key, model,
+                                        overload=overload, stop=stop, **source)
+
+    def collect(path):
+        if path not in cached:
+            model, overload, mapper = steps[path]
+            res = futures[path].result()
+            cached[path] = res, _map_and_store(res, source_hash, _cache_model(model, overload), mapper)
+        return cached[path]
+
+    try:
+        # The read model usually finishes first; a checked MRZ in its text
+        # is as good as the ID fields, so the slower model is not awaited
+        if "id" in futures:
+            if "read" in futures:
+                wait(futures.values(), return_when=FIRST_COMPLETED)
+            if not futures["id"].done() and ("read" in cached or futures["read"].done()):
+                try:
+                    res, mapped = collect("read")
+                except Exception:
+                    res, mapped = {}, {}
+                if mapped.get("mrz"):
+                    integration_client.record_stat("azure_di.scan_path.speculative", "id_stopped")
+                    return "read", res, mapped
+
+        res, mapped = {}, {}
+        try:
+            res, mapped = collect("id")
+        except Exception as e:
+            if int(debug):
+                frappe.log_error(f"prebuilt-id failed: {e}", "Azure DI prebuilt-id")
+
+        if _is_usable(mapped):
+            if "read" in futures and not futures["read"].done():
+                integration_client.record_stat("azure_di.scan_path.speculative", "read_stopped")
+            return "id", res, mapped
+
+        progress("reading")
+        res, mapped = collect("read")
+        return "read", res, mapped
+    finally:
+        stop.set()
+        pool.shutdown(wait=False)
+
+def _in_site(site, sites_path, fn, *args, **kwargs):
+    """Run fn in a pool thread with the site's conf (for cache keys), no DB connection."""
+    frappe.init(site=site, sites_path=sites_path)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        frappe.destroy()
+
+def _cache_model(model, overload=None):
+    return f"{model}.{overload}" if overload else model
+
+def _get_cached(source_hash, cache_model):
+    entry = get_cached_scan(source_hash, cache_model)
+    integration_client.record_stat("azure_di.scan_cache", "hit" if entry else "miss")
+    return entry
+
+def _analyze_remote(endpoint, key, model, *, url_source=None, scan=None, overload=None, stop=None):
+    op = _post_analyze(endpoint, key, model, url_source=url_source, file_path=scan and scan.path, overload=overload)
+    return _poll(op, key, model=_cache_model(model, overload), stop=stop)
+
+def _map_and_store(res, source_hash, cache_model, mapper):
+    if res.get("status") != "succeeded":
+        return {}
+
+    mapped = mapper(res) or {}
+    store_scan(source_hash, cache_model, {"status": res.get("status"), "analyzeResult": res.get("analyzeResult")}, mapped)
+    # Nothing else is written before the analysis finishes; commit so a
+    # failing Customer insert does not roll the paid-for result back
+    frappe.db.commit()
+    return mapped
+
+def _run_model(endpoint, key, model, source_hash, mapper, *, url_source=None, scan=None, overload=None):
+    """
+    Analyze with one model and map the result, or reuse the cached analysis
+    of the same source. Returns (result, mapped fields).
+    """
+    cached = _get_cached(source_hash, _cache_model(model, overload))
+    if cached:
+        return cached.raw_result, cached.mapped_data
+
+    res = _analyze_remote(endpoint, key, model, url_source=url_source, scan=scan, overload=overload)
+    return res, _map_and_store(res, source_hash, _cache_model(model, overload), mapper)
 
+def _create_customer(file_url, mapped, set_docname_to_name=1, debug=0):
+    """Insert the Customer for mapped scan fields and attach the scan."""
     # --- Build Customer doc payload ---
     # Ensure Date fields are YYYY-MM-DD
     def iso(v): return _norm_date(v) if isinstance(v, str) else v
@@ -100,20 +304,22 @@ def create_customer_from_scan(file_url: str, use_urlsource: int = 0, set_docname
     # Prune None/empty
     payload = {k: v for k, v in payload.items() if v not in (None, "", [])}
 
+    # --- Returning renter: same document number and birth date ---
+    existing = find_customer_by_identity(payload)
+    if existing:
+        customer = frappe.get_doc("Customer", existing)
+        # Refresh the document fields only, the name stays as the desk knows it
+        customer.update({k: v for k, v in payload.items() if k not in ("doctype", "customer_type", "customer_name")})
+        customer.save(ignore_permissions=False)
+        _attach_scan(file_url, customer.name, debug)
+        return {"name": customer.name, "doc_type": doc_type, "customer_name": customer.customer_name, "updated": True}
+
     # --- Create Customer ---
     customer = frappe.get_doc(payload).insert(ignore_permissions=False)
     created_name = customer.name
 
     # --- Attach original file for audit ---
-    try:
-        f = frappe.new_doc("File")
-        f.file_url = file_url
-        f.attached_to_doctype = "Customer"
-        f.attached_to_name = created_name
-        f.insert(ignore_permissions=True)
-    except Exception as e:
-        if int(debug):
-            frappe.log_error(f"Attach failed: {e}", "create_customer_from_scan")
+    _attach_scan(file_url, created_name, debug)
 
     # --- Optional: rename docname to customer_name (if requested + no conflict) ---
     if int(set_docname_to_name) and customer_name and customer_name != created_name:
@@ -128,11 +334,206 @@ def create_customer_from_scan(file_url: str, use_urlsource: int = 0, set_docname
 
     return {"name": created_name, "doc_type": doc_type, "customer_name": customer_name}
 
+def _attach_scan(file_url, customer, debug=0):
+    """Attach the original scan to the Customer for audit."""
+    try:
+        f = frappe.new_doc("File")
+        f.file_url = file_url
+        f.attached_to_doctype = "Customer"
+        f.attached_to_name = customer
+        f.insert(ignore_permissions=True)
+    except Exception as e:
+        if int(debug):
+            frappe.log_error(f"Attach failed: {e}", "create_customer_from_scan")
+
 def _cfg():
-    sc = frappe.get_site_config()
-    return sc.get("azure_di_endpoint"), sc.get("azure_di_key")
+    # frappe.conf holds the site config; tests and benchmarks point it at a fake server
+    return frappe.conf.get("azure_di_endpoint"), frappe.conf.get("azure_di_key")
+
+def _cfg_or_throw():
+    endpoint, key = _cfg()
+    if not (endpoint and key):
+        raise frappe.ValidationError("Azure endpoint/key missing in site_config.json")
+    return endpoint, key
+
+def _enqueue_scan(action, **kwargs):
+    """Queue a scan for a background worker, returns {"job_id"} right away."""
+    job_id = frappe.generate_hash(length=12)
+    _publish_scan_state(job_id, frappe.session.user, "queued")
+    frappe.enqueue(
+        "leetrental.leetrental.azure_di._run_scan_job",
+        queue="default",
+        timeout=600,
+        job_id=f"id_scan::{job_id}",
+        action=action,
+        scan_id=job_id,
+        **kwargs
+    )
+    return {"job_id": job_id, "queued": True}
+
+def _run_scan_job(action, scan_id, file_url, use_urlsource=0, set_docname_to_name=1, debug=0):
+    """
+    Worker side of run_async scans. Publishes SCAN_EVENT with status
+    queued -> analyzing [-> reading] [-> creating] -> done | failed;
+    "done" carries the same payload the synchronous endpoint returns.
+    """
+    user = frappe.session.user
+    progress = lambda stage: _publish_scan_state(scan_id, user, stage)
+    try:
+        mapped = _analyze_file(file_url, use_urlsource, debug, progress=progress)
+        if action == "create":
+            progress("creating")
+            result = _create_customer(file_url, mapped, set_docname_to_name, debug)
+        else:
+            result = _scan_fields(file_url, mapped, debug)
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Azure DI scan job")
+        _publish_scan_state(scan_id, user, "failed", error=str(e) or e.__class__.__name__)
+        return
+
+    frappe.db.commit()
+    _publish_scan_state(scan_id, user, "done", result=result)
+
+@frappe.whitelist()
+def create_customers_from_scans(file_urls, use_urlsource: int = 0, set_docname_to_name: int = 1, debug: int = 0):
+    """
+    Batch create_customer_from_scan for corporate onboarding, always in the
+    background. Returns {"job_id"}; each file reports on SCAN_BATCH_EVENT,
+    the batch as a whole on SCAN_EVENT / get_scan_job like single scans.
+    """
+    frappe.only_for(SCAN_ROLES)
+    _cfg_or_throw()
+
+    if isinstance(file_urls, str):
+        file_urls = frappe.parse_json(file_urls)
+    file_urls = list(dict.fromkeys(u for u in (file_urls or []) if u))
+    if not file_urls:
+        raise frappe.ValidationError("No files to scan")
+    if len(file_urls) > BATCH_SCAN_LIMIT:
+        raise frappe.ValidationError(f"Scan at most {BATCH_SCAN_LIMIT} files at once")
+
+    job_id = frappe.generate_hash(length=12)
+    _publish_scan_state(job_id, frappe.session.user, "queued", total=len(file_urls))
+    frappe.enqueue(
+        "leetrental.leetrental.azure_di._run_scan_batch",
+        queue="long",
+        timeout=3600,
+        job_id=f"id_scan_batch::{job_id}",
+        scan_id=job_id,
+        file_urls=file_urls,
+        use_urlsource=use_urlsource,
+        set_docname_to_name=set_docname_to_name,
+        debug=debug
+    )
+    return {"job_id": job_id, "queued": True, "total": len(file_urls)}
+
+def _run_scan_batch(scan_id, file_urls, use_urlsource=0, set_docname_to_name=1, debug=0):
+    """
+    Worker side of create_customers_from_scans. Files with identical content
+    are analyzed once, up to azure_di_batch_concurrency at a time, then all
+    Customers are inserted and committed together. A file whose analysis or
+    insert fails is reported and skipped, it does not sink the batch.
+    """
+    user = frappe.session.user
+    results = {}
+
+    def report(file_url, status, **data):
+        results[file_url] = dict(data, file_url=file_url, status=status)
+        frappe.publish_realtime(SCAN_BATCH_EVENT, dict(results[file_url], job_id=scan_id), user=user)
+
+    try:
+        # Group by content, re-uploads of one document cost one analysis
+        groups = {}
+        for file_url in file_urls:
+            try:
+                groups.setdefault(_scan_source(file_url, use_urlsource)[2], []).append(file_url)
+            except Exception as e:
+                report(file_url, "failed", error=str(e))
+
+        _publish_scan_state(scan_id, user, "analyzing", total=len(file_urls))
+        site, sites_path = frappe.local.site, frappe.local.sites_path
+        concurrency = frappe.utils.cint(frappe.conf.get("azure_di_batch_concurrency")) or DEFAULT_BATCH_CONCURRENCY
+        mapped_by_hash = {}
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="azure-di-batch") as pool:
+            futures = {
+                pool.submit(_in_site_db, site, sites_path, user, _analyze_file, urls[0], use_urlsource, debug): source_hash
+                for source_hash, urls in groups.items()
+            }
+            for future in as_completed(futures):
+                source_hash = futures[future]
+                try:
+                    mapped_by_hash[source_hash] = future.result()
+                except Exception as e:
+                    for file_url in groups[source_hash]:
+                        report(file_url, "failed", error=str(e) or e.__class__.__name__)
+                    continue
+                for file_url in groups[source_hash]:
+                    report(file_url, "analyzed")
+
+        _publish_scan_state(scan_id, user, "creating", total=len(file_urls))
+        created = {}
+        for source_hash, mapped in mapped_by_hash.items():
+            first, *duplicates = groups[source_hash]
+            frappe.db.savepoint("id_scan_batch")
+            try:
+                created[first] = _create_customer(first, mapped, set_docname_to_name, debug)
+            except Exception as e:
+                frappe.db.rollback(save_point="id_scan_batch")
+                for file_url in groups[source_hash]:
+                    report(file_url, "failed", error=str(e) or e.__class__.__name__)
+                continue
+            for file_url in duplicates:
+                created[file_url] = dict(created[first], duplicate_of=first)
+        frappe.db.commit()
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Azure DI scan batch")
+        _publish_scan_state(scan_id, user, "failed", error=str(e) or e.__class__.__name__)
+        return
+
+    # Only announce Customers once they are committed
+    for file_url, result in created.items():
+        status = "duplicate" if result.get("duplicate_of") else "updated" if result.get("updated") else "created"
+        report(file_url, status, result=result)
+
+    _publish_scan_state(scan_id, user, "done", total=len(file_urls), result={
+        "files": [results.get(file_url) for file_url in file_urls],
+        "created": sum(1 for r in results.values() if r["status"] == "created"),
+        "updated": sum(1 for r in results.values() if r["status"] == "updated"),
+        "failed": sum(1 for r in results.values() if r["status"] == "failed"),
+    })
+
+def _in_site_db(site, sites_path, user, fn, *args, **kwargs):
+    """Run fn in a pool thread on its own database connection, as `user`."""
+    frappe.init(site=site, sites_path=sites_path)
+    try:
+        frappe.connect()
+        frappe.set_user(user)
+        return fn(*args, **kwargs)
+    finally:
+        frappe.destroy()
+
+def _publish_scan_state(job_id, user, status, **data):
+    message = dict(data, job_id=job_id, status=status)
+    # Kept with its owner, results carry passport / ID data
+    frappe.cache().set_value(f"{SCAN_JOB_KEY}:{job_id}", {"user": user, "message": message}, expires_in_sec=SCAN_JOB_TTL)
+    frappe.publish_realtime(SCAN_EVENT, message, user=user)
 
-def _post_analyze(endpoint, key, model, *, url_source=None, file_bytes=None, overload=None):
+@frappe.whitelist()
+def get_scan_job(job_id: str):
+    """
+    Last state of a run_async scan, for clients that missed the realtime events.
+    Only the user who queued the scan (or a System Manager) gets it, anyone
+    else sees the job as unknown.
+    """
+    frappe.only_for(SCAN_ROLES)
+    job = frappe.cache().get_value(f"{SCAN_JOB_KEY}:{job_id}")
+    if job and (job.get("user") == frappe.session.user or "System Manager" in frappe.get_roles()):
+        return job["message"]
+    return {"job_id": job_id, "status": "unknown"}
+
+def _post_analyze(endpoint, key, model, *, url_source=None, file_path=None, overload=None):
     base = f"{endpoint}/documentintelligence/documentModels/{model}:analyze"
     params = {"api-version": API_VERSION}
     if overload:
@@ -140,29 +541,56 @@ def _post_analyze(endpoint, key, model, *, url_source=None, file_bytes=None, ove
     headers = {"Ocp-Apim-Subscription-Key": key}
     if url_source:
         headers["Content-Type"] = "application/json"
-        r = requests.post(base, params=params, headers=headers, json={"urlSource": url_source}, timeout=60)
+        r = integration_client.post(base, endpoint=f"azure_di.analyze.{model}", params=params, headers=headers, json={"urlSource": url_source}, timeout=60)
     else:
         headers["Content-Type"] = "application/octet-stream"
-        r = requests.post(base, params=params, headers=headers, data=file_bytes, timeout=60)
+        # Streamed from disk; the client rewinds the file if it retries
+        with open(file_path, "rb") as body:
+            r = integration_client.post(base, endpoint=f"azure_di.analyze.{model}", params=params, headers=headers, data=body, timeout=60)
     r.raise_for_status()
     op_loc = r.headers.get("Operation-Location")
     if not op_loc:
         raise frappe.ValidationError("Azure did not return Operation-Location")
     return op_loc
 
-def _poll(op_location, key, timeout_s=90):
+def _poll(op_location, key, timeout_s=90, model=None, stop=None):
+    """
+    Wait for an analyze operation. Sleeps what the service asks for in
+    Retry-After, else POLL_FIRST_INTERVAL growing by POLL_BACKOFF up to
+    POLL_MAX_INTERVAL. Records turnaround and poll count per model.
+    Setting the `stop` event abandons the operation with status "cancelled".
+    """
     headers = {"Ocp-Apim-Subscription-Key": key}
-    t0 = time.time()
+    stats = f"azure_di.turnaround.{model or 'unknown'}"
+    t0 = time.monotonic()
+    interval = POLL_FIRST_INTERVAL
+    polls = 0
+    wait = stop.wait if stop else time.sleep
+    wait(interval)
     while True:
-        rr = requests.get(op_location, headers=headers, timeout=60)
+        if stop and stop.is_set():
+            return {"status": "cancelled"}
+        rr = integration_client.get(op_location, endpoint="azure_di.poll", headers=headers, timeout=60)
+        polls += 1
         rr.raise_for_status()
         j = rr.json()
         st = j.get("status")
+        elapsed = time.monotonic() - t0
         if st in ("succeeded","failed"):
+            _record_turnaround(stats, elapsed, polls, st == "failed")
             return j
-        if time.time() - t0 > timeout_s:
+        retry_after = integration_client.parse_retry_after(rr.headers.get("Retry-After"))
+        interval = retry_after if retry_after is not None else min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+        if elapsed + interval > timeout_s:
+            _record_turnaround(stats, elapsed, polls, True)
             raise frappe.ValidationError("Azure analyze timed out")
-        time.sleep(1)
+        wait(interval)
+
+def _record_turnaround(stats, elapsed, polls, failed):
+    integration_client.record_call(stats, elapsed, failed)
+    integration_client.record_stat(stats, "polls", polls)
+    bucket = next((f"le_{b}s" for b in TURNAROUND_BUCKETS if elapsed <= b), f"gt_{TURNAROUND_BUCKETS[-1]}s")
+    integration_client.record_stat(stats, bucket)
 
 def _read_text(res):
     ar = (res.get("analyzeResult") or {})
@@ -249,6 +677,16 @@ def _map_prebuilt_id(res):
 
     return out
 
+# _map_read_text patterns, compiled once
+DATE_RX = r"(\d{4}[./-]\d{1,2}[./-]\d{1,2}|\d{1,2}[./-]\d{1,2}[./-]\d{2,4})"
+_RX_LICENSE     = re.compile(r"License", re.I)
+_RX_NATIONAL_ID = re.compile(r"\bID\b|\bEmirates\b|\bNational\b", re.I)
+_RX_NAME        = re.compile(r"(Full\s*Name|Name)\s*[:\-]\s*([A-Za-z' ]{3,})", re.I)
+_RX_DOB         = re.compile(r"(DOB|Date\s*of\s*Birth)\s*[:\-]?\s*" + DATE_RX, re.I)
+_RX_NUMBER      = re.compile(r"(Passport|Document|ID|Card|License)\s*(No\.?|Number)\s*[:\-]?\s*([A-Z0-9\-]+)", re.I)
+_RX_BARE_NUMBER = re.compile(r"\b([A-Z]\d{6,9})\b")
+_RX_EXPIRY      = re.compile(r"(Expiry|Expiration|Exp\. Date|Valid\s*Until)\s*[:\-]?\s*" + DATE_RX, re.I)
+
 def _map_read_text(text):
     """
     Fallback regex mapping to YOUR fields + doc_type.
@@ -261,12 +699,12 @@ def _map_read_text(text):
     ]}
     # Doc type hints
     dtype = "passport"
-    if re.search(r"License", text, re.I): dtype = "driving_license"
-    if re.search(r"\bID\b|\bEmirates\b|\bNational\b", text, re.I): dtype = "national_id"
+    if _RX_LICENSE.search(text): dtype = "driving_license"
+    if _RX_NATIONAL_ID.search(text): dtype = "national_id"
     out["doc_type"] = dtype
 
     # Name
-    m = re.search(r"(Full\s*Name|Name)\s*[:\-]\s*([A-Za-z' ]{3,})", text, re.I)
+    m = _RX_NAME.search(text)
     if m:
         out["customer_name"] = m.group(2).strip()
     else:
@@ -275,18 +713,17 @@ def _map_read_text(text):
         if cand: out["customer_name"] = cand[0].title()
 
     # DOB -> dd-mm-yyyy
-    DATE_RX = r"(\d{4}[./-]\d{1,2}[./-]\d{1,2}|\d{1,2}[./-]\d{1,2}[./-]\d{2,4})"
-    m = re.search(r"(DOB|Date\s*of\s*Birth)\s*[:\-]?\s*"+DATE_RX, text, re.I)
+    m = _RX_DOB.search(text)
     if m:
         out["date_of_birth"] = _norm_date(m.group(2) if m.lastindex>=2 else m.group(1))
 
     # Number + Expiry (generic)
-    mnum = re.search(r"(Passport|Document|ID|Card|License)\s*(No\.?|Number)\s*[:\-]?\s*([A-Z0-9\-]+)", text, re.I)
+    mnum = _RX_NUMBER.search(text)
     if not mnum:
-        mnum = re.search(r"\b([A-Z]\d{6,9})\b", text)
+        mnum = _RX_BARE_NUMBER.search(text)
     generic_num = (mnum.group(3) if (mnum and mnum.lastindex and mnum.lastindex>=3) else (mnum.group(1) if mnum else None))
 
-    mexp = re.search(r"(Expiry|Expiration|Exp\. Date|Valid\s*Until)\s*[:\-]?\s*"+DATE_RX, text, re.I)
+    mexp = _RX_EXPIRY.search(text)
     generic_exp = _norm_date(mexp.group(2) if (mexp and mexp.lastindex>=2) else (mexp.group(1) if mexp else None))
 
     if dtype == "passport":
@@ -320,50 +757,23 @@ def _norm_date(s):
     return f"{yyyy}-{mm}-{dd}"
 
 @frappe.whitelist()
-def analyze_scan(file_url: str, use_urlsource: int = 0, debug: int = 0):
+def analyze_scan(file_url: str, use_urlsource: int = 0, debug: int = 0, run_async: int = 0):
     """
     NEW-FORM helper: analyze the scan and RETURN values mapped to your fields
     (no DB writes). The client script will set them on the unsaved form.
+    run_async=1 works as in create_customer_from_scan.
     """
-    frappe.only_for(("System Manager","Sales Manager","Sales User","Administrator"))
-    endpoint, key = _cfg()
-    if not (endpoint and key):
-        raise frappe.ValidationError("Azure endpoint/key missing in site_config.json")
-
-    # prepare input
-    url_source = None; file_bytes = None
-    if int(use_urlsource) and file_url.lower().startswith(("http://","https://")):
-        url_source = file_url
-    else:
-        path = get_file_path(file_url)
-        if not os.path.exists(path):
-            raise frappe.ValidationError(f"File not found: {path}")
-        with open(path, "rb") as f:
-            file_bytes = f.read()
+    frappe.only_for(SCAN_ROLES)
+    _cfg_or_throw()
 
-    # try prebuilt-id first
-    try:
-        op = _post_analyze(endpoint, key, MODEL_ID, url_source=url_source, file_bytes=file_bytes)
-        res = _poll(op, key)
-        if res.get("status") == "succeeded":
-            mapped = _map_prebuilt_id(res)
-        else:
-            mapped = {}
-    except Exception as e:
-        mapped = {}
-        if int(debug): frappe.log_error(f"prebuilt-id failed: {e}", "Azure ID")
+    if int(run_async):
+        return _enqueue_scan("analyze", file_url=file_url, use_urlsource=use_urlsource, debug=debug)
 
-    # fallback to prebuilt-read
-    if not mapped.get("customer_name") and not any(mapped.get(k) for k in ("passport_number","license_number","id_number")):
-        op = _post_analyze(endpoint, key, MODEL_READ, url_source=url_source, file_bytes=file_bytes, overload="analyzeDocument")
-        res = _poll(op, key)
-        if res.get("status") != "succeeded":
-            raise frappe.ValidationError("Azure reading failed")
-        text = _read_text(res)
-        if int(debug):
-            frappe.log_error((text[:3000] + ("…" if len(text) > 3000 else "")), "Azure Read – raw text")
-        mapped = _map_read_text(text)
+    mapped = _analyze_file(file_url, use_urlsource, debug)
+    return _scan_fields(file_url, mapped, debug)
 
+def _scan_fields(file_url, mapped, debug=0):
+    """Mapped fields plus the attach/image fields, as analyze_scan returns them."""
     # attach/image fields for the detected doc type (client will set if exists)
     mapped["doc_type"] = mapped.get("doc_type") or "passport"
     if mapped["doc_type"] == "passport":
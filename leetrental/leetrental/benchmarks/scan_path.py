@@ -0,0 +1,129 @@
+# leetrental/leetrental/benchmarks/scan_path.py
+"""
+ID scan throughput benchmark, against a local fake Document Intelligence
+
+	bench --site <site> execute leetrental.leetrental.benchmarks.scan_path.run --kwargs "{'scans': 40, 'concurrency': '1,4,8'}"
+
+For each concurrency level, pushes `scans` fresh (uncached) documents
+through analyze_scan, or create_customer_from_scan with create=1, from
+that many threads with their own DB connections. Reports scans/minute,
+p50/p95 latency, Azure requests per scan and worker occupancy (share of
+the threads' wall time spent inside a scan). Customers are rolled back,
+sample files and their scan cache entries removed afterwards.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+
+from leetrental.leetrental import azure_di
+from leetrental.leetrental.doctype.id_scan_cache.id_scan_cache import CACHE_DOCTYPE, get_source_hash
+from leetrental.leetrental.tests.fake_azure_di import FakeAzureDIServer, load_fixtures
+
+
+def run(scans=40, concurrency="1,4,8", create=0, latency=0.02, processing_time=1.5, retry_after=None,
+		throttle_rate=0, failure_rate=0, fixtures=None, speculative=None, seed=42):
+	scans = int(scans)
+	levels = [int(c) for c in str(concurrency).split(",") if c.strip()]
+	method = azure_di.create_customer_from_scan if int(create) else azure_di.analyze_scan
+
+	server = FakeAzureDIServer(
+		fixtures=load_fixtures(fixtures) if fixtures else None,
+		latency=float(latency),
+		processing_time=float(processing_time),
+		retry_after=retry_after,
+		throttle_rate=float(throttle_rate),
+		failure_rate=float(failure_rate),
+		seed=seed
+	)
+	overrides = {"azure_di_endpoint": None, "azure_di_key": "benchmark", "azure_di_local_mrz": 0}
+	if speculative is not None:
+		overrides["azure_di_speculative"] = frappe.utils.cint(speculative)
+
+	site, sites_path, user = frappe.local.site, frappe.local.sites_path, frappe.session.user
+	paths = []
+	with server:
+		overrides["azure_di_endpoint"] = server.endpoint
+		print(f"{method.__name__}: {scans} scans per level, fake Azure latency {latency}s, "
+			f"processing {processing_time}s, Retry-After {retry_after}")
+		print("threads  scans/min   p50 ms   p95 ms  req/scan  failed  occupancy")
+		try:
+			for level in levels:
+				files = write_sample_files(scans, level)
+				paths += [path for path, _ in files]
+				requests_before = len(server.requests)
+
+				started = time.perf_counter()
+				with ThreadPoolExecutor(max_workers=level) as pool:
+					results = list(pool.map(
+						lambda file_url: scan_once(site, sites_path, user, overrides, method, file_url),
+						[file_url for _, file_url in files]
+					))
+				wall = time.perf_counter() - started
+
+				timings = sorted(elapsed * 1000 for elapsed, _ in results)
+				failed = sum(1 for _, ok in results if not ok)
+				requests = (len(server.requests) - requests_before) / scans
+				occupancy = sum(elapsed for elapsed, _ in results) / (wall * level)
+				print(f"{level:>7} {scans / wall * 60:>10.1f} {percentile(timings, 0.5):>8.0f} "
+					f"{percentile(timings, 0.95):>8.0f} {requests:>9.1f} {failed:>7} {occupancy:>10.0%}")
+		finally:
+			cleanup(paths)
+
+
+def scan_once(site, sites_path, user, overrides, method, file_url):
+	"""
+	One scan on its own connection, like a web worker would serve it.
+	Returns (seconds, succeeded); nothing but the scan cache is committed.
+	"""
+	frappe.init(site=site, sites_path=sites_path)
+	try:
+		frappe.connect()
+		frappe.set_user(user)
+		frappe.conf.update(overrides)
+
+		started = time.perf_counter()
+		try:
+			if method is azure_di.create_customer_from_scan:
+				method(file_url=file_url, set_docname_to_name=0)
+			else:
+				method(file_url=file_url)
+			ok = True
+		except Exception:
+			ok = False
+		return time.perf_counter() - started, ok
+	finally:
+		frappe.db.rollback()
+		frappe.destroy()
+
+
+def write_sample_files(count, level):
+	"""
+	Distinct minimal PDFs (so neither preprocessing nor the scan cache
+	shortcuts the Azure round trip), as (path, file_url)
+	"""
+	files = []
+	for i in range(count):
+		name = f"scan_benchmark_{level}_{i}_{frappe.generate_hash(length=6)}.pdf"
+		path = frappe.get_site_path("private", "files", name)
+		with open(path, "wb") as f:
+			f.write(f"%PDF-1.4\n% {name}\n%%EOF\n".encode())
+		files.append((path, f"/private/files/{name}"))
+	return files
+
+
+def cleanup(paths):
+	hashes = [get_source_hash(path=path) for path in paths if os.path.exists(path)]
+	if hashes:
+		frappe.db.delete(CACHE_DOCTYPE, {"source_hash": ("in", hashes)})
+		frappe.db.commit()
+	for path in paths:
+		if os.path.exists(path):
+			os.remove(path)
+
+
+def percentile(timings, fraction):
+	if not timings:
+		return 0
+	return timings[min(len(timings) - 1, int(len(timings) * fraction))]
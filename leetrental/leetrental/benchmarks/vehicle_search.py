@@ -0,0 +1,104 @@
+# leetrental/leetrental/benchmarks/vehicle_search.py
+"""
+Vehicle quick search benchmark
+
+    bench --site <site> execute leetrental.leetrental.benchmarks.vehicle_search.run --kwargs "{'count': 50000}"
+
+Seeds `count` synthetic vehicles and their index rows, times exact plate,
+prefix and VIN infix lookups against the indexed search and the old
+leading-wildcard LIKE scan, then rolls everything back.
+"""
+import random
+import string
+import time
+
+import frappe
+
+from leetrental.leetrental.api.vehicle_schema import get_vehicle_schema
+from leetrental.leetrental.api.vehicle_search import get_index_rows, insert_index_rows, search_vehicle_index
+
+SEED_BATCH_SIZE = 2000
+VIN_CHARACTERS = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+
+
+def run(count=50000, repeat=20, seed=42):
+    rng = random.Random(seed)
+    try:
+        vehicles = seed_vehicles(int(count), rng)
+        samples = [rng.choice(vehicles) for _ in range(int(repeat))]
+
+        cases = {
+            "exact plate": [v["license_plate"] for v in samples],
+            "plate prefix": [v["license_plate"][:4] for v in samples],
+            "vin infix": [v["chassis_number"][6:12] for v in samples],
+        }
+
+        print(f"{count} vehicles, {repeat} queries per case (ms)")
+        for case, queries in cases.items():
+            indexed = time_queries(search_vehicle_index, queries)
+            legacy = time_queries(legacy_like_search, queries)
+            print(f"{case:<14} indexed {format_timings(indexed)} | LIKE scan {format_timings(legacy)}")
+    finally:
+        frappe.db.rollback()
+
+
+def seed_vehicles(count, rng):
+    """
+    Bulk insert synthetic vehicles and their index rows (no controllers)
+    """
+    schema = get_vehicle_schema()
+    now = frappe.utils.now()
+    user = frappe.session.user
+    fields = ["name", "license_plate", "chassis_number", "custom_engine_number", "model_year",
+        "creation", "modified", "owner", "modified_by"]
+
+    vehicles = []
+    for start in range(0, count, SEED_BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + SEED_BATCH_SIZE, count)):
+            plate = f"BM{''.join(rng.choices(string.ascii_uppercase, k=2))}-{i:06d}"
+            vehicles.append({
+                "license_plate": plate,
+                "chassis_number": "".join(rng.choices(VIN_CHARACTERS, k=17))
+            })
+            batch.append(vehicles[-1])
+
+        frappe.db.bulk_insert("Vehicles", fields, [
+            [v["license_plate"], v["license_plate"], v["chassis_number"], f"BM-{v['chassis_number']}",
+                2023, now, now, user, user]
+            for v in batch
+        ])
+
+        rows = []
+        for v in batch:
+            rows += get_index_rows(v["license_plate"], v, schema.search_fields)
+        insert_index_rows(rows)
+
+    return vehicles
+
+
+def legacy_like_search(query):
+    """The previous search_vehicles query, for comparison"""
+    search_fields = get_vehicle_schema().search_fields
+    return frappe.db.sql(f"""
+        SELECT `name`
+        FROM `tabVehicles`
+        WHERE {" OR ".join(f"`{field}` LIKE %(query)s" for field in search_fields)}
+        ORDER BY modified DESC
+        LIMIT 20
+    """, {"query": f"%{query}%"})
+
+
+def time_queries(search, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+
+def format_timings(timings):
+    p50 = timings[len(timings) // 2]
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return f"p50 {p50:7.2f} p95 {p95:7.2f}"
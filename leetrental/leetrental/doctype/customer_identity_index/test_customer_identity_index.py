@@ -0,0 +1,61 @@
+# Copyright (c) 2024, LeetRental and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.api.customer_identity import (
+	IDENTITY_INDEX_DOCTYPE,
+	find_customer_by_identity,
+	get_fingerprints,
+	normalize_document_number,
+)
+
+
+class TestCustomerIdentityIndex(FrappeTestCase):
+	def setUp(self):
+		"""Set up a customer with a passport"""
+		self.customer = frappe.get_doc({
+			"doctype": "Customer",
+			"customer_name": "Identity Index Test",
+			"customer_type": "Individual",
+			"passport_number": "IDX-123 456",
+			"date_of_birth": "1974-08-12"
+		}).insert()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_normalize_document_number(self):
+		"""Separators and case are ignored"""
+		self.assertEqual(normalize_document_number(" l898-902 c3 "), "L898902C3")
+		self.assertEqual(normalize_document_number(None), "")
+
+	def test_fingerprint_includes_birth_date(self):
+		"""Fingerprints carry the document type and date of birth"""
+		self.assertEqual(
+			get_fingerprints({"passport_number": "idx 123456", "date_of_birth": "1974-08-12"}),
+			[("passport", "passport:IDX123456:1974-08-12")]
+		)
+
+	def test_match_on_insert(self):
+		"""A new customer is indexed and found by a differently formatted number"""
+		match = find_customer_by_identity({"passport_number": "idx123456", "date_of_birth": "1974-08-12"})
+		self.assertEqual(match, self.customer.name)
+
+	def test_birth_date_must_match(self):
+		"""The same number with another birth date is someone else"""
+		self.assertIsNone(find_customer_by_identity({"passport_number": "IDX123456", "date_of_birth": "1980-01-01"}))
+
+	def test_reindex_on_update_and_trash(self):
+		"""Changed numbers replace the old fingerprints, deletion removes them"""
+		self.customer.passport_number = "IDX999"
+		self.customer.save()
+		self.assertIsNone(find_customer_by_identity({"passport_number": "IDX123456", "date_of_birth": "1974-08-12"}))
+		self.assertEqual(
+			find_customer_by_identity({"passport_number": "IDX999", "date_of_birth": "1974-08-12"}),
+			self.customer.name
+		)
+
+		self.customer.delete()
+		self.assertFalse(frappe.db.exists(IDENTITY_INDEX_DOCTYPE, {"customer": self.customer.name}))
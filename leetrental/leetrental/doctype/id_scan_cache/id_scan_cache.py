@@ -0,0 +1,95 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+
+CACHE_DOCTYPE = "ID Scan Cache"
+# Scans hold personal data, keep them only as long as re-scans are likely
+DEFAULT_RETENTION_DAYS = 7
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class IDScanCache(Document):
+	pass
+
+
+def get_source_hash(path=None, url=None):
+	"""
+	SHA-256 of a file's bytes, read in chunks, or of a urlSource URL
+	"""
+	digest = hashlib.sha256()
+	if url:
+		digest.update(b"url:" + url.encode())
+	else:
+		with open(path, "rb") as f:
+			for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+				digest.update(chunk)
+	return digest.hexdigest()
+
+
+def get_cache_key(source_hash, model):
+	return f"{source_hash}|{model}"
+
+
+def get_retention_days():
+	return frappe.utils.cint(frappe.conf.get("id_scan_cache_retention_days")) or DEFAULT_RETENTION_DAYS
+
+
+def get_cached_scan(source_hash, model):
+	"""
+	frappe._dict(raw_result, mapped_data, analyzed_on) of an unexpired
+	analysis, or None
+	"""
+	entry = frappe.db.get_value(
+		CACHE_DOCTYPE,
+		{"name": get_cache_key(source_hash, model), "expires_on": (">", frappe.utils.now_datetime())},
+		["raw_result", "mapped_data", "analyzed_on"],
+		as_dict=True
+	)
+	if not entry:
+		return None
+
+	entry.raw_result = frappe.parse_json(entry.raw_result) or {}
+	entry.mapped_data = frappe.parse_json(entry.mapped_data) or {}
+	return entry
+
+
+def store_scan(source_hash, model, raw_result, mapped_data):
+	"""
+	Insert or refresh the cache entry of a successful analysis
+	"""
+	now = frappe.utils.now_datetime()
+	key = get_cache_key(source_hash, model)
+	values = {
+		"source_hash": source_hash,
+		"model": model,
+		"raw_result": frappe.as_json(raw_result),
+		"mapped_data": frappe.as_json(mapped_data),
+		"analyzed_on": now,
+		"expires_on": frappe.utils.add_days(now, get_retention_days())
+	}
+
+	if frappe.db.exists(CACHE_DOCTYPE, key):
+		frappe.db.set_value(CACHE_DOCTYPE, key, values)
+	else:
+		frappe.get_doc(dict(values, doctype=CACHE_DOCTYPE, cache_key=key)).insert(
+			ignore_permissions=True, ignore_if_duplicate=True
+		)
+
+
+def purge_expired_scans():
+	"""
+	Daily: drop analyses past their retention window
+	"""
+	frappe.db.delete(CACHE_DOCTYPE, {"expires_on": ("<=", frappe.utils.now_datetime())})
+	frappe.db.commit()
+
+
+@frappe.whitelist()
+def clear_id_scan_cache():
+	frappe.only_for("System Manager")
+	frappe.db.delete(CACHE_DOCTYPE)
+	return {"success": True}
@@ -0,0 +1,52 @@
+# Copyright (c) 2024, LeetRental and Contributors
+# See license.txt
+
+import os
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.doctype.id_scan_cache.id_scan_cache import (
+	CACHE_DOCTYPE,
+	get_cache_key,
+	get_cached_scan,
+	get_source_hash,
+	purge_expired_scans,
+	store_scan,
+)
+
+
+class TestIDScanCache(FrappeTestCase):
+	def setUp(self):
+		self.path = frappe.get_site_path("private", "files", f"test_id_scan_cache_{frappe.generate_hash(length=6)}.bin")
+
+	def tearDown(self):
+		"""Nothing is committed; drop the cache rows and the sample file"""
+		frappe.db.rollback()
+		frappe.db.delete(CACHE_DOCTYPE, {"source_hash": "abc"})
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+	def test_source_hash(self):
+		"""Files hash by content, urlSource scans by URL"""
+		with open(self.path, "wb") as f:
+			f.write(b"passport")
+
+		self.assertEqual(get_source_hash(path=self.path), "cbc471ca60092bbe6c631f02bc57399b2da3d1ae491a55a1aa960a4b2e0ac7e8")
+		self.assertNotEqual(get_source_hash(path=self.path), get_source_hash(url="https://example.com/passport"))
+
+	def test_store_and_expire(self):
+		store_scan("abc", "prebuilt-idDocument", {"status": "succeeded"}, {"customer_name": "Jane Doe"})
+
+		entry = get_cached_scan("abc", "prebuilt-idDocument")
+		self.assertEqual(entry.mapped_data, {"customer_name": "Jane Doe"})
+		self.assertIsNone(get_cached_scan("abc", "prebuilt-idDocument.analyzeDocument"))
+
+		frappe.db.set_value(CACHE_DOCTYPE, get_cache_key("abc", "prebuilt-idDocument"), "expires_on", frappe.utils.add_days(None, -1))
+		self.assertIsNone(get_cached_scan("abc", "prebuilt-idDocument"))
+
+		# The daily job commits; keep the test's rows inside its transaction
+		with patch.object(frappe.db, "commit"):
+			purge_expired_scans()
+		self.assertFalse(frappe.db.exists(CACHE_DOCTYPE, get_cache_key("abc", "prebuilt-idDocument")))
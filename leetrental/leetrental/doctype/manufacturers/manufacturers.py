@@ -6,3 +6,10 @@ from frappe.model.document import Document
 
 class Manufacturers(Document):
 	pass
+
+
+def on_doctype_update():
+	# Backs the insert-or-get in vehicles/catalog.py
+	from leetrental.leetrental.doctype.vehicles.catalog import add_unique_index
+
+	add_unique_index("Manufacturers", ["name1"], "unique_manufacturer_name1")
@@ -0,0 +1,72 @@
+# Copyright (c) 2024, LeetRental and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.api.vehicle_search import normalize_search_text, search_vehicle_index
+
+
+class TestVehicleSearchIndex(FrappeTestCase):
+	def setUp(self):
+		"""Set up test vehicles"""
+		self.vehicles = []
+		for plate, chassis in (
+			("SRCH-101", "SRCHVIN00000101"),
+			("SRCH-1015", "SRCHVIN00000102"),
+			("XSRCH-101", "SRCHVIN00000103")
+		):
+			if frappe.db.exists("Vehicles", plate):
+				frappe.delete_doc("Vehicles", plate, force=True)
+			self.vehicles.append(frappe.get_doc({
+				"doctype": "Vehicles",
+				"license_plate": plate,
+				"chassis_number": chassis,
+				"custom_engine_number": f"ENG-{chassis}",
+				"model_year": 2023
+			}).insert())
+
+	def test_normalize_search_text(self):
+		"""Separators and case are ignored"""
+		self.assertEqual(normalize_search_text(" dxb-a 12_34 "), "DXBA1234")
+		self.assertEqual(normalize_search_text(None), "")
+
+	def test_ranking(self):
+		"""Exact plate first, then prefix, then infix matches"""
+		names = [v.name for v in search_vehicle_index("srch 101")]
+		self.assertEqual(names[:3], ["SRCH-101", "SRCH-1015", "XSRCH-101"])
+
+	def test_vin_infix(self):
+		"""Any part of the VIN finds the vehicle"""
+		names = [v.name for v in search_vehicle_index("00000102")]
+		self.assertEqual(names, ["SRCH-1015"])
+
+	def test_list_filters(self):
+		"""Filters in the [[field, operator, value]] form narrow the matches"""
+		names = [v.name for v in search_vehicle_index("srch 101", [["license_plate", "!=", "SRCH-101"]])]
+		self.assertEqual(names[:2], ["SRCH-1015", "XSRCH-101"])
+
+	def test_requires_read_permission(self):
+		"""Users who cannot read Vehicles find nothing"""
+		frappe.set_user("Guest")
+		try:
+			self.assertRaises(frappe.PermissionError, search_vehicle_index, "srch 101")
+		finally:
+			frappe.set_user("Administrator")
+
+	def test_index_maintenance(self):
+		"""Index follows updates and deletes"""
+		vehicle = self.vehicles[0]
+		vehicle.chassis_number = "SRCHVIN00000999"
+		vehicle.save()
+		self.assertFalse(search_vehicle_index("00000101"))
+		self.assertEqual([v.name for v in search_vehicle_index("00000999")], [vehicle.name])
+
+		vehicle.delete()
+		self.assertFalse(frappe.db.exists("Vehicle Search Index", {"vehicle": vehicle.name}))
+
+	def tearDown(self):
+		"""Clean up test data"""
+		for vehicle in self.vehicles:
+			if frappe.db.exists("Vehicles", vehicle.name):
+				frappe.delete_doc("Vehicles", vehicle.name, force=True)
@@ -0,0 +1,14 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class VehicleSearchIndex(Document):
+	pass
+
+
+def on_doctype_update():
+	# Prefix ranges for infix search, and prefix-only search on whole values
+	frappe.db.add_index("Vehicle Search Index", ["token"])
+	frappe.db.add_index("Vehicle Search Index", ["position", "token"])
@@ -1,18 +1,48 @@
 # File: your_app/your_app/vehicles/api.py
 # Server-side VIN decoder with auto-create for Vehicles Model
 
+import json
+
 import frappe
 import requests
 from frappe import _
 
+from leetrental.leetrental import integration_client
+from leetrental.leetrental.doctype.vin_decode_cache.vin_decode_cache import (
+    get_cached_decode,
+    read_cache_stats,
+    record_stat,
+    store_decode,
+)
+from leetrental.leetrental.doctype.vehicles.catalog import resolve_manufacturer, resolve_vehicle_model
+from leetrental.leetrental.doctype.vehicles.vin_decoder import (
+    OFFLINE_FIELDS,
+    decode_vin_offline,
+    is_check_digit_valid,
+    requires_check_digit,
+    to_vpic_result,
+)
+
+VPIC_BASE_URL = "https://vpic.nhtsa.dot.gov/api/vehicles"
+# DecodeVINValuesBatch accepts at most 50 VINs per request
+VPIC_BATCH_SIZE = 50
+BULK_DECODE_LIMIT = 5000
+BULK_DECODE_EVENT = "vin_bulk_decode_progress"
+
+
 @frappe.whitelist()
-def decode_vehicle_vin(vin, model_year=None):
+def decode_vehicle_vin(vin, model_year=None, fields=None):
     """
-    Decode VIN using NHTSA vPIC API
+    Decode VIN locally, then through the NHTSA vPIC API for what the VIN
+    alone cannot tell
     
     Args:
         vin (str): Vehicle Identification Number
         model_year (str, optional): Model year for better accuracy
+        fields (list, optional): Vehicles fields needed. By default only
+            OFFLINE_FIELDS (make and year), decoded locally when the VIN
+            carries them; pass any other field (or "*") for a vPIC decode
+            of the model and the remaining fields
     
     Returns:
         dict: Decoded vehicle information
@@ -33,48 +63,52 @@ def decode_vehicle_vin(vin, model_year=None):
         if any(char in invalid_chars for char in vin):
             frappe.throw(_("VIN cannot contain letters I, O, or Q"))
     
+    if fields and isinstance(fields, str):
+        fields = json.loads(fields) if fields.startswith("[") else fields.split(",")
+    if not fields:
+        fields = OFFLINE_FIELDS
+    
+    # Check digit, model year and make come from the VIN itself
+    offline = decode_vin_offline(vin)
+    offline_result = to_vpic_result(offline)
+    if model_year:
+        offline_result["ModelYear"] = str(model_year)
+    
+    if set(fields) <= set(OFFLINE_FIELDS) and offline["make"] and offline_result["ModelYear"]:
+        record_stat("offline_hit")
+        return build_decode_response(offline_result, map_to_vehicle_fields(offline_result), "offline_hit", offline=offline)
+    
     try:
-        # Build API URL
-        api_url = f"https://vpic.nhtsa.dot.gov/api/vehicles/DecodeVinValues/{vin}"
-        params = {"format": "json"}
+        # Fresh cache entries answer without touching the network
+        cached = get_cached_decode(vin, model_year)
+        if cached and not cached.expired:
+            record_stat(cached.status)
+            return build_decode_response(cached.raw_result, cached.mapped_data, cached.status, cached.decoded_on, offline)
         
-        if model_year:
-            params["modelyear"] = model_year
+        try:
+            result = fetch_vin_decode(vin, model_year)
+        except requests.exceptions.RequestException:
+            # Serve an expired entry rather than nothing while vPIC is unreachable
+            if cached:
+                record_stat("stale_hit")
+                return build_decode_response(cached.raw_result, cached.mapped_data, "stale_hit", cached.decoded_on, offline)
+            # Then whatever the VIN tells by itself
+            if offline["make"]:
+                record_stat("offline_hit")
+                return build_decode_response(offline_result, map_to_vehicle_fields(offline_result), "offline_hit", offline=offline)
+            raise
         
-        # Make API request
-        response = requests.get(api_url, params=params, timeout=15)
-        response.raise_for_status()
+        record_stat("miss")
         
-        data = response.json()
-        
-        if data.get("Results") and len(data["Results"]) > 0:
-            result = data["Results"][0]
-            
+        if result:
             # Check for errors
             error_code = result.get("ErrorCode", "")
             if "0" in error_code:
                 # Map to your DocType fields
                 mapped_data = map_to_vehicle_fields(result)
+                store_decode(vin, model_year, result, mapped_data)
                 
-                # Create manufacturer and model if they don't exist
-                make_name = create_manufacturer_if_not_exists(result)
-                model_name = create_vehicle_model_if_not_exists(result, make_name)
-                
-                # Add the linked fields to mapped data
-                if make_name:
-                    mapped_data['custom_make'] = make_name
-                    frappe.msgprint(_("Manufacturer set: {0}").format(make_name), indicator='blue', alert=True)
-                    
-                if model_name:
-                    mapped_data['model'] = model_name
-                    frappe.msgprint(_("Model set: {0}").format(model_name), indicator='blue', alert=True)
-                
-                return {
-                    "success": True,
-                    "data": mapped_data,
-                    "raw_data": result,
-                    "message": _("VIN decoded successfully")
-                }
+                return build_decode_response(result, mapped_data, "miss", offline=offline)
             else:
                 return {
                     "success": False,
@@ -110,6 +144,93 @@ def decode_vehicle_vin(vin, model_year=None):
         }
 
 
+def get_vpic_base_url():
+    # Overridable in site config, the tests point it at a local fake server
+    return (frappe.conf.get("vpic_base_url") or VPIC_BASE_URL).rstrip("/")
+
+
+def fetch_vin_decode(vin, model_year=None):
+    """
+    Call vPIC DecodeVinValues, returns Results[0] or None
+    """
+    # Build API URL
+    api_url = f"{get_vpic_base_url()}/DecodeVinValues/{vin}"
+    params = {"format": "json"}
+    
+    if model_year:
+        params["modelyear"] = model_year
+    
+    # Make API request
+    response = integration_client.get(api_url, endpoint="vpic.decode_vin", params=params, timeout=15)
+    response.raise_for_status()
+    
+    data = response.json()
+    results = data.get("Results")
+    return results[0] if results else None
+
+
+def fetch_vin_decodes_batch(entries):
+    """
+    Call vPIC DecodeVINValuesBatch for up to VPIC_BATCH_SIZE (vin, model_year)
+    pairs, returns {vin: result row}
+    """
+    data = ";".join(f"{vin},{model_year}" if model_year else vin for vin, model_year in entries)
+    # Read-only despite the POST, safe to retry
+    response = integration_client.post(
+        f"{get_vpic_base_url()}/DecodeVINValuesBatch/",
+        endpoint="vpic.decode_vin_batch",
+        data={"format": "json", "data": data},
+        timeout=60,
+        idempotent=True
+    )
+    response.raise_for_status()
+    
+    return {
+        (row.get("VIN") or "").strip().upper(): row
+        for row in response.json().get("Results") or []
+    }
+
+
+def build_decode_response(result, mapped_data, cache_status, decoded_on=None, offline=None):
+    """
+    Link manufacturer and model to the mapped fields and report cache use
+    Values vPIC left out are filled from the offline decode
+    """
+    mapped_data = dict(mapped_data)
+    if offline:
+        if not mapped_data.get("model_year") and offline["model_year"]:
+            mapped_data["model_year"] = str(offline["model_year"])
+        if not result.get("Make") and offline["make"]:
+            result = dict(result, Make=offline["make"])
+    
+    # Create manufacturer and model if they don't exist
+    make_name = create_manufacturer_if_not_exists(result)
+    model_name = create_vehicle_model_if_not_exists(result, make_name)
+    
+    # Add the linked fields to mapped data
+    if make_name:
+        mapped_data['custom_make'] = make_name
+        frappe.msgprint(_("Manufacturer set: {0}").format(make_name), indicator='blue', alert=True)
+        
+    if model_name:
+        mapped_data['model'] = model_name
+        frappe.msgprint(_("Model set: {0}").format(model_name), indicator='blue', alert=True)
+    
+    return {
+        "success": True,
+        "data": mapped_data,
+        "raw_data": result,
+        "message": _("VIN decoded successfully"),
+        "check_digit_valid": offline and offline["check_digit_valid"],
+        "cache": {
+            "status": cache_status,
+            "decoded_on": decoded_on or frappe.utils.now_datetime(),
+            # Cache internals are for System Managers only
+            "stats": read_cache_stats() if "System Manager" in frappe.get_roles() else None
+        }
+    }
+
+
 def create_manufacturer_if_not_exists(api_data):
     """
     Create Manufacturers record if it doesn't exist
@@ -118,67 +239,9 @@ def create_manufacturer_if_not_exists(api_data):
         api_data (dict): API response data
     
     Returns:
-        str: Manufacturer name
+        str: Manufacturers docname
     """
-    make = api_data.get("Make")
-    if not make or make == "Not Applicable":
-        return None
-    
-    # Clean the make name
-    make = make.strip()
-    
-    # Check if manufacturer exists - use a more robust check
-    existing_make = frappe.db.get_value("Manufacturers", 
-        filters={"name1": make}, 
-        fieldname="name"
-    )
-    
-    if existing_make:
-        return existing_make
-    
-    try:
-        # Double-check before creating (prevent race condition)
-        existing_make = frappe.db.get_value("Manufacturers", 
-            filters={"name1": make}, 
-            fieldname="name"
-        )
-        
-        if existing_make:
-            return existing_make
-        
-        # Create new manufacturer
-        manufacturer_doc = frappe.get_doc({
-            "doctype": "Manufacturers",
-            "manufacturers_name": make,
-            # Add any other required fields for your Manufacturers doctype
-        })
-        
-        manufacturer_doc.insert(ignore_permissions=True, ignore_if_duplicate=True)
-        frappe.db.commit()
-        
-        frappe.msgprint(_("Created new manufacturer: {0}").format(make), alert=True)
-        
-        # Return the name of the created document
-        return manufacturer_doc.name
-        
-    except frappe.DuplicateEntryError:
-        # Manufacturer was created by another process, fetch and return it
-        frappe.db.rollback()
-        existing_make = frappe.db.get_value("Manufacturers", 
-            filters={"manufacturers_name": make}, 
-            fieldname="name"
-        )
-        return existing_make
-        
-    except Exception as e:
-        frappe.log_error(f"Error creating manufacturer {make}: {str(e)}", "VIN Decoder")
-        frappe.db.rollback()
-        # Try to return existing manufacturer if any
-        existing_make = frappe.db.get_value("Manufacturers", 
-            filters={"manufacturers_name": make}, 
-            fieldname="name"
-        )
-        return existing_make if existing_make else None
+    return resolve_manufacturer(api_data.get("Make"))
 
 
 def create_vehicle_model_if_not_exists(api_data, manufacturer_name):
@@ -187,78 +250,12 @@ def create_vehicle_model_if_not_exists(api_data, manufacturer_name):
     
     Args:
         api_data (dict): API response data
-        name1 (str): Manufacturer name from Manufacturers doctype
+        manufacturer_name (str): Manufacturers docname
     
     Returns:
-        str: Model name
+        str: Vehicles Model docname
     """
-    model = api_data.get("Model")
-    if not model or model == "Not Applicable":
-        return None
-    
-    # Clean the model name
-    model = model.strip()
-    
-    # Check if model exists - use a more robust check
-    existing_model = frappe.db.get_value("Vehicles Model", 
-        filters={"model_name": model}, 
-        fieldname="name"
-    )
-    
-    if existing_model:
-        return existing_model
-    
-    try:
-        # Get vehicle type from API
-        vehicle_type = api_data.get("VehicleType")
-        if vehicle_type and vehicle_type != "Not Applicable":
-            vehicle_type = vehicle_type.strip()
-        else:
-            vehicle_type = None
-        
-        # Double-check before creating (prevent race condition)
-        existing_model = frappe.db.get_value("Vehicles Model", 
-            filters={"model_name": model}, 
-            fieldname="name"
-        )
-        
-        if existing_model:
-            return existing_model
-        
-        # Create new vehicle model
-        model_doc = frappe.get_doc({
-            "doctype": "Vehicles Model",
-            "model_name": model,
-            "manufacturer": name1,
-            "vehicle_type": vehicle_type,
-        })
-        
-        model_doc.insert(ignore_permissions=True, ignore_if_duplicate=True)
-        frappe.db.commit()
-        
-        frappe.msgprint(_("Created new vehicle model: {0}").format(model), alert=True)
-        
-        # Return the name of the created document
-        return model_doc.name
-        
-    except frappe.DuplicateEntryError:
-        # Model was created by another process, fetch and return it
-        frappe.db.rollback()
-        existing_model = frappe.db.get_value("Vehicles Model", 
-            filters={"model_name": model}, 
-            fieldname="name"
-        )
-        return existing_model
-        
-    except Exception as e:
-        frappe.log_error(f"Error creating vehicle model {model}: {str(e)}", "VIN Decoder")
-        frappe.db.rollback()
-        # Try to return existing model if any
-        existing_model = frappe.db.get_value("Vehicles Model", 
-            filters={"model_name": model}, 
-            fieldname="name"
-        )
-        return existing_model if existing_model else None
+    return resolve_vehicle_model(api_data.get("Model"), manufacturer_name, api_data.get("VehicleType"))
 
 
 def map_to_vehicle_fields(api_data):
@@ -399,8 +396,8 @@ def auto_fill_vehicle(doc_name, vin, model_year=None):
     Returns:
         dict: Result
     """
-    # Decode VIN
-    result = decode_vehicle_vin(vin, model_year)
+    # Decode VIN, every field (the default is the offline subset)
+    result = decode_vehicle_vin(vin, model_year, fields="*")
     
     if not result.get("success"):
         return result
@@ -434,6 +431,157 @@ def auto_fill_vehicle(doc_name, vin, model_year=None):
     }
 
 
+@frappe.whitelist()
+def decode_vins_bulk(vehicles):
+    """
+    Decode the VINs of many Vehicles and fill them in a background job
+    
+    Args:
+        vehicles (list): Names of Vehicles documents
+    
+    Returns:
+        dict: job_id to match the BULK_DECODE_EVENT realtime messages
+    """
+    if isinstance(vehicles, str):
+        vehicles = json.loads(vehicles)
+    vehicles = list(dict.fromkeys(vehicles or []))
+    
+    if not vehicles:
+        frappe.throw(_("No vehicles selected"))
+    if len(vehicles) > BULK_DECODE_LIMIT:
+        frappe.throw(_("Cannot decode more than {0} vehicles at once").format(BULK_DECODE_LIMIT))
+    
+    # Vehicles are written directly by the job
+    frappe.has_permission("Vehicles", "write", throw=True)
+    
+    job_id = frappe.generate_hash(length=12)
+    frappe.enqueue(
+        "leetrental.leetrental.doctype.vehicles.api.apply_vin_decodes_bulk",
+        queue="long",
+        timeout=3600,
+        vehicles=vehicles,
+        user=frappe.session.user,
+        progress_id=job_id
+    )
+    
+    return {"success": True, "job_id": job_id, "total": len(vehicles)}
+
+
+def apply_vin_decodes_bulk(vehicles, user=None, progress_id=None):
+    """
+    Background job behind decode_vins_bulk
+    
+    Cached decodes are reused, the rest go to vPIC in batches of
+    VPIC_BATCH_SIZE over the pooled session. Each distinct make and model
+    is resolved once, and vehicles are updated with one UPDATE each.
+    """
+    from leetrental.leetrental.api.vehicle_search import reindex_vehicles
+    from leetrental.leetrental.api.vehicles_kanban import bump_fleet_version
+    
+    rows = frappe.get_all(
+        "Vehicles",
+        fields=["name", "chassis_number", "model_year"],
+        filters={"name": ("in", vehicles)}
+    )
+    total = len(rows)
+    decodes = {}  # vehicle name -> (raw result, mapped data)
+    failed = {}  # vehicle name -> reason
+    pending = []
+    
+    def publish(stage, done):
+        frappe.publish_realtime(BULK_DECODE_EVENT, {
+            "job_id": progress_id,
+            "stage": stage,
+            "done": done,
+            "total": total,
+            "failed": len(failed)
+        }, user=user)
+    
+    # Cached decodes first
+    for row in rows:
+        vin = (row.chassis_number or "").strip().upper()
+        if len(vin) < 11:
+            failed[row.name] = _("VIN must be at least 11 characters long")
+            continue
+        
+        row.vin = vin
+        model_year = row.model_year or None
+        cached = get_cached_decode(vin, model_year)
+        if cached and not cached.expired:
+            record_stat(cached.status)
+            decodes[row.name] = (cached.raw_result, cached.mapped_data)
+        else:
+            pending.append(row)
+    
+    publish("decoding", len(decodes))
+    
+    # Then vPIC, one request per batch
+    for start in range(0, len(pending), VPIC_BATCH_SIZE):
+        chunk = pending[start:start + VPIC_BATCH_SIZE]
+        try:
+            results = fetch_vin_decodes_batch([(row.vin, row.model_year or None) for row in chunk])
+        except requests.exceptions.RequestException as e:
+            frappe.log_error(f"VIN Batch Decode Error: {str(e)}", "VIN Decoder")
+            for row in chunk:
+                failed[row.name] = _("Failed to connect to VIN decoder service")
+            continue
+        
+        for row in chunk:
+            result = results.get(row.vin)
+            record_stat("miss")
+            if result and "0" in (result.get("ErrorCode") or ""):
+                mapped_data = map_to_vehicle_fields(result)
+                store_decode(row.vin, row.model_year or None, result, mapped_data)
+                decodes[row.name] = (result, mapped_data)
+            else:
+                failed[row.name] = (result or {}).get("ErrorText") or _("Unable to decode VIN")
+        
+        frappe.db.commit()
+        publish("decoding", len(decodes) + len(failed))
+    
+    # Each distinct make / model is looked up or created once (catalog LRU)
+    meta = frappe.get_meta("Vehicles")
+    applied = []
+    
+    for vehicle_name, (result, mapped_data) in decodes.items():
+        values = {
+            field: value for field, value in mapped_data.items()
+            if not field.startswith("_") and meta.has_field(field)
+        }
+        
+        make_name = create_manufacturer_if_not_exists(result)
+        model_name = create_vehicle_model_if_not_exists(result, make_name)
+        
+        if make_name and meta.has_field("custom_make"):
+            values["custom_make"] = make_name
+        if model_name and meta.has_field("model"):
+            values["model"] = model_name
+        
+        if values:
+            frappe.db.set_value("Vehicles", vehicle_name, values)
+            applied.append(vehicle_name)
+            
+            if len(applied) % VPIC_BATCH_SIZE == 0:
+                frappe.db.commit()
+                publish("applying", len(applied))
+    
+    # Direct updates skip the Vehicles hooks
+    reindex_vehicles(applied)
+    frappe.db.commit()
+    bump_fleet_version()
+    
+    frappe.publish_realtime(BULK_DECODE_EVENT, {
+        "job_id": progress_id,
+        "stage": "done",
+        "done": total,
+        "total": total,
+        "applied": len(applied),
+        "failed": [{"vehicle": name, "message": message} for name, message in failed.items()]
+    }, user=user)
+    
+    return {"applied": applied, "failed": failed}
+
+
 @frappe.whitelist()
 def validate_vin(vin):
     """
@@ -463,5 +611,16 @@ def validate_vin(vin):
                 "valid": False,
                 "message": f"VIN cannot contain letters: {', '.join(found_invalid)}"
             }
+        
+        # Mandatory for North American VINs, informative elsewhere
+        if requires_check_digit(vin) and not is_check_digit_valid(vin):
+            return {"valid": False, "message": "VIN check digit (position 9) does not match"}
     
-    return {"valid": True, "message": "VIN is valid"}
+    offline = decode_vin_offline(vin)
+    return {
+        "valid": True,
+        "message": "VIN is valid",
+        "check_digit_valid": offline["check_digit_valid"],
+        "model_year": offline["model_year"],
+        "make": offline["make"]
+    }
@@ -0,0 +1,169 @@
+# Manufacturers / Vehicles Model resolution for VIN decoding and imports
+
+import re
+from collections import OrderedDict
+
+import frappe
+
+# Bumped when a catalog entry is renamed, edited or deleted
+CATALOG_VERSION_KEY = "leetrental_vehicle_catalog_version"
+CATALOG_CACHE_SIZE = 4096
+
+# (site, doctype, normalized key) -> docname, most recently used last
+_catalog_cache = OrderedDict()
+# site -> catalog version the entries above were cached under
+_catalog_versions = {}
+
+_whitespace = re.compile(r"\s+")
+
+# vPIC placeholders that mean "no value"
+EMPTY_VALUES = ("", "not applicable", "null")
+
+
+def normalize_catalog_name(value):
+    """
+    Trim and collapse whitespace, None for vPIC placeholders
+    """
+    value = _whitespace.sub(" ", str(value or "")).strip()
+    return None if value.lower() in EMPTY_VALUES else value
+
+
+def resolve_manufacturer(make, create=True):
+    """
+    Manufacturers docname for a make, inserted if missing (unless create=False)
+    """
+    make = normalize_catalog_name(make)
+    if not make:
+        return None
+
+    return get_or_create(
+        "Manufacturers",
+        make.casefold(),
+        {"name1": make},
+        {"name1": make} if create else None
+    )
+
+
+def resolve_vehicle_model(model, manufacturer=None, vehicle_type=None, create=True):
+    """
+    Vehicles Model docname for a model of a manufacturer, inserted if missing
+    """
+    model = normalize_catalog_name(model)
+    if not model:
+        return None
+
+    values = None
+    if create:
+        # Blank rather than NULL, the unique index treats NULLs as distinct
+        values = {"model_name": model, "manufacturer": manufacturer or ""}
+        # Select field, only keep values it accepts
+        vehicle_type = normalize_catalog_name(vehicle_type)
+        options = (frappe.get_meta("Vehicles Model").get_options("vehicle_type") or "").split("\n")
+        if vehicle_type and vehicle_type in options:
+            values["vehicle_type"] = vehicle_type
+
+    return get_or_create(
+        "Vehicles Model",
+        f"{manufacturer or ''}\n{model.casefold()}",
+        {"model_name": model, "manufacturer": manufacturer or ("is", "not set")},
+        values
+    )
+
+
+def get_or_create(doctype, key, filters, values=None):
+    """
+    Cached lookup by `filters`, then an insert of `values` (if given)
+
+    The unique index on the catalog keeps concurrent inserts from creating
+    duplicates: the loser rolls back to a savepoint and reads the winner.
+    Nothing is committed here; a new name is dropped from the cache again
+    if the transaction rolls back (names are autoincrement, never reused).
+    """
+    check_catalog_version()
+    cache_key = (frappe.local.site, doctype, key)
+
+    name = _catalog_cache.get(cache_key)
+    if name:
+        _catalog_cache.move_to_end(cache_key)
+        return name
+
+    name = frappe.db.get_value(doctype, filters, "name")
+    if not name and values:
+        frappe.db.savepoint("catalog_insert")
+        try:
+            doc = frappe.get_doc(dict(values, doctype=doctype))
+            doc.flags.from_catalog = True
+            doc.insert(ignore_permissions=True)
+            name = doc.name
+            frappe.db.after_rollback.add(lambda: uncache_catalog_name(cache_key, name))
+        except (frappe.DuplicateEntryError, frappe.UniqueValidationError):
+            frappe.db.rollback(save_point="catalog_insert")
+            name = frappe.db.get_value(doctype, filters, "name")
+
+    if name:
+        _catalog_cache[cache_key] = name
+        if len(_catalog_cache) > CATALOG_CACHE_SIZE:
+            _catalog_cache.popitem(last=False)
+
+    return name
+
+
+def uncache_catalog_name(cache_key, name):
+    if _catalog_cache.get(cache_key) == name:
+        del _catalog_cache[cache_key]
+
+
+def check_catalog_version():
+    """
+    Drop this site's cached entries if another process changed the catalog
+    """
+    site = frappe.local.site
+    version = frappe.cache().get_value(CATALOG_VERSION_KEY)
+    if _catalog_versions.get(site) != version:
+        for cache_key in [k for k in _catalog_cache if k[0] == site]:
+            del _catalog_cache[cache_key]
+        _catalog_versions[site] = version
+
+
+def clear_catalog_cache(doc=None, method=None):
+    """
+    Hooked on Manufacturers and Vehicles Model on_update / on_trash / after_rename
+
+    New entries do not invalidate anything, only changes to existing ones.
+    """
+    if doc and method == "on_update" and not doc.get_doc_before_save():
+        return
+
+    frappe.cache().set_value(CATALOG_VERSION_KEY, frappe.generate_hash(length=10))
+    check_catalog_version()
+
+
+def add_unique_index(doctype, fields, constraint_name):
+    """
+    Add a unique index unless existing duplicates would make it fail
+
+    NULLs never collide in a unique index, so callers store blanks as ''
+    (see blank_nulls) and duplicates are looked for the same way.
+    """
+    columns = ", ".join(f"IFNULL(`{f}`, '')" for f in fields)
+    duplicates = frappe.db.sql(f"""
+        SELECT {columns}
+        FROM `tab{doctype}`
+        GROUP BY {columns}
+        HAVING COUNT(*) > 1
+        LIMIT 1
+    """)
+    if duplicates:
+        frappe.logger("leetrental").warning(
+            f"Skipping unique index on {doctype} ({', '.join(fields)}): merge duplicates like {duplicates[0]} first"
+        )
+        return
+
+    frappe.db.add_unique(doctype, fields, constraint_name=constraint_name)
+
+
+def blank_nulls(doctype, field):
+    """
+    Store '' instead of NULL in `field`, so a unique index covers blank values
+    """
+    frappe.db.sql(f"UPDATE `tab{doctype}` SET `{field}` = '' WHERE `{field}` IS NULL")
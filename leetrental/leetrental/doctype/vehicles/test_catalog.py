@@ -0,0 +1,50 @@
+# Copyright (c) 2024, LeetRental and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.doctype.vehicles import catalog
+from leetrental.leetrental.doctype.vehicles.catalog import resolve_manufacturer, resolve_vehicle_model
+
+
+class TestVehicleCatalog(FrappeTestCase):
+	def test_manufacturer_insert_or_get(self):
+		"""One Manufacturers record per make, whatever the spacing"""
+		name = resolve_manufacturer("CATALOG  TEST MAKE")
+		self.assertEqual(frappe.db.get_value("Manufacturers", name, "name1"), "CATALOG TEST MAKE")
+		self.assertEqual(resolve_manufacturer(" CATALOG TEST MAKE "), name)
+		self.assertIsNone(resolve_manufacturer("Not Applicable"))
+
+	def test_model_per_manufacturer(self):
+		"""Models are keyed by manufacturer and name, unknown vehicle types are dropped"""
+		make = resolve_manufacturer("CATALOG TEST MAKE")
+		model = resolve_vehicle_model("Catalog Test Model", make, "MULTIPURPOSE PASSENGER VEHICLE (MPV)")
+		self.assertEqual(resolve_vehicle_model("Catalog Test Model", make), model)
+		self.assertFalse(frappe.db.get_value("Vehicles Model", model, "vehicle_type"))
+
+	def test_model_without_manufacturer(self):
+		"""Models without a manufacturer are stored blank, so the unique index still applies"""
+		model = resolve_vehicle_model("Catalog Orphan Model")
+		self.assertEqual(frappe.db.get_value("Vehicles Model", model, "manufacturer"), "")
+		self.assertEqual(resolve_vehicle_model("Catalog Orphan Model", None), model)
+
+		duplicate = frappe.get_doc({"doctype": "Vehicles Model", "model_name": "Catalog Orphan Model"})
+		self.assertRaises((frappe.DuplicateEntryError, frappe.UniqueValidationError), duplicate.insert)
+
+	def test_lookup_without_create(self):
+		self.assertIsNone(resolve_manufacturer("CATALOG MISSING MAKE", create=False))
+		self.assertFalse(frappe.db.exists("Manufacturers", {"name1": "CATALOG MISSING MAKE"}))
+
+	def test_rolled_back_insert_is_not_cached(self):
+		"""A name inserted in a transaction that rolls back is not served afterwards"""
+		make = resolve_manufacturer("CATALOG ROLLBACK MAKE")
+		frappe.db.rollback()
+
+		self.assertFalse(frappe.db.exists("Manufacturers", make))
+		again = resolve_manufacturer("CATALOG ROLLBACK MAKE")
+		self.assertTrue(frappe.db.exists("Manufacturers", again))
+
+	def tearDown(self):
+		frappe.db.rollback()
+		catalog._catalog_cache.clear()
@@ -0,0 +1,77 @@
+# Copyright (c) 2024, LeetRental and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.doctype.vehicles import api, catalog
+from leetrental.leetrental.tests.fake_vpic import FakeVPICServer
+
+TEST_VINS = {
+	"BULK-001": "2HGFB2F59DH000001",
+	"BULK-002": "2HGFB2F59DH000002",
+	"BULK-003": "2HGFB2F59DH000003",
+}
+
+
+class TestVINBulkDecode(FrappeTestCase):
+	def setUp(self):
+		"""Vehicles whose VINs the fake vPIC server knows, except the last one"""
+		self.server = FakeVPICServer({
+			TEST_VINS["BULK-001"]: {"Make": "HONDA", "Model": "Civic", "ModelYear": "2013"},
+			TEST_VINS["BULK-002"]: {"Make": "HONDA", "Model": "Civic", "ModelYear": "2013"},
+		}).start()
+		frappe.conf.vpic_base_url = self.server.base_url
+
+		# Catalog entries the decodes create are removed again in tearDown
+		self.manufacturers = set(frappe.get_all("Manufacturers", filters={"name1": "HONDA"}, pluck="name"))
+		self.models = set(frappe.get_all("Vehicles Model", filters={"model_name": "Civic"}, pluck="name"))
+
+		for plate, vin in TEST_VINS.items():
+			frappe.db.delete("VIN Decode Cache", {"vin": vin})
+			if not frappe.db.exists("Vehicles", plate):
+				frappe.get_doc({
+					"doctype": "Vehicles",
+					"license_plate": plate,
+					"chassis_number": vin,
+					"custom_engine_number": f"ENG-{plate}",
+					"model_year": 2013
+				}).insert()
+
+	def test_batches_and_apply(self):
+		"""Uncached VINs go out in batches and decoded fields are applied"""
+		with patch.object(api, "VPIC_BATCH_SIZE", 2):
+			result = api.apply_vin_decodes_bulk(list(TEST_VINS))
+
+		batch_requests = [r for r in self.server.requests if r[0] == "POST"]
+		self.assertEqual(len(batch_requests), 2)
+		self.assertEqual(sorted(result["applied"]), ["BULK-001", "BULK-002"])
+		self.assertIn("BULK-003", result["failed"])
+
+		self.assertTrue(frappe.db.get_value("VIN Decode Cache", {"vin": TEST_VINS["BULK-001"]}))
+
+	def test_cached_vins_skip_network(self):
+		"""A second run is answered from the decode cache"""
+		api.apply_vin_decodes_bulk(["BULK-001"])
+		self.server.requests.clear()
+
+		result = api.apply_vin_decodes_bulk(["BULK-001"])
+		self.assertEqual(result["applied"], ["BULK-001"])
+		self.assertFalse(self.server.requests)
+
+	def tearDown(self):
+		"""The job commits, so clean up explicitly"""
+		self.server.stop()
+		frappe.conf.pop("vpic_base_url", None)
+		for plate, vin in TEST_VINS.items():
+			frappe.db.delete("VIN Decode Cache", {"vin": vin})
+			if frappe.db.exists("Vehicles", plate):
+				frappe.delete_doc("Vehicles", plate, force=True)
+		for name in set(frappe.get_all("Vehicles Model", filters={"model_name": "Civic"}, pluck="name")) - self.models:
+			frappe.delete_doc("Vehicles Model", name, force=True)
+		for name in set(frappe.get_all("Manufacturers", filters={"name1": "HONDA"}, pluck="name")) - self.manufacturers:
+			frappe.delete_doc("Manufacturers", name, force=True)
+		frappe.db.commit()
+		catalog._catalog_cache.clear()
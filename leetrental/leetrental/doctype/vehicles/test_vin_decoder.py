@@ -0,0 +1,81 @@
+# Copyright (c) 2024, LeetRental and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental import integration_client
+from leetrental.leetrental.doctype.vehicles import api, catalog
+from leetrental.leetrental.doctype.vehicles.vin_decoder import (
+	compute_check_digit,
+	decode_model_year,
+	decode_vin_offline,
+)
+
+
+VPIC_ROW = {
+	"VIN": "1HGCM82633A004352",
+	"Make": "HONDA",
+	"Model": "Accord",
+	"ModelYear": "2003",
+	"FuelTypePrimary": "Gasoline",
+	"BodyClass": "Coupe",
+}
+
+
+class TestVINDecoder(FrappeTestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+		catalog._catalog_cache.clear()
+
+	def test_check_digit(self):
+		"""Position 9 follows the ISO 3779 weighted sum"""
+		self.assertEqual(compute_check_digit("1HGCM82633A004352"), "3")
+		self.assertEqual(compute_check_digit("11111111111111111"), "1")
+
+	def test_model_year(self):
+		"""Position 7 picks the 30 year cycle for North American VINs"""
+		self.assertEqual(decode_model_year("1HGCM82633A004352"), 2003)
+		self.assertEqual(decode_model_year("5YJ3E1EA7KF317000"), 2019)
+		self.assertIsNone(decode_model_year("1HGCM8263"))
+
+	def test_offline_decode(self):
+		"""Make and year without the network, bad check digits flagged"""
+		decoded = decode_vin_offline("1HGCM82633A004352")
+		self.assertEqual(decoded["make"], "HONDA")
+		self.assertEqual(decoded["model_year"], 2003)
+		self.assertTrue(decoded["valid"])
+
+		self.assertFalse(decode_vin_offline("1HGCM82643A004352")["valid"])
+
+	def test_decode_is_local_first(self):
+		"""Without fields the form decode makes no HTTP call when the VIN has make and year"""
+		with patch.object(integration_client, "request") as request:
+			result = api.decode_vehicle_vin("1HGCM82633A004352")
+
+		request.assert_not_called()
+		self.assertTrue(result["success"])
+		self.assertEqual(result["cache"]["status"], "offline_hit")
+		self.assertEqual(result["data"]["model_year"], "2003")
+		self.assertEqual(result["raw_data"]["Make"], "HONDA")
+
+	def test_auto_fill_decodes_every_field(self):
+		"""Server-side auto-fill still sets the model and fuel, not only make and year"""
+		vehicle = frappe.get_doc({
+			"doctype": "Vehicles",
+			"license_plate": "VINFILL-101",
+			"chassis_number": VPIC_ROW["VIN"],
+			"custom_engine_number": "VINFILL-ENG-1",
+			"model_year": 2003
+		}).insert()
+
+		with patch.object(api, "get_cached_decode", return_value=None), \
+				patch.object(api, "fetch_vin_decode", return_value=dict(VPIC_ROW)):
+			result = api.auto_fill_vehicle(vehicle.name, VPIC_ROW["VIN"])
+
+		self.assertTrue(result["success"])
+		vehicle.reload()
+		self.assertEqual(frappe.db.get_value("Vehicles Model", vehicle.model, "model_name"), "Accord")
+		self.assertEqual(vehicle.fuel_type, "Gasoline")
@@ -78,8 +78,11 @@ function validate_vin_format(frm, vin) {
     });
 }
 
-function decode_vehicle_vin(frm) {
+// Without `fields` the server decodes make and year from the VIN itself;
+// a second call with fields ['*'] then asks vPIC for the model and the rest
+function decode_vehicle_vin(frm, fields) {
     const vin = frm.doc.chassis_number;
+    const remote = !!fields;
     
     if (!vin || vin.length < 11) {
         frappe.msgprint({
@@ -90,18 +93,21 @@ function decode_vehicle_vin(frm) {
         return;
     }
     
-    // Show loading indicator
-    frappe.dom.freeze(__('Decoding VIN from NHTSA database...<br><small>Creating missing records if needed...</small>'));
+    // Show loading indicator, the vPIC follow-up runs in the background
+    if (!remote) {
+        frappe.dom.freeze(__('Decoding VIN...<br><small>Creating missing records if needed...</small>'));
+    }
     
     // Call server-side method
     frappe.call({
         method: 'leetrental.leetrental.doctype.vehicles.api.decode_vehicle_vin',
         args: {
             vin: vin,
-            model_year: frm.doc.model_year || null
+            model_year: frm.doc.model_year || null,
+            fields: fields || null
         },
         callback: function(r) {
-            frappe.dom.unfreeze();
+            if (!remote) frappe.dom.unfreeze();
             
             if (r.message && r.message.success) {
                 const data = r.message.data;
@@ -135,6 +141,11 @@ function decode_vehicle_vin(frm) {
                     indicator: 'green'
                 }, 10);
                 
+                // Make and year came from the VIN alone, fetch the model and the rest
+                if (!remote && r.message.cache && r.message.cache.status === 'offline_hit') {
+                    decode_vehicle_vin(frm, ['*']);
+                }
+                
             } else {
                 frappe.msgprint({
                     title: __('Decoding Failed'),
@@ -144,7 +155,7 @@ function decode_vehicle_vin(frm) {
             }
         },
         error: function(err) {
-            frappe.dom.unfreeze();
+            if (!remote) frappe.dom.unfreeze();
             frappe.msgprint({
                 title: __('Error'),
                 message: __('Failed to decode VIN. Please try again.'),
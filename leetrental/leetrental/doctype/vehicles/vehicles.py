@@ -19,3 +19,10 @@ def update_odometer(docname):
 	p = data[0][0]
 	return p
 
+
+def on_doctype_update():
+	# Kanban columns are paged by (status, modified, name)
+	for status_field in ("vehicle_status", "workflow_state"):
+		if frappe.db.has_column("Vehicles", status_field):
+			frappe.db.add_index("Vehicles", [status_field, "modified", "name"])
+			break
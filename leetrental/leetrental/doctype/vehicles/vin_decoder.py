@@ -0,0 +1,134 @@
+# Offline VIN decoder: check digit, model year and WMI manufacturer lookup
+
+import json
+import os
+from functools import lru_cache
+
+import frappe
+
+from leetrental.leetrental.doctype.vehicles.catalog import resolve_manufacturer
+
+# ISO 3779 / FMVSS 565 transliteration and position weights
+TRANSLITERATION = {
+    **{str(d): d for d in range(10)},
+    "A": 1, "B": 2, "C": 3, "D": 4, "E": 5, "F": 6, "G": 7, "H": 8,
+    "J": 1, "K": 2, "L": 3, "M": 4, "N": 5, "P": 7, "R": 9,
+    "S": 2, "T": 3, "U": 4, "V": 5, "W": 6, "X": 7, "Y": 8, "Z": 9,
+}
+WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# Position 10 codes, 1980 onwards in a 30 year cycle
+MODEL_YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"
+
+# Fields decode_vehicle_vin can fill without the network
+OFFLINE_FIELDS = ("custom_make", "model_year")
+
+WMI_TABLE_PATH = os.path.join(os.path.dirname(__file__), "wmi_codes.json")
+
+
+@lru_cache(maxsize=1)
+def get_wmi_table():
+    """
+    Bundled World Manufacturer Identifier table: WMI -> {make, country}
+    Makes are spelled the way vPIC returns them
+    """
+    with open(WMI_TABLE_PATH) as f:
+        return json.load(f)
+
+
+def compute_check_digit(vin):
+    """
+    Expected position 9 character of a 17 character VIN, None if it has
+    characters outside the VIN alphabet
+    """
+    total = 0
+    for char, weight in zip(vin, WEIGHTS):
+        value = TRANSLITERATION.get(char)
+        if value is None:
+            return None
+        total += value * weight
+
+    remainder = total % 11
+    return "X" if remainder == 10 else str(remainder)
+
+
+def is_check_digit_valid(vin):
+    return len(vin) == 17 and compute_check_digit(vin) == vin[8]
+
+
+def requires_check_digit(vin):
+    """
+    The check digit is mandatory for North American VINs only
+    """
+    return vin[:1] in "12345"
+
+
+def decode_model_year(vin):
+    """
+    Model year from position 10
+
+    North American passenger VINs tell the cycle by position 7 (a digit
+    means 1980-2009, a letter 2010-2039). Elsewhere the latest year not
+    after next year is used.
+    """
+    if len(vin) != 17:
+        return None
+
+    idx = MODEL_YEAR_CODES.find(vin[9])
+    if idx < 0:
+        return None
+
+    year = 1980 + idx
+    if requires_check_digit(vin):
+        return year + 30 if vin[6].isalpha() else year
+
+    latest = frappe.utils.getdate().year + 1
+    while year + 30 <= latest:
+        year += 30
+    return year
+
+
+def get_manufacturer(make):
+    """
+    Manufacturers docname for a make, None if it is not in the catalog yet
+    """
+    return resolve_manufacturer(make, create=False)
+
+
+def decode_vin_offline(vin):
+    """
+    Decode what a VIN tells without the network
+
+    Returns a dict with vin, valid, check_digit_valid, model_year, make,
+    country and manufacturer (Manufacturers docname); unknown values are None.
+    """
+    vin = (vin or "").strip().upper()
+    wmi = get_wmi_table().get(vin[:3]) or {}
+
+    check_digit_valid = is_check_digit_valid(vin) if len(vin) == 17 else None
+    valid = len(vin) >= 11 and not set("IOQ") & set(vin)
+    if len(vin) == 17 and requires_check_digit(vin) and not check_digit_valid:
+        valid = False
+
+    return {
+        "vin": vin,
+        "valid": valid,
+        "check_digit_valid": check_digit_valid,
+        "model_year": decode_model_year(vin),
+        "make": wmi.get("make"),
+        "country": wmi.get("country"),
+        "manufacturer": get_manufacturer(wmi.get("make")),
+    }
+
+
+def to_vpic_result(decoded):
+    """
+    Shape an offline decode like a vPIC Results[0] row
+    """
+    return {
+        "VIN": decoded["vin"],
+        "Make": decoded["make"] or "",
+        "ModelYear": str(decoded["model_year"] or ""),
+        "ErrorCode": "0",
+        "ErrorText": "Decoded offline",
+    }
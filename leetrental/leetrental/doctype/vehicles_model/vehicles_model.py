@@ -5,4 +5,14 @@
 from frappe.model.document import Document
 
 class VehiclesModel(Document):
-	pass
+	def validate(self):
+		# NULL would slip past the unique (manufacturer, model_name) index
+		self.manufacturer = self.manufacturer or ""
+
+
+def on_doctype_update():
+	# Backs the insert-or-get in vehicles/catalog.py
+	from leetrental.leetrental.doctype.vehicles.catalog import add_unique_index, blank_nulls
+
+	blank_nulls("Vehicles Model", "manufacturer")
+	add_unique_index("Vehicles Model", ["manufacturer", "model_name"], "unique_vehicles_model_manufacturer")
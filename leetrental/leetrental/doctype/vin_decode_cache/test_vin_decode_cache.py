@@ -0,0 +1,44 @@
+# Copyright (c) 2024, LeetRental and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.doctype.vin_decode_cache.vin_decode_cache import (
+	get_cache_stats,
+	get_cached_decode,
+	get_pattern_key,
+	store_decode,
+)
+
+
+class TestVINDecodeCache(FrappeTestCase):
+	def test_pattern_key(self):
+		"""Check digit and serial number are not part of the pattern"""
+		self.assertEqual(get_pattern_key("1HGCM82633A004352"), "1HGCM8263A")
+		self.assertIsNone(get_pattern_key("1HGCM82633A"))
+
+	def test_full_vin_and_pattern_hits(self):
+		"""A decoded VIN answers itself and VINs sharing its pattern"""
+		store_decode("1HGCM82633A004352", None, {"VIN": "1HGCM82633A004352", "Make": "HONDA"}, {"model_year": "2003"})
+
+		entry = get_cached_decode("1HGCM82633A004352")
+		self.assertEqual(entry.status, "hit")
+		self.assertEqual(entry.mapped_data, {"model_year": "2003"})
+
+		entry = get_cached_decode("1HGCM82673A999999")
+		self.assertEqual(entry.status, "pattern_hit")
+		self.assertEqual(entry.raw_result["VIN"], "1HGCM82673A999999")
+		self.assertFalse(entry.expired)
+
+	def test_stats_for_system_managers_only(self):
+		self.assertIn("hit_rate", get_cache_stats())
+
+		frappe.set_user("Guest")
+		try:
+			self.assertRaises(frappe.PermissionError, get_cache_stats)
+		finally:
+			frappe.set_user("Administrator")
+
+	def tearDown(self):
+		frappe.db.rollback()
@@ -0,0 +1,147 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+CACHE_DOCTYPE = "VIN Decode Cache"
+DEFAULT_TTL_DAYS = 90
+
+# Redis hash of hit / pattern_hit / stale_hit / offline_hit / miss counters
+STATS_KEY = "leetrental_vin_decode_cache_stats"
+STAT_NAMES = ("hit", "pattern_hit", "stale_hit", "offline_hit", "miss")
+
+
+class VINDecodeCache(Document):
+	pass
+
+
+def get_cache_key(vin, model_year=None):
+	return f"{vin}|{model_year}" if model_year else vin
+
+
+def get_pattern_key(vin):
+	"""
+	WMI + VDS + model year character (positions 1-8 and 10), None for partial VINs
+	Position 9 is the check digit and 11-17 the plant and serial number
+	"""
+	if len(vin) != 17:
+		return None
+	return vin[:8] + vin[9]
+
+
+def get_ttl_days():
+	return frappe.utils.cint(frappe.conf.get("vin_decode_cache_ttl_days")) or DEFAULT_TTL_DAYS
+
+
+def get_cached_decode(vin, model_year=None):
+	"""
+	Look up a decode by full VIN, then by pattern
+
+	Returns a frappe._dict(raw_result, mapped_data, decoded_on, expired, status)
+	or None. Pattern matches are only used while fresh, and carry the
+	requested VIN in raw_result.
+	"""
+	fields = ["raw_result", "mapped_data", "decoded_on", "expires_on"]
+	now = frappe.utils.now_datetime()
+
+	entry = frappe.db.get_value(CACHE_DOCTYPE, get_cache_key(vin, model_year), fields, as_dict=True)
+	status = "hit"
+
+	pattern_key = get_pattern_key(vin)
+	if not entry and pattern_key:
+		entries = frappe.get_all(
+			CACHE_DOCTYPE,
+			fields=fields,
+			filters={
+				"pattern_key": pattern_key,
+				"requested_model_year": model_year or "",
+				"expires_on": (">", now)
+			},
+			order_by="decoded_on desc",
+			limit=1
+		)
+		entry = entries[0] if entries else None
+		status = "pattern_hit"
+
+	if not entry:
+		return None
+
+	entry.raw_result = frappe.parse_json(entry.raw_result) or {}
+	entry.mapped_data = frappe.parse_json(entry.mapped_data) or {}
+	entry.expired = bool(entry.expires_on and entry.expires_on <= now)
+	entry.status = status
+	if status == "pattern_hit":
+		entry.raw_result["VIN"] = vin
+
+	return entry
+
+
+def store_decode(vin, model_year, raw_result, mapped_data):
+	"""
+	Insert or refresh the cache entry of a successful decode
+	"""
+	now = frappe.utils.now_datetime()
+	key = get_cache_key(vin, model_year)
+	values = {
+		"vin": vin,
+		"requested_model_year": model_year or "",
+		"pattern_key": get_pattern_key(vin),
+		"raw_result": frappe.as_json(raw_result),
+		"mapped_data": frappe.as_json(mapped_data),
+		"decoded_on": now,
+		"expires_on": frappe.utils.add_days(now, get_ttl_days())
+	}
+
+	if frappe.db.exists(CACHE_DOCTYPE, key):
+		frappe.db.set_value(CACHE_DOCTYPE, key, values)
+	else:
+		frappe.get_doc(dict(values, doctype=CACHE_DOCTYPE, cache_key=key)).insert(
+			ignore_permissions=True, ignore_if_duplicate=True
+		)
+
+
+def record_stat(status):
+	cache = frappe.cache()
+	cache.hincrby(cache.make_key(STATS_KEY), status, 1)
+
+
+@frappe.whitelist()
+def get_cache_stats():
+	"""
+	Counters since the last reset, plus the number of cached VINs
+	"""
+	frappe.only_for("System Manager")
+	return read_cache_stats()
+
+
+def read_cache_stats():
+	cache = frappe.cache()
+	raw = cache.hgetall(cache.make_key(STATS_KEY)) or {}
+	stats = {name: 0 for name in STAT_NAMES}
+	for name, value in raw.items():
+		stats[frappe.safe_decode(name)] = frappe.utils.cint(frappe.safe_decode(value))
+
+	lookups = sum(stats.values())
+	stats["hit_rate"] = round((lookups - stats["miss"]) / lookups, 4) if lookups else 0
+	stats["entries"] = frappe.db.count(CACHE_DOCTYPE)
+	return stats
+
+
+@frappe.whitelist()
+def clear_vin_decode_cache(vin=None, reset_stats=0):
+	"""
+	Invalidate one VIN (all requested model years) or the whole cache
+	"""
+	frappe.only_for("System Manager")
+
+	if vin:
+		frappe.db.delete(CACHE_DOCTYPE, {"vin": vin.strip().upper()})
+	else:
+		frappe.db.delete(CACHE_DOCTYPE)
+
+	if frappe.utils.cint(reset_stats):
+		cache = frappe.cache()
+		cache.delete(cache.make_key(STATS_KEY))
+
+	return {"success": True}
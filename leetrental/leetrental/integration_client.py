@@ -0,0 +1,243 @@
+# Shared HTTP client for external integrations (Azure Document Intelligence, NHTSA vPIC)
+#
+#   response = integration_client.get(url, endpoint="vpic.decode_vin", params=..., timeout=15)
+#
+# - one pooled keep-alive requests.Session per host and worker process
+# - bounded retries with jittered exponential backoff, honouring Retry-After
+# - a per-host circuit breaker that fails fast after repeated errors
+# - per-endpoint call / error / retry / latency counters in Redis
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import frappe
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 5
+DEFAULT_RETRIES = 2
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Statuses that mean the request was not processed, safe to retry a POST
+REJECTED_STATUSES = (429, 503)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+# Never spend longer than this sleeping between attempts of one call
+RETRY_BUDGET = 20
+
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+
+POOL_SIZE = 10
+STATS_KEY = "leetrental_integration_stats"
+
+_sessions = {}
+_breakers = {}
+_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without a network call while a host's circuit is open"""
+
+
+def get_session(host):
+    """
+    Keep-alive session for a host, shared by every call in this process
+    """
+    session = _sessions.get(host)
+    if session is None:
+        with _lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[host] = session
+    return session
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def request(method, url, *, endpoint, timeout=30, retries=DEFAULT_RETRIES, idempotent=None, **kwargs):
+    """
+    Send a request through the pooled session of the URL's host
+
+    `endpoint` names the call in the stats. Connection errors, timeouts and
+    RETRY_STATUSES are retried up to `retries` times; non-idempotent methods
+    only when the server rejected the request (REJECTED_STATUSES) or the
+    connection could not be opened (pass idempotent=True for read-only
+    POSTs). Returns the last response, callers
+    check its status as before. Raises CircuitOpenError while the host keeps
+    failing.
+    """
+    method = method.upper()
+    host = urlsplit(url).netloc
+    check_breaker(host, endpoint)
+
+    session = get_session(host)
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    body = kwargs.get("data")
+    slept = 0
+    attempt = 0
+
+    while True:
+        if attempt and hasattr(body, "seek"):
+            body.seek(0)
+
+        started = time.monotonic()
+        response, error = None, None
+        try:
+            response = session.request(method, url, timeout=(CONNECT_TIMEOUT, timeout), **kwargs)
+        except requests.exceptions.RequestException as e:
+            error = e
+        elapsed = time.monotonic() - started
+
+        failed = error is not None or response.status_code in RETRY_STATUSES
+        record_call(endpoint, elapsed, failed)
+
+        if not failed:
+            record_success(host)
+            return response
+
+        retryable = (
+            idempotent
+            or isinstance(error, (requests.exceptions.ConnectTimeout, requests.exceptions.SSLError))
+            or (response is not None and response.status_code in REJECTED_STATUSES)
+        )
+        delay = get_retry_delay(response, attempt)
+        if attempt >= retries or not retryable or delay is None or slept + delay > RETRY_BUDGET:
+            record_failure(host)
+            if error is not None:
+                raise error
+            return response
+
+        record_retry(endpoint)
+        time.sleep(delay)
+        slept += delay
+        attempt += 1
+
+
+def get_retry_delay(response, attempt):
+    """
+    Seconds to wait before the next attempt: the server's Retry-After if it
+    sent one, else full-jitter exponential backoff
+    """
+    retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    """
+    Retry-After as seconds, from either delta-seconds or an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def check_breaker(host, endpoint):
+    """
+    Fail fast while a host's circuit is open; after the cooldown one trial
+    request goes through (half-open) and decides whether it closes
+    """
+    breaker = _breakers.get(host)
+    if not breaker or breaker["failures"] < BREAKER_THRESHOLD:
+        return
+
+    with _lock:
+        if time.monotonic() - breaker["opened_at"] >= BREAKER_COOLDOWN:
+            # Let this call through, push the next trial back by a cooldown
+            breaker["opened_at"] = time.monotonic()
+            return
+
+    record_stat(endpoint, "short_circuited")
+    raise CircuitOpenError(f"{host} is failing, not calling it for up to {BREAKER_COOLDOWN}s")
+
+
+def record_success(host):
+    if host in _breakers:
+        with _lock:
+            _breakers.pop(host, None)
+
+
+def record_failure(host):
+    with _lock:
+        breaker = _breakers.setdefault(host, {"failures": 0, "opened_at": 0})
+        breaker["failures"] += 1
+        if breaker["failures"] >= BREAKER_THRESHOLD:
+            breaker["opened_at"] = time.monotonic()
+
+
+def record_call(endpoint, elapsed, failed):
+    record_stat(endpoint, "calls")
+    record_stat(endpoint, "latency_ms", round(elapsed * 1000))
+    if failed:
+        record_stat(endpoint, "errors")
+
+
+def record_retry(endpoint):
+    record_stat(endpoint, "retries")
+
+
+def record_stat(endpoint, name, amount=1):
+    """
+    Counters are best effort, never fail the call because of them
+    """
+    try:
+        cache = frappe.cache()
+        cache.hincrby(cache.make_key(STATS_KEY), f"{endpoint}:{name}", amount)
+    except Exception:
+        pass
+
+
+@frappe.whitelist()
+def get_integration_stats(reset=0):
+    """
+    Per-endpoint counters since the last reset, and hosts whose circuit is
+    open in this worker
+    """
+    frappe.only_for("System Manager")
+
+    cache = frappe.cache()
+    key = cache.make_key(STATS_KEY)
+    stats = {}
+    for field, value in (cache.hgetall(key) or {}).items():
+        endpoint, name = frappe.safe_decode(field).rsplit(":", 1)
+        stats.setdefault(endpoint, {})[name] = frappe.utils.cint(frappe.safe_decode(value))
+
+    for counters in stats.values():
+        calls = counters.get("calls") or 0
+        counters["avg_latency_ms"] = round(counters.get("latency_ms", 0) / calls) if calls else 0
+        counters["error_rate"] = round(counters.get("errors", 0) / calls, 4) if calls else 0
+        if "polls" in counters:
+            counters["avg_polls"] = round(counters["polls"] / calls, 2) if calls else 0
+
+    if frappe.utils.cint(reset):
+        cache.delete(key)
+
+    return {
+        "endpoints": stats,
+        "open_circuits": [
+            host for host, breaker in _breakers.items() if breaker["failures"] >= BREAKER_THRESHOLD
+        ]
+    }
@@ -0,0 +1,190 @@
+# leetrental/leetrental/mrz.py
+# Machine-readable zone (ICAO 9303 TD1 / TD3) parsing for ID scans
+import importlib.util
+import re
+
+import frappe
+
+MRZ_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ<"
+CHECK_WEIGHTS = (7, 3, 1)
+
+# Candidate lines once spaces are removed: TD1 has 3 x 30 characters, TD3 2 x 44
+_mrz_line = re.compile(r"^[A-Z0-9<]{30,44}$")
+_spaces = re.compile(r"\s+")
+# OCR sometimes renders the < filler as a guillemet
+_filler = re.compile(r"[«‹]")
+_name_separator = re.compile(r"<+")
+
+# Local OCR only needs the MRZ alphabet
+TESSERACT_CONFIG = "--psm 6 -c tessedit_char_whitelist=" + MRZ_CHARS
+# The MRZ sits in the bottom third of a passport page or ID card
+MRZ_CROP = 0.35
+
+MAPPED_FIELDS = (
+    "id_expiry", "id_number", "license_expiry", "license_number", "date_of_birth",
+    "passport_expiry", "passport_number", "national_id", "driving_license", "customer_name",
+)
+
+
+def char_value(char):
+    if char.isdigit():
+        return int(char)
+    if char == "<":
+        return 0
+    return ord(char) - 55  # A = 10 ... Z = 35
+
+
+def check_digit(value):
+    return str(sum(char_value(c) * CHECK_WEIGHTS[i % 3] for i, c in enumerate(value)) % 10)
+
+
+def is_valid(value, digit):
+    # An empty optional field may carry < instead of 0
+    return check_digit(value) == ("0" if digit == "<" else digit)
+
+
+def find_mrz_lines(text):
+    """
+    (format, lines) of the first TD3 or TD1 block in OCR text, or None
+    """
+    lines = []
+    for line in (text or "").splitlines():
+        line = _filler.sub("<", _spaces.sub("", line).upper())
+        if _mrz_line.match(line):
+            lines.append(line)
+
+    for i in range(len(lines)):
+        if len(lines[i]) == 44 and i + 1 < len(lines) and len(lines[i + 1]) == 44:
+            return "TD3", lines[i:i + 2]
+        if len(lines[i]) == 30 and i + 2 < len(lines) and len(lines[i + 1]) == len(lines[i + 2]) == 30:
+            return "TD1", lines[i:i + 3]
+    return None
+
+
+def parse_mrz(text):
+    """
+    Mapped fields (as azure_di._map_prebuilt_id returns them, plus mrz=True)
+    from a TD1 or TD3 MRZ in `text`, None unless every check digit holds
+    """
+    found = find_mrz_lines(text)
+    if not found:
+        return None
+
+    fmt, lines = found
+    fields = parse_td3(lines) if fmt == "TD3" else parse_td1(lines)
+    if not fields:
+        return None
+
+    out = {k: None for k in MAPPED_FIELDS}
+    out["customer_name"] = fields["name"]
+    out["date_of_birth"] = to_date(fields["dob"], past=True)
+    expiry = to_date(fields["expiry"])
+
+    if fields["code"].startswith("P"):
+        out["doc_type"] = "passport"
+        out["passport_number"] = fields["number"]
+        out["passport_expiry"] = expiry
+    else:
+        out["doc_type"] = "national_id"
+        out["id_number"] = fields["number"]
+        out["id_expiry"] = expiry
+        out["national_id"] = fields["number"]
+
+    out["mrz"] = True
+    return out
+
+
+def parse_td3(lines):
+    """Passport booklets: 2 lines of 44"""
+    l1, l2 = lines
+    number, number_cd = l2[0:9], l2[9]
+    dob, dob_cd = l2[13:19], l2[19]
+    expiry, expiry_cd = l2[21:27], l2[27]
+    composite = l2[0:10] + l2[13:20] + l2[21:43]
+
+    if not (is_valid(number, number_cd) and is_valid(dob, dob_cd)
+            and is_valid(expiry, expiry_cd) and is_valid(composite, l2[43])):
+        return None
+
+    return {
+        "code": l1[0:2].replace("<", ""),
+        "number": number.replace("<", ""),
+        "dob": dob,
+        "expiry": expiry,
+        "name": to_name(l1[5:44]),
+    }
+
+
+def parse_td1(lines):
+    """ID cards: 3 lines of 30"""
+    l1, l2, l3 = lines
+    number, number_cd = l1[5:14], l1[14]
+    if number_cd == "<" and l1[15:30].strip("<"):
+        # Numbers over 9 characters continue in the optional data, followed by their check digit
+        overflow = l1[15:30].split("<", 1)[0]
+        number, number_cd = number + overflow[:-1], overflow[-1:]
+
+    dob, dob_cd = l2[0:6], l2[6]
+    expiry, expiry_cd = l2[8:14], l2[14]
+    composite = l1[5:30] + l2[0:7] + l2[8:15] + l2[18:29]
+
+    if not (number_cd and is_valid(number, number_cd) and is_valid(dob, dob_cd)
+            and is_valid(expiry, expiry_cd) and is_valid(composite, l2[29])):
+        return None
+
+    return {
+        "code": l1[0:2].replace("<", ""),
+        "number": number.replace("<", ""),
+        "dob": dob,
+        "expiry": expiry,
+        "name": to_name(l3),
+    }
+
+
+def to_name(field):
+    """SURNAME<<GIVEN<NAMES -> Given Names Surname"""
+    surname, _, given = field.strip("<").partition("<<")
+    parts = [_name_separator.sub(" ", given).strip(), _name_separator.sub(" ", surname).strip()]
+    return " ".join(p for p in parts if p).title() or None
+
+
+def to_date(value, past=False):
+    """
+    YYMMDD -> YYYY-MM-DD; birth dates are never in the future, expiry dates
+    are taken in this century
+    """
+    if not value.isdigit():
+        return None
+    year = 2000 + int(value[0:2])
+    if past and year > frappe.utils.getdate().year:
+        year -= 100
+    return f"{year}-{value[2:4]}-{value[4:6]}"
+
+
+def has_local_ocr():
+    return importlib.util.find_spec("pytesseract") is not None
+
+
+def read_mrz_text(path):
+    """
+    OCR the bottom of a scan with Tesseract when pytesseract is installed,
+    None otherwise (the read model's text is used instead)
+    """
+    if path.lower().endswith((".pdf", ".tif", ".tiff")):
+        return None
+
+    try:
+        import pytesseract
+    except ImportError:
+        return None
+
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            zone = image.crop((0, int(height * (1 - MRZ_CROP)), width, height)).convert("L")
+            return pytesseract.image_to_string(zone, config=TESSERACT_CONFIG)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "Local MRZ OCR")
+        return None
@@ -17,9 +17,15 @@ class VehiclesKanban {
         this.dragged_vehicle = null;
         this.filters = {};
         this.status_field = 'vehicle_status'; // Default, will be detected from backend
+        this.page_length = 20; // Cards per column, more are fetched on demand
+        this.watermark = null; // Server issued position for get_kanban_changes
+        this.transition_matrix = null; // Legal moves, used to grey out illegal drops
+        this.counts = null; // Per-column totals from get_kanban_counts
         
         this.setup_toolbar();
         this.setup_kanban();
+        this.setup_realtime();
+        this.load_transition_matrix();
         this.load_data();
     }
     
@@ -28,6 +34,7 @@ class VehiclesKanban {
         
         // Add refresh button
         this.page.add_button(__('Refresh'), () => {
+            me.load_transition_matrix();
             me.load_data();
         }, 'octicon octicon-sync');
         
@@ -86,6 +93,11 @@ class VehiclesKanban {
             me.load_data();
         }, 'octicon octicon-x');
         
+        // Move a whole column at once
+        this.page.add_menu_item(__('Bulk Move'), () => {
+            me.show_bulk_move_dialog();
+        });
+        
         // Add statistics button
         this.page.add_menu_item(__('View Statistics'), () => {
             me.show_statistics();
@@ -102,19 +114,71 @@ class VehiclesKanban {
         this.kanban_container = $('<div class="kanban-container"></div>').appendTo(this.kanban_wrapper);
     }
     
+    load_transition_matrix() {
+        frappe.call({
+            method: 'leetrental.leetrental.api.vehicles_kanban.get_transition_matrix',
+            callback: (r) => {
+                this.transition_matrix = r.message || null;
+            }
+        });
+    }
+    
+    is_move_allowed(from_state, to_state) {
+        const matrix = this.transition_matrix;
+        
+        // Without a matrix (or status options) the server decides
+        if (!matrix || !matrix.states.length) return true;
+        return (matrix.allowed[from_state] || []).includes(to_state);
+    }
+    
+    setup_realtime() {
+        // Move events go to the Vehicles doctype room, joining it checks read permission
+        frappe.realtime.doctype_subscribe('Vehicles');
+        frappe.realtime.on('vehicle_kanban_move', (data) => {
+            this.apply_move_event(data);
+        });
+        frappe.realtime.on('vehicle_kanban_bulk_move', (data) => {
+            this.apply_bulk_move_event(data);
+        });
+    }
+    
     load_data(filters = {}) {
         const me = this;
         
+        // Take the watermark before reading the board so no change is missed
+        frappe.call({
+            method: 'leetrental.leetrental.api.vehicles_kanban.get_kanban_changes',
+            callback: (r) => {
+                me.watermark = r.message && r.message.watermark;
+                me.fetch_board(filters);
+            }
+        });
+    }
+    
+    fetch_board(filters = {}) {
+        const me = this;
+        
         frappe.call({
             method: 'leetrental.leetrental.api.vehicles_kanban.get_kanban_data',
-            args: { filters: filters },
+            args: {
+                filters: filters,
+                page_length: me.page_length,
+                format: 'columnar',
+                etag: me.kanban_etag || ''
+            },
             freeze: true,
             freeze_message: __('Loading vehicles...'),
             callback: (r) => {
                 if (r.message) {
-                    me.kanban_data = r.message;
+                    me.kanban_etag = r.message.etag;
+                    // Nothing changed since the board on screen was loaded
+                    if (r.message.unchanged) return;
+                    
+                    me.kanban_data = leetrental.columnar.decode(r.message.data);
+                    me.counts = null;
                     me.render_kanban();
                     me.show_summary();
+                    me.load_counts();
                 }
             },
             error: (r) => {
@@ -163,7 +227,7 @@ class VehiclesKanban {
                 <div class="kanban-column-header ${style_class}">
                     <div class="column-title-wrapper">
                         <h4>${data.label}</h4>
-                        <span class="badge badge-pill">${data.vehicles.length}</span>
+                        <span class="badge badge-pill">${this.get_column_badge(state)}</span>
                     </div>
                     <div class="column-actions">
                         <button class="btn btn-xs btn-default collapse-column" title="${__('Collapse')}">
@@ -185,6 +249,10 @@ class VehiclesKanban {
             column_body.append(card);
         });
         
+        if (data.has_more) {
+            this.add_load_more_button(state, column);
+        }
+        
         // Collapse/Expand functionality
         column.find('.collapse-column').on('click', function() {
             const $body = $(this).closest('.kanban-column').find('.kanban-column-body');
@@ -207,6 +275,229 @@ class VehiclesKanban {
         return column;
     }
     
+    sync_changes() {
+        const me = this;
+        
+        if (!this.watermark) {
+            this.load_data(this.filters);
+            return;
+        }
+        
+        frappe.call({
+            method: 'leetrental.leetrental.api.vehicles_kanban.get_kanban_changes',
+            args: { since: me.watermark },
+            callback: (r) => {
+                if (!r.message) return;
+                
+                let complete = true;
+                r.message.vehicles.forEach(vehicle => {
+                    if (!me.matches_filters(vehicle)) {
+                        me.remove_vehicle(vehicle.name);
+                    } else if (!me.place_vehicle(vehicle, vehicle.new_state)) {
+                        complete = false;
+                    }
+                });
+                r.message.deleted.forEach(name => me.remove_vehicle(name));
+                
+                if (!complete) {
+                    // A column the board does not have yet, rebuild it
+                    me.load_data(me.filters);
+                    return;
+                }
+                
+                me.watermark = r.message.watermark;
+                me.show_summary();
+                me.schedule_counts();
+                if (r.message.has_more) {
+                    me.sync_changes();
+                }
+            }
+        });
+    }
+    
+    apply_move_event(data) {
+        // Cards that are not on this board are picked up through the delta feed
+        if (!this.move_card(data.vehicle, data.to_state)) {
+            this.sync_changes();
+            return;
+        }
+        this.show_summary();
+        this.schedule_counts();
+    }
+    
+    apply_bulk_move_event(data) {
+        let missing = false;
+        data.moves.forEach(move => {
+            if (!this.move_card(move.vehicle, move.to_state)) {
+                missing = true;
+            }
+        });
+        
+        if (missing) {
+            this.sync_changes();
+        }
+        this.show_summary();
+        this.schedule_counts();
+    }
+    
+    move_card(vehicle_name, to_state) {
+        const vehicle = this.find_vehicle(vehicle_name);
+        const column = this.kanban_data[to_state] ? to_state : 'Other';
+        
+        if (!vehicle || !this.place_vehicle(vehicle, column)) {
+            return false;
+        }
+        
+        vehicle.workflow_state = to_state;
+        if ('vehicle_status' in vehicle) {
+            vehicle.vehicle_status = to_state;
+        }
+        return true;
+    }
+    
+    find_vehicle(vehicle_name) {
+        for (const state of Object.keys(this.kanban_data)) {
+            const vehicle = this.kanban_data[state].vehicles.find(v => v.name === vehicle_name);
+            if (vehicle) return vehicle;
+        }
+        return null;
+    }
+    
+    matches_filters(vehicle) {
+        return Object.keys(this.filters).every(key => {
+            return !this.filters[key] || vehicle[key] === this.filters[key];
+        });
+    }
+    
+    get_column_body(state) {
+        return this.kanban_container.find('.kanban-column-body').filter((i, el) => {
+            return $(el).attr('data-state') === state;
+        });
+    }
+    
+    place_vehicle(vehicle, state) {
+        const data = this.kanban_data[state];
+        if (!data) return false;
+        
+        this.remove_vehicle(vehicle.name);
+        
+        // Most recently modified first, matching the server ordering
+        data.vehicles.unshift(vehicle);
+        const column_body = this.get_column_body(state);
+        column_body.find('.empty-state').remove();
+        column_body.prepend(this.create_vehicle_card(vehicle));
+        this.update_column_badge(state);
+        
+        return true;
+    }
+    
+    remove_vehicle(vehicle_name) {
+        Object.keys(this.kanban_data).forEach(state => {
+            const data = this.kanban_data[state];
+            const count = data.vehicles.length;
+            
+            data.vehicles = data.vehicles.filter(v => v.name !== vehicle_name);
+            if (data.vehicles.length !== count) {
+                this.get_column_body(state).find('.kanban-card').filter((i, el) => {
+                    return $(el).attr('data-vehicle') === vehicle_name;
+                }).remove();
+                this.update_column_badge(state);
+            }
+        });
+    }
+    
+    update_column_badge(state) {
+        const column_body = this.get_column_body(state);
+        column_body.closest('.kanban-column')
+            .find('.column-title-wrapper .badge')
+            .text(this.get_column_badge(state));
+    }
+    
+    get_column_badge(state) {
+        const counts = this.counts && this.counts.columns[state];
+        if (counts) return counts.count;
+        
+        const data = this.kanban_data[state];
+        return data.has_more ? `${data.vehicles.length}+` : data.vehicles.length;
+    }
+    
+    load_counts() {
+        const me = this;
+        
+        frappe.call({
+            method: 'leetrental.leetrental.api.vehicles_kanban.get_kanban_counts',
+            args: { filters: me.filters },
+            callback: (r) => {
+                if (!r.message) return;
+                
+                me.counts = r.message;
+                Object.keys(me.kanban_data).forEach(state => me.update_column_badge(state));
+                me.show_summary();
+            }
+        });
+    }
+    
+    schedule_counts() {
+        // Collapse bursts of moves into one count request
+        clearTimeout(this.counts_timer);
+        this.counts_timer = setTimeout(() => this.load_counts(), 500);
+    }
+    
+    add_load_more_button(state, column) {
+        const me = this;
+        const button = $(`
+            <button class="btn btn-xs btn-default btn-block load-more">${__('Load more')}</button>
+        `).appendTo(column.find('.kanban-column-body'));
+        
+        button.on('click', (e) => {
+            e.stopPropagation();
+            me.load_more(state, column, button);
+        });
+    }
+    
+    load_more(state, column, button) {
+        const me = this;
+        const data = this.kanban_data[state];
+        
+        button.prop('disabled', true);
+        
+        frappe.call({
+            method: 'leetrental.leetrental.api.vehicles_kanban.get_kanban_column',
+            args: {
+                state: state,
+                cursor: data.cursor,
+                filters: me.filters,
+                page_length: me.page_length
+            },
+            callback: (r) => {
+                if (!r.message) return;
+                
+                button.remove();
+                data.vehicles = data.vehicles.concat(r.message.vehicles);
+                data.cursor = r.message.cursor;
+                data.has_more = r.message.has_more;
+                
+                const column_body = column.find('.kanban-column-body');
+                r.message.vehicles.forEach(vehicle => {
+                    column_body.append(me.create_vehicle_card(vehicle));
+                });
+                
+                if (data.has_more) {
+                    me.add_load_more_button(state, column);
+                }
+                column.find('.column-title-wrapper .badge').text(me.get_column_badge(state));
+                me.show_summary();
+            },
+            error: () => {
+                button.prop('disabled', false);
+                frappe.show_alert({
+                    message: __('Failed to load more vehicles'),
+                    indicator: 'red'
+                }, 3);
+            }
+        });
+    }
+    
     create_vehicle_card(vehicle) {
         const me = this;
         
@@ -234,7 +525,7 @@ class VehiclesKanban {
                 <div class="kanban-card-body">
                     ${vehicle.image ? `
                     <div class="vehicle-image">
-                        <img src="${vehicle.image}" alt="${vehicle.license_plate}" 
+                        <img src="${vehicle.thumbnail || vehicle.image}" alt="${vehicle.license_plate}" loading="lazy"
                              onerror="this.src='/assets/frappe/images/ui-states/empty-state.png'">
                     </div>
                     ` : ''}
@@ -301,6 +592,12 @@ class VehiclesKanban {
                 element: card
             };
             card.addClass('dragging');
+            me.kanban_container.find('.kanban-column-body').each(function() {
+                const state = $(this).attr('data-state');
+                if (state !== currentState && !me.is_move_allowed(currentState, state)) {
+                    $(this).closest('.kanban-column').addClass('drop-not-allowed');
+                }
+            });
             e.originalEvent.dataTransfer.effectAllowed = 'move';
             e.originalEvent.dataTransfer.setData('text/html', card.html());
         });
@@ -308,6 +605,7 @@ class VehiclesKanban {
         card.on('dragend', () => {
             card.removeClass('dragging');
             $('.kanban-column-body').removeClass('drag-over');
+            $('.kanban-column').removeClass('drop-not-allowed');
         });
         
         return card;
@@ -319,6 +617,11 @@ class VehiclesKanban {
         
         column_body.on('dragover', (e) => {
             e.preventDefault();
+            if (me.dragged_vehicle && !me.is_move_allowed(me.dragged_vehicle.from_state, target_state)
+                && me.dragged_vehicle.from_state !== target_state) {
+                e.originalEvent.dataTransfer.dropEffect = 'none';
+                return;
+            }
             e.originalEvent.dataTransfer.dropEffect = 'move';
             column_body.addClass('drag-over');
         });
@@ -352,6 +655,14 @@ class VehiclesKanban {
             return;
         }
         
+        if (!this.is_move_allowed(vehicle.from_state, to_state)) {
+            frappe.show_alert({
+                message: __('Moving from {0} to {1} is not allowed', [vehicle.from_state, to_state]),
+                indicator: 'orange'
+            }, 3);
+            return;
+        }
+        
         // Call backend to check if transition is allowed and get required fields
         frappe.call({
             method: 'leetrental.leetrental.api.vehicles_kanban.move_vehicle',
@@ -436,8 +747,8 @@ class VehiclesKanban {
                         me.show_created_documents(r.message.created_docs);
                     }
                     
-                    // Reload kanban
-                    me.load_data(me.filters);
+                    // Pull only what changed instead of reloading the board
+                    me.sync_changes();
                 } else {
                     frappe.msgprint({
                         title: __('Error'),
@@ -456,6 +767,117 @@ class VehiclesKanban {
         });
     }
     
+    show_bulk_move_dialog() {
+        const me = this;
+        const states = Object.keys(this.kanban_data);
+        
+        const d = new frappe.ui.Dialog({
+            title: __('Bulk Move'),
+            fields: [
+                {
+                    fieldtype: 'Select',
+                    fieldname: 'from_state',
+                    label: __('Move all loaded vehicles from'),
+                    options: states,
+                    reqd: 1
+                },
+                {
+                    fieldtype: 'Select',
+                    fieldname: 'to_state',
+                    label: __('To'),
+                    options: states,
+                    reqd: 1
+                }
+            ],
+            primary_action_label: __('Next'),
+            primary_action: (values) => {
+                d.hide();
+                me.prepare_bulk_move(values.from_state, values.to_state);
+            }
+        });
+        
+        d.show();
+    }
+    
+    prepare_bulk_move(from_state, to_state) {
+        const me = this;
+        const vehicles = this.kanban_data[from_state].vehicles.slice();
+        
+        if (!vehicles.length) {
+            frappe.msgprint(__('There are no vehicles in {0}', [from_state]));
+            return;
+        }
+        
+        if (from_state === to_state || !this.is_move_allowed(from_state, to_state)) {
+            frappe.msgprint({
+                title: __('Transition Not Allowed'),
+                message: __('Moving from {0} to {1} is not allowed', [from_state, to_state]),
+                indicator: 'red'
+            });
+            return;
+        }
+        
+        frappe.call({
+            method: 'leetrental.leetrental.api.vehicles_kanban.get_transition_matrix',
+            args: { with_forms: 1 },
+            callback: (r) => {
+                const forms = (r.message && r.message.forms) || {};
+                const fields = (forms[from_state] || {})[to_state] || [];
+                
+                // One form would give every vehicle the same customer, times, mileage...
+                if (fields.length) {
+                    frappe.msgprint({
+                        title: __('Details Needed Per Vehicle'),
+                        message: __('Moving from {0} to {1} needs details for each vehicle. Please move these cards one at a time.', [from_state, to_state]),
+                        indicator: 'orange'
+                    });
+                    return;
+                }
+                
+                frappe.confirm(
+                    __('Move {0} vehicles from {1} to {2}?', [vehicles.length, from_state, to_state]),
+                    () => me.bulk_move(vehicles, from_state, to_state)
+                );
+            }
+        });
+    }
+    
+    bulk_move(vehicles, from_state, to_state) {
+        const me = this;
+        
+        frappe.call({
+            method: 'leetrental.leetrental.api.vehicles_kanban.complete_vehicle_moves_bulk',
+            args: {
+                moves: vehicles.map(vehicle => ({
+                    vehicle_name: vehicle.name,
+                    from_state: from_state,
+                    to_state: to_state
+                }))
+            },
+            freeze: true,
+            freeze_message: __('Moving vehicles...'),
+            callback: (r) => {
+                if (!r.message) return;
+                
+                const failed = r.message.results.filter(result => !result.success);
+                if (failed.length) {
+                    frappe.msgprint({
+                        title: __('Some vehicles were not moved'),
+                        message: failed.map(result => `${result.vehicle}: ${result.message}`).join('<br>'),
+                        indicator: 'orange'
+                    });
+                } else {
+                    frappe.show_alert({
+                        message: r.message.message,
+                        indicator: 'green'
+                    }, 5);
+                }
+                
+                me.sync_changes();
+            }
+        });
+    }
+    
     show_created_documents(docs) {
         const doc_links = docs.map(doc => {
             const route = doc.doctype.toLowerCase().replace(/ /g, '-');
@@ -495,11 +917,13 @@ class VehiclesKanban {
             method: 'leetrental.leetrental.api.vehicles_kanban.search_vehicles',
             args: { 
                 query: query,
-                filters: me.filters
+                filters: me.filters,
+                format: 'columnar'
             },
             callback: (r) => {
-                if (r.message && r.message.length > 0) {
-                    const found_names = r.message.map(v => v.name);
+                const found = leetrental.columnar.decode(r.message);
+                if (found && found.length > 0) {
+                    const found_names = found.map(v => v.name);
                     
                     $('.kanban-card').each(function() {
                         const vehicle_name = $(this).data('vehicle');
@@ -591,7 +1015,7 @@ class VehiclesKanban {
                                         indicator: 'green'
                                     });
                                     d.hide();
-                                    me.load_data(me.filters);
+                                    me.sync_changes();
                                 }
                             });
                         }
@@ -604,7 +1028,9 @@ class VehiclesKanban {
     }
     
     show_summary() {
-        const total = Object.values(this.kanban_data).reduce((sum, state) => sum + state.vehicles.length, 0);
+        const total = this.counts
+            ? this.counts.total
+            : Object.values(this.kanban_data).reduce((sum, state) => sum + state.vehicles.length, 0);
         const states = Object.keys(this.kanban_data).length;
         
         this.page.set_title_sub(`${total} vehicles in ${states} states`);
@@ -615,7 +1041,8 @@ class VehiclesKanban {
         let total = 0;
         
         Object.keys(this.kanban_data).forEach(state => {
-            const count = this.kanban_data[state].vehicles.length;
+            const counts = this.counts && this.counts.columns[state];
+            const count = counts ? counts.count : this.kanban_data[state].vehicles.length;
             stats[state] = count;
             total += count;
         });
@@ -0,0 +1,112 @@
+# leetrental/leetrental/scan_preprocess.py
+# Shrink ID scans before they are uploaded to Azure Document Intelligence
+import os
+import tempfile
+import threading
+import time
+
+import frappe
+
+from leetrental.leetrental import integration_client
+
+# Long edge in pixels; plenty for ID cards and passport pages (override with
+# site config azure_di_max_scan_dimension)
+MAX_SCAN_DIMENSION = 2000
+SCAN_JPEG_QUALITY = 85
+PASS_THROUGH_EXTENSIONS = (".pdf", ".tif", ".tiff")
+
+
+class PreparedScan:
+    """
+    A scan file and its upload copy, made on first use of `path` so cached
+    analyses never pay for it. Safe to share between threads; close() removes
+    the copy.
+    """
+
+    def __init__(self, source_path):
+        self.source_path = source_path
+        self._path = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        with self._lock:
+            if self._closed:
+                # A speculative analysis that lost must not leave a new copy behind
+                raise ValueError("Scan already closed")
+            if self._path is None:
+                self._path = prepare_scan(self.source_path)
+        return self._path
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._path and self._path != self.source_path:
+                try:
+                    os.remove(self._path)
+                except OSError:
+                    pass
+            self._path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_max_dimension():
+    return frappe.utils.cint(frappe.conf.get("azure_di_max_scan_dimension")) or MAX_SCAN_DIMENSION
+
+
+def prepare_scan(path):
+    """
+    Path of the file to upload for a scan
+
+    Images are turned upright from their EXIF orientation, scaled down to
+    get_max_dimension() and re-encoded as JPEG without metadata into a
+    temporary file. PDFs (and multi-page TIFFs) go up unchanged, as does
+    anything the re-encode would only make larger.
+    """
+    if path.lower().endswith(PASS_THROUGH_EXTENSIONS):
+        return path
+
+    from PIL import Image, ImageOps
+
+    started = time.monotonic()
+    bytes_in = os.path.getsize(path)
+    try:
+        with Image.open(path) as image:
+            # Metadata (orientation, GPS, camera) to strip or an oversized image
+            changed = bool(image.getexif()) or max(image.size) > get_max_dimension()
+            upright = ImageOps.exif_transpose(image)
+            upright.thumbnail((get_max_dimension(), get_max_dimension()))
+            if upright.mode != "RGB":
+                upright = upright.convert("RGB")
+
+            fd, out_path = tempfile.mkstemp(suffix=".jpg", prefix="id_scan_")
+            with os.fdopen(fd, "wb") as out:
+                upright.save(out, "JPEG", quality=SCAN_JPEG_QUALITY, optimize=True)
+    except Exception:
+        # Not an image Pillow can read, let Azure decide. Runs in pool threads
+        # without a DB connection, so no Error Log here
+        frappe.logger("scan_preprocess").exception(f"Scan preprocessing failed for {os.path.basename(path)}")
+        return path
+
+    bytes_out = os.path.getsize(out_path)
+    if bytes_out >= bytes_in and not changed:
+        os.remove(out_path)
+        out_path, bytes_out = path, bytes_in
+
+    elapsed = time.monotonic() - started
+    integration_client.record_call("azure_di.preprocess", elapsed, False)
+    integration_client.record_stat("azure_di.preprocess", "bytes_in", bytes_in)
+    integration_client.record_stat("azure_di.preprocess", "bytes_out", bytes_out)
+    frappe.logger("leetrental").info(
+        f"Scan preprocessing {os.path.basename(path)}: {bytes_in} -> {bytes_out} bytes in {elapsed * 1000:.0f} ms"
+    )
+    return out_path
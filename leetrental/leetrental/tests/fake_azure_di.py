@@ -0,0 +1,223 @@
+# Local stand-in for Azure AI Document Intelligence, for tests and benchmarks
+#
+#   with FakeAzureDIServer(processing_time=1.5, retry_after=1) as server:
+#       frappe.conf.azure_di_endpoint = server.endpoint
+#
+# Serves POST documentModels/<model>:analyze (202 + Operation-Location) and
+# GET documentModels/<model>/analyzeResults/<id>, which reports "running"
+# until processing_time has passed and then replays the next fixture.
+# Latency, Retry-After, throttling (429) and failures (500 / failed
+# operations) can be injected. Every request is recorded.
+
+import copy
+import glob
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# A passport as prebuilt-idDocument returns it, trimmed to what the mapping reads
+PASSPORT_RESULT = {
+	"apiVersion": "2024-11-30",
+	"modelId": "prebuilt-idDocument",
+	"content": "PASSPORT\nP<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\nL898902C36UTO7408122F1204159ZE184226B<<<<<10",
+	"pages": [],
+	"paragraphs": [],
+	"documents": [{
+		"docType": "idDocument.passport",
+		"confidence": 0.99,
+		"fields": {
+			"FirstName": {"type": "string", "valueString": "ANNA MARIA", "content": "ANNA MARIA"},
+			"LastName": {"type": "string", "valueString": "ERIKSSON", "content": "ERIKSSON"},
+			"DocumentNumber": {"type": "string", "valueString": "L898902C3", "content": "L898902C3"},
+			"DateOfBirth": {"type": "date", "valueDate": "1974-08-12", "content": "12 AUG 1974"},
+			"DateOfExpiration": {"type": "date", "valueDate": "2032-04-15", "content": "15 APR 2032"},
+		},
+	}],
+}
+
+# The same passport as prebuilt-read returns it: text only, no fields
+READ_RESULT = {
+	"apiVersion": "2024-11-30",
+	"modelId": "prebuilt-read",
+	"stringIndexType": "textElements",
+	"content": "PASSPORT\nUtopia\nP<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\nL898902C36UTO7408122F1204159ZE184226B<<<<<10",
+	"pages": [{
+		"pageNumber": 1,
+		"angle": 0,
+		"width": 1200,
+		"height": 850,
+		"unit": "pixel",
+		"words": [
+			{"content": "PASSPORT", "polygon": [80, 40, 260, 40, 260, 80, 80, 80], "confidence": 0.995, "span": {"offset": 0, "length": 8}},
+			{"content": "Utopia", "polygon": [80, 90, 200, 90, 200, 125, 80, 125], "confidence": 0.99, "span": {"offset": 9, "length": 6}},
+			{"content": "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<", "polygon": [40, 700, 1160, 700, 1160, 745, 40, 745], "confidence": 0.97, "span": {"offset": 16, "length": 44}},
+			{"content": "L898902C36UTO7408122F1204159ZE184226B<<<<<10", "polygon": [40, 760, 1160, 760, 1160, 805, 40, 805], "confidence": 0.96, "span": {"offset": 61, "length": 44}},
+		],
+		"lines": [
+			{"content": "PASSPORT", "polygon": [80, 40, 260, 40, 260, 80, 80, 80], "spans": [{"offset": 0, "length": 8}]},
+			{"content": "Utopia", "polygon": [80, 90, 200, 90, 200, 125, 80, 125], "spans": [{"offset": 9, "length": 6}]},
+			{"content": "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<", "polygon": [40, 700, 1160, 700, 1160, 745, 40, 745], "spans": [{"offset": 16, "length": 44}]},
+			{"content": "L898902C36UTO7408122F1204159ZE184226B<<<<<10", "polygon": [40, 760, 1160, 760, 1160, 805, 40, 805], "spans": [{"offset": 61, "length": 44}]},
+		],
+		"spans": [{"offset": 0, "length": 105}],
+	}],
+	"paragraphs": [
+		{"content": "PASSPORT", "boundingRegions": [{"pageNumber": 1, "polygon": [80, 40, 260, 40, 260, 80, 80, 80]}], "spans": [{"offset": 0, "length": 8}]},
+		{"content": "Utopia", "boundingRegions": [{"pageNumber": 1, "polygon": [80, 90, 200, 90, 200, 125, 80, 125]}], "spans": [{"offset": 9, "length": 6}]},
+		{
+			"content": "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\nL898902C36UTO7408122F1204159ZE184226B<<<<<10",
+			"boundingRegions": [{"pageNumber": 1, "polygon": [40, 700, 1160, 700, 1160, 805, 40, 805]}],
+			"spans": [{"offset": 16, "length": 89}],
+		},
+	],
+	"styles": [],
+	"contentFormat": "text",
+}
+
+# What prebuilt-idDocument returns for a scan it cannot classify
+UNRECOGNIZED_ID_RESULT = {
+	"apiVersion": "2024-11-30",
+	"modelId": "prebuilt-idDocument",
+	"content": "",
+	"pages": [],
+	"documents": [],
+}
+
+
+def load_fixtures(path):
+	"""
+	analyzeResult fixtures from a directory of JSON files, either the bare
+	analyzeResult or a full poll response containing one
+	"""
+	fixtures = []
+	for file in sorted(glob.glob(os.path.join(path, "*.json"))):
+		with open(file) as f:
+			data = json.load(f)
+		fixtures.append(data.get("analyzeResult") or data)
+	return fixtures
+
+
+class FakeAzureDIServer:
+	def __init__(self, fixtures=None, latency=0, processing_time=0.5, retry_after=None,
+			throttle_rate=0, failure_rate=0, operation_failure_rate=0, seed=None):
+		# model (with ".<overload>" for overloaded calls) -> fixtures, "*" for any model
+		if isinstance(fixtures, dict):
+			self.fixtures = {model: list(f) for model, f in fixtures.items()}
+		else:
+			self.fixtures = {"*": list(fixtures or [PASSPORT_RESULT])}
+		self.latency = latency
+		self.processing_time = processing_time
+		self.retry_after = retry_after
+		self.throttle_rate = throttle_rate
+		self.failure_rate = failure_rate
+		self.operation_failure_rate = operation_failure_rate
+		self.requests = []
+		self.operations = {}
+		self._random = random.Random(seed)
+		self._lock = threading.Lock()
+		self._served = 0
+		self._server = None
+		self._thread = None
+
+	@property
+	def endpoint(self):
+		host, port = self._server.server_address[:2]
+		return f"http://{host}:{port}"
+
+	def count(self, method=None, kind=None):
+		return sum(1 for m, k, *_ in self.requests if (method is None or m == method) and (kind is None or k == kind))
+
+	def next_result(self, model):
+		with self._lock:
+			fixtures = self.fixtures.get(model) or self.fixtures.get("*") or [PASSPORT_RESULT]
+			result = fixtures[self._served % len(fixtures)]
+			self._served += 1
+			failed = self._random.random() < self.operation_failure_rate
+		return copy.deepcopy(result), failed
+
+	def roll(self, rate):
+		with self._lock:
+			return self._random.random() < rate
+
+	def start(self):
+		fake = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_POST(self):
+				url = urlparse(self.path)
+				length = int(self.headers.get("Content-Length") or 0)
+				body = self.rfile.read(length)
+				fake.requests.append(("POST", "analyze", url.path, len(body)))
+
+				if not url.path.endswith(":analyze") or "/documentModels/" not in url.path:
+					return self.respond(404, {"error": {"code": "NotFound"}})
+				if fake.roll(fake.throttle_rate):
+					return self.respond(429, {"error": {"code": "429"}}, {"Retry-After": str(1 if fake.retry_after is None else fake.retry_after)})
+				if fake.roll(fake.failure_rate):
+					return self.respond(500, {"error": {"code": "InternalServerError"}})
+
+				model = url.path.rsplit("/", 1)[-1][:-len(":analyze")]
+				fixture_key = model
+				if "_overload=" in url.query:
+					fixture_key += "." + url.query.split("_overload=", 1)[1].split("&", 1)[0]
+				result, failed = fake.next_result(fixture_key)
+				op_id = f"{int(time.time() * 1000)}-{len(fake.operations)}-{fake._random.randrange(1 << 30)}"
+				fake.operations[op_id] = {"ready_at": time.monotonic() + fake.processing_time, "result": result, "failed": failed}
+
+				location = f"{fake.endpoint}/documentintelligence/documentModels/{model}/analyzeResults/{op_id}?api-version=2024-11-30"
+				self.respond(202, None, {"Operation-Location": location, **fake.retry_after_header()})
+
+			def do_GET(self):
+				url = urlparse(self.path)
+				fake.requests.append(("GET", "poll", url.path, 0))
+				op_id = url.path.rsplit("/", 1)[-1]
+				operation = fake.operations.get(op_id)
+				if "/analyzeResults/" not in url.path or not operation:
+					return self.respond(404, {"error": {"code": "NotFound"}})
+				if fake.roll(fake.throttle_rate):
+					return self.respond(429, {"error": {"code": "429"}}, {"Retry-After": str(1 if fake.retry_after is None else fake.retry_after)})
+
+				if time.monotonic() < operation["ready_at"]:
+					return self.respond(200, {"status": "running"}, fake.retry_after_header())
+				if operation["failed"]:
+					return self.respond(200, {"status": "failed", "error": {"code": "InternalServerError"}})
+				self.respond(200, {"status": "succeeded", "analyzeResult": operation["result"]})
+
+			def respond(self, status, body, headers=None):
+				if fake.latency:
+					threading.Event().wait(fake.latency)
+				payload = json.dumps(body).encode() if body is not None else b""
+				self.send_response(status)
+				self.send_header("Content-Type", "application/json")
+				self.send_header("Content-Length", str(len(payload)))
+				for name, value in (headers or {}).items():
+					self.send_header(name, value)
+				self.end_headers()
+				self.wfile.write(payload)
+
+			def log_message(self, *args):
+				pass
+
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def retry_after_header(self):
+		return {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+
+	def stop(self):
+		if self._server:
+			self._server.shutdown()
+			self._server.server_close()
+			self._server = None
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.stop()
@@ -0,0 +1,98 @@
+# Local stand-in for the NHTSA vPIC API, for tests and benchmarks
+#
+#   with FakeVPICServer({"1HGCM82633A004352": {"Make": "HONDA", "Model": "Accord", "ModelYear": "2003"}}) as server:
+#       frappe.conf.vpic_base_url = server.base_url
+#
+# Serves DecodeVinValues/<vin> and DecodeVINValuesBatch/. VINs without a
+# fixture decode as errors (ErrorCode 11). Every request is recorded.
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeVPICServer:
+	def __init__(self, vehicles=None, latency=0):
+		self.vehicles = {vin.upper(): values for vin, values in (vehicles or {}).items()}
+		self.latency = latency
+		self.requests = []
+		self._server = None
+		self._thread = None
+
+	@property
+	def base_url(self):
+		host, port = self._server.server_address[:2]
+		return f"http://{host}:{port}/api/vehicles"
+
+	def decode(self, vin, model_year=None):
+		vin = vin.strip().upper()
+		values = self.vehicles.get(vin)
+		if values is None:
+			return {"VIN": vin, "ErrorCode": "11", "ErrorText": "11 - Incorrect Model Year, decoded data may not be accurate"}
+
+		result = {"VIN": vin, "ErrorCode": "0", "ErrorText": "0 - VIN decoded clean"}
+		result.update(values)
+		if model_year and not result.get("ModelYear"):
+			result["ModelYear"] = str(model_year)
+		return result
+
+	def start(self):
+		fake = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				url = urlparse(self.path)
+				params = parse_qs(url.query)
+				fake.requests.append(("GET", url.path, params))
+				if "/DecodeVinValues/" not in url.path:
+					return self.respond(404, {"Message": "Not found"})
+
+				vin = url.path.rstrip("/").rsplit("/", 1)[-1]
+				model_year = (params.get("modelyear") or [None])[0]
+				self.respond(200, {"Count": 1, "Results": [fake.decode(vin, model_year)]})
+
+			def do_POST(self):
+				url = urlparse(self.path)
+				length = int(self.headers.get("Content-Length") or 0)
+				form = parse_qs(self.rfile.read(length).decode())
+				fake.requests.append(("POST", url.path, form))
+				if "/DecodeVINValuesBatch" not in url.path:
+					return self.respond(404, {"Message": "Not found"})
+
+				results = []
+				for entry in (form.get("data") or [""])[0].split(";"):
+					if entry.strip():
+						vin, _, model_year = entry.partition(",")
+						results.append(fake.decode(vin, model_year or None))
+				self.respond(200, {"Count": len(results), "Results": results})
+
+			def respond(self, status, body):
+				if fake.latency:
+					threading.Event().wait(fake.latency)
+				payload = json.dumps(body).encode()
+				self.send_response(status)
+				self.send_header("Content-Type", "application/json")
+				self.send_header("Content-Length", str(len(payload)))
+				self.end_headers()
+				self.wfile.write(payload)
+
+			def log_message(self, *args):
+				pass
+
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		if self._server:
+			self._server.shutdown()
+			self._server.server_close()
+			self._server = None
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.stop()
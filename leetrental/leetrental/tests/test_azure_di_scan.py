@@ -0,0 +1,113 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import os
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental import azure_di
+from leetrental.leetrental.doctype.id_scan_cache.id_scan_cache import CACHE_DOCTYPE, get_source_hash
+from leetrental.leetrental.tests.fake_azure_di import READ_RESULT, UNRECOGNIZED_ID_RESULT, FakeAzureDIServer
+
+CONF_KEYS = ("azure_di_endpoint", "azure_di_key", "azure_di_local_mrz", "azure_di_speculative")
+
+
+class TestAzureDIScan(FrappeTestCase):
+	def setUp(self):
+		self.conf = {key: frappe.conf.get(key) for key in CONF_KEYS}
+		self.server = FakeAzureDIServer(processing_time=0.2, retry_after=0.1).start()
+		frappe.conf.update({
+			"azure_di_endpoint": self.server.endpoint,
+			"azure_di_key": "test",
+			"azure_di_local_mrz": 0,
+			"azure_di_speculative": 0,
+		})
+
+		name = f"test_azure_di_scan_{frappe.generate_hash(length=6)}.pdf"
+		self.path = frappe.get_site_path("private", "files", name)
+		with open(self.path, "wb") as f:
+			f.write(f"%PDF-1.4\n% {name}\n%%EOF\n".encode())
+		self.file_url = f"/private/files/{name}"
+
+	def tearDown(self):
+		self.server.stop()
+		frappe.conf.update(self.conf)
+		frappe.db.delete(CACHE_DOCTYPE, {"source_hash": get_source_hash(path=self.path)})
+		frappe.db.commit()
+		os.remove(self.path)
+
+	def test_analyze_scan_polls_and_maps(self):
+		result = azure_di.analyze_scan(self.file_url)
+
+		self.assertEqual(result["doc_type"], "passport")
+		self.assertEqual(result["fields"]["passport_number"], "L898902C3")
+		self.assertEqual(result["fields"]["customer_name"], "ANNA MARIA ERIKSSON")
+		self.assertEqual(self.server.count("POST"), 1)
+		self.assertGreaterEqual(self.server.count("GET"), 1)
+
+	def test_repeat_scan_is_served_from_cache(self):
+		azure_di.analyze_scan(self.file_url)
+		requests = len(self.server.requests)
+
+		result = azure_di.analyze_scan(self.file_url)
+		self.assertEqual(result["fields"]["passport_number"], "L898902C3")
+		self.assertEqual(len(self.server.requests), requests)
+
+	def test_throttled_analyze_is_retried(self):
+		self.server.throttle_rate = 1
+		self.server.retry_after = 0
+		with self.assertRaises(Exception):
+			azure_di.analyze_scan(self.file_url)
+		# prebuilt-id and the read fallback, each sent once and retried twice
+		self.assertEqual(self.server.count("POST"), 6)
+
+	def use_read_fallback(self):
+		"""Serve an unrecognized ID and a prebuilt-read payload with an MRZ"""
+		self.server.fixtures = {
+			azure_di.MODEL_ID: [UNRECOGNIZED_ID_RESULT],
+			f"{azure_di.MODEL_READ}.analyzeDocument": [READ_RESULT],
+		}
+
+	def test_read_fallback_maps_read_payload(self):
+		self.use_read_fallback()
+		result = azure_di.analyze_scan(self.file_url)
+
+		self.assertEqual(azure_di.MODEL_READ, "prebuilt-read")
+		self.assertEqual(result["doc_type"], "passport")
+		self.assertEqual(result["fields"]["passport_number"], "L898902C3")
+		self.assertEqual(result["fields"]["customer_name"], "Anna Maria Eriksson")
+		models = [path.rsplit("/", 1)[-1] for method, kind, path, size in self.server.requests if method == "POST"]
+		self.assertEqual(models, ["prebuilt-idDocument:analyze", "prebuilt-read:analyze"])
+
+	def test_speculative_submits_both_models(self):
+		self.use_read_fallback()
+		frappe.conf.azure_di_speculative = 1
+		result = azure_di.analyze_scan(self.file_url)
+
+		self.assertEqual(result["fields"]["passport_number"], "L898902C3")
+		models = {path.rsplit("/", 1)[-1] for method, kind, path, size in self.server.requests if method == "POST"}
+		self.assertEqual(models, {"prebuilt-idDocument:analyze", "prebuilt-read:analyze"})
+
+	def test_speculative_rescan_of_cached_id_sends_nothing(self):
+		azure_di.analyze_scan(self.file_url)
+		requests = len(self.server.requests)
+
+		frappe.conf.azure_di_speculative = 1
+		result = azure_di.analyze_scan(self.file_url)
+		self.assertEqual(result["fields"]["passport_number"], "L898902C3")
+		self.assertEqual(len(self.server.requests), requests)
+
+	def test_scan_job_only_for_its_owner(self):
+		"""Another scan user cannot read a job's extracted data, even with its id"""
+		job_id = frappe.generate_hash(length=12)
+		azure_di._publish_scan_state(job_id, "Administrator", "done", result={"passport_number": "L898902C3"})
+		self.assertEqual(azure_di.get_scan_job(job_id)["result"]["passport_number"], "L898902C3")
+
+		frappe.set_user("Guest")
+		try:
+			with patch("frappe.get_roles", return_value=["Sales User"]):
+				self.assertEqual(azure_di.get_scan_job(job_id), {"job_id": job_id, "status": "unknown"})
+		finally:
+			frappe.set_user("Administrator")
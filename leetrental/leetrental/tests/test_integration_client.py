@@ -0,0 +1,91 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental import integration_client
+
+
+class ScriptedServer:
+	"""Answers with the queued (status, headers) pairs, then 200"""
+
+	def __init__(self, responses):
+		self.responses = list(responses)
+		self.calls = 0
+		self._server = None
+
+	@property
+	def url(self):
+		host, port = self._server.server_address[:2]
+		return f"http://{host}:{port}/ping"
+
+	def __enter__(self):
+		scripted = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				scripted.calls += 1
+				status, headers = scripted.responses.pop(0) if scripted.responses else (200, {})
+				self.send_response(status)
+				for name, value in headers.items():
+					self.send_header(name, value)
+				self.send_header("Content-Length", "0")
+				self.end_headers()
+
+			do_POST = do_GET
+
+			def log_message(self, *args):
+				pass
+
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		threading.Thread(target=self._server.serve_forever, daemon=True).start()
+		return self
+
+	def __exit__(self, *exc):
+		self._server.shutdown()
+		self._server.server_close()
+
+
+class TestIntegrationClient(FrappeTestCase):
+	def setUp(self):
+		integration_client._breakers.clear()
+
+	def tearDown(self):
+		integration_client._breakers.clear()
+
+	def test_parse_retry_after(self):
+		self.assertEqual(integration_client.parse_retry_after("3"), 3)
+		self.assertEqual(integration_client.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+		self.assertIsNone(integration_client.parse_retry_after("soon"))
+		self.assertIsNone(integration_client.parse_retry_after(None))
+
+	def test_retries_honour_retry_after(self):
+		with ScriptedServer([(503, {"Retry-After": "0.2"}), (503, {})]) as server, \
+				patch.object(integration_client.time, "sleep") as sleep:
+			response = integration_client.get(server.url, endpoint="test.ping", timeout=5)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(server.calls, 3)
+		self.assertEqual(sleep.call_args_list[0].args[0], 0.2)
+
+	def test_post_not_retried_on_server_error(self):
+		with ScriptedServer([(500, {})]) as server, patch.object(integration_client.time, "sleep"):
+			response = integration_client.post(server.url, endpoint="test.ping", timeout=5)
+
+		self.assertEqual(response.status_code, 500)
+		self.assertEqual(server.calls, 1)
+
+	def test_circuit_opens_after_repeated_failures(self):
+		failures = [(500, {})] * integration_client.BREAKER_THRESHOLD
+		with ScriptedServer(failures) as server, patch.object(integration_client.time, "sleep"):
+			for _ in failures:
+				integration_client.get(server.url, endpoint="test.ping", timeout=5, retries=0)
+
+			with self.assertRaises(integration_client.CircuitOpenError):
+				integration_client.get(server.url, endpoint="test.ping", timeout=5)
+
+		self.assertEqual(server.calls, integration_client.BREAKER_THRESHOLD)
@@ -0,0 +1,34 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.mrz import check_digit, parse_mrz
+
+# ICAO 9303 specimen documents
+TD3 = "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\nL898902C36UTO7408122F1204159ZE184226B<<<<<10"
+TD1 = "I<UTOD231458907<<<<<<<<<<<<<<<\n7408122F1204159UTO<<<<<<<<<<<6\nERIKSSON<<ANNA<MARIA<<<<<<<<<<"
+
+
+class TestMRZ(FrappeTestCase):
+	def test_check_digit(self):
+		self.assertEqual(check_digit("L898902C3"), "6")
+		self.assertEqual(check_digit("740812"), "2")
+
+	def test_passport(self):
+		mapped = parse_mrz("REPUBLIC OF UTOPIA\nPASSPORT\n" + TD3.replace("<<<<<<<<<<", "<<<<< <<<<<"))
+		self.assertEqual(mapped["doc_type"], "passport")
+		self.assertEqual(mapped["customer_name"], "Anna Maria Eriksson")
+		self.assertEqual(mapped["passport_number"], "L898902C3")
+		self.assertEqual(mapped["date_of_birth"], "1974-08-12")
+		self.assertEqual(mapped["passport_expiry"], "2012-04-15")
+
+	def test_id_card(self):
+		mapped = parse_mrz(TD1)
+		self.assertEqual(mapped["doc_type"], "national_id")
+		self.assertEqual(mapped["id_number"], "D23145890")
+		self.assertEqual(mapped["id_expiry"], "2012-04-15")
+
+	def test_bad_check_digit(self):
+		self.assertIsNone(parse_mrz(TD1.replace("D23145890", "D23145891")))
+		self.assertIsNone(parse_mrz("Name: Anna Eriksson"))
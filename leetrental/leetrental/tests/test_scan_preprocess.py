@@ -0,0 +1,45 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import os
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from PIL import Image
+
+from leetrental.leetrental.scan_preprocess import MAX_SCAN_DIMENSION, PreparedScan
+
+
+class TestScanPreprocess(FrappeTestCase):
+	def setUp(self):
+		self.dir = frappe.get_site_path("private", "files")
+
+	def get_path(self, extension):
+		"""A unique file under private/files, removed after the test"""
+		path = os.path.join(self.dir, f"test_scan_preprocess_{frappe.generate_hash(length=6)}{extension}")
+		self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+		return path
+
+	def test_large_photo_is_downscaled_and_stripped(self):
+		path = self.get_path(".jpg")
+		exif = Image.Exif()
+		exif[0x0112] = 6  # rotated 90 degrees, as phones save portrait shots
+		Image.new("RGB", (4000, 3000), "white").save(path, "JPEG", exif=exif)
+
+		with PreparedScan(path) as scan:
+			self.assertNotEqual(scan.path, path)
+			with Image.open(scan.path) as image:
+				self.assertEqual(image.size, (MAX_SCAN_DIMENSION * 3 // 4, MAX_SCAN_DIMENSION))
+				self.assertFalse(image.getexif())
+			copy = scan.path
+
+		self.assertFalse(os.path.exists(copy))
+
+	def test_pdf_passes_through(self):
+		path = self.get_path(".pdf")
+		with open(path, "wb") as f:
+			f.write(b"%PDF-1.4\n%%EOF\n")
+
+		with PreparedScan(path) as scan:
+			self.assertEqual(scan.path, path)
+		self.assertTrue(os.path.exists(path))
@@ -0,0 +1,44 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.api.vehicle_schema import get_vehicle_schema
+
+PROBE_FIELD = "knbn_schema_probe"
+
+
+class TestVehicleSchema(FrappeTestCase):
+	def tearDown(self):
+		"""Custom Field changes alter the table and commit, so clean up explicitly"""
+		name = frappe.db.get_value("Custom Field", {"dt": "Vehicles", "fieldname": PROBE_FIELD})
+		if name:
+			frappe.delete_doc("Custom Field", name, force=True)
+		frappe.db.commit()
+
+	def test_plan_is_shared(self):
+		"""Repeated calls reuse the compiled plan"""
+		self.assertIs(get_vehicle_schema(), get_vehicle_schema())
+
+	def test_custom_field_invalidates_plan(self):
+		"""Adding or removing a Vehicles Custom Field rebuilds the plan"""
+		before = get_vehicle_schema()
+		self.assertNotIn(PROBE_FIELD, before.available_fields)
+
+		field = frappe.get_doc({
+			"doctype": "Custom Field",
+			"dt": "Vehicles",
+			"fieldname": PROBE_FIELD,
+			"label": "Schema Probe",
+			"fieldtype": "Data"
+		}).insert()
+
+		added = get_vehicle_schema()
+		self.assertNotEqual(added.version, before.version)
+		self.assertIn(PROBE_FIELD, added.available_fields)
+
+		field.delete()
+		removed = get_vehicle_schema()
+		self.assertNotEqual(removed.version, added.version)
+		self.assertNotIn(PROBE_FIELD, removed.available_fields)
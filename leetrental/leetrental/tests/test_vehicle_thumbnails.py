@@ -0,0 +1,78 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import io
+import os
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.api import vehicle_thumbnails, vehicles_kanban
+from leetrental.leetrental.api.vehicle_schema import get_vehicle_schema
+from leetrental.leetrental.api.vehicle_thumbnails import THUMBNAIL_CACHE_KEY, THUMBNAIL_SIZE
+
+EXTERNAL_URL = "https://example.com/knbn-photo.jpg"
+
+
+class TestVehicleThumbnails(FrappeTestCase):
+	def setUp(self):
+		from PIL import Image
+
+		output = io.BytesIO()
+		Image.new("RGB", (1600, 1200), "navy").save(output, "PNG")
+		self.file = frappe.get_doc({
+			"doctype": "File",
+			"file_name": f"knbn_photo_{frappe.generate_hash(length=6)}.png",
+			"content": output.getvalue(),
+			"is_private": 0
+		}).insert()
+
+	def tearDown(self):
+		thumbnail_url = frappe.db.get_value("File", self.file.name, "thumbnail_url")
+		if thumbnail_url and os.path.exists(vehicle_thumbnails.get_local_path(thumbnail_url)):
+			os.remove(vehicle_thumbnails.get_local_path(thumbnail_url))
+		frappe.cache().hdel(THUMBNAIL_CACHE_KEY, self.file.file_url)
+		frappe.cache().hdel(THUMBNAIL_CACHE_KEY, EXTERNAL_URL)
+		self.file.delete()
+		frappe.db.rollback()
+
+	def test_generate_and_attach(self):
+		"""A generated thumbnail is small, recorded on the File and attached to cards"""
+		vehicle_thumbnails.generate_thumbnail(self.file.name)
+
+		thumbnail_url = frappe.db.get_value("File", self.file.name, "thumbnail_url")
+		self.assertTrue(thumbnail_url)
+
+		from PIL import Image
+		with Image.open(vehicle_thumbnails.get_local_path(thumbnail_url)) as image:
+			self.assertLessEqual(image.width, THUMBNAIL_SIZE[0])
+			self.assertLessEqual(image.height, THUMBNAIL_SIZE[1])
+
+		vehicles = vehicle_thumbnails.attach_thumbnails([
+			{"name": "KNBN-1", "image": self.file.file_url},
+			{"name": "KNBN-2", "image": EXTERNAL_URL},
+			{"name": "KNBN-3", "image": None},
+		])
+		self.assertEqual([v["thumbnail"] for v in vehicles], [thumbnail_url, None, None])
+		# Unknown URLs are remembered as having no thumbnail
+		self.assertEqual(frappe.cache().hget(THUMBNAIL_CACHE_KEY, EXTERNAL_URL), "")
+
+	def test_search_rows_carry_thumbnails(self):
+		"""Search results get the thumbnail like Kanban cards do"""
+		image_field = get_vehicle_schema().image_field
+		if not image_field:
+			self.skipTest("Vehicles has no image field")
+
+		vehicle_thumbnails.generate_thumbnail(self.file.name)
+		frappe.get_doc({
+			"doctype": "Vehicles",
+			"license_plate": "THMB-101",
+			"chassis_number": "THMBVIN00000101",
+			"custom_engine_number": "THMB-ENG-1",
+			"model_year": 2023,
+			image_field: self.file.file_url
+		}).insert()
+
+		rows = vehicles_kanban.search_vehicles("THMB-101")
+		self.assertEqual(rows[0]["image"], self.file.file_url)
+		self.assertEqual(rows[0]["thumbnail"], frappe.db.get_value("File", self.file.name, "thumbnail_url"))
@@ -0,0 +1,219 @@
+# Copyright (c) 2024, LeetRental and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from leetrental.leetrental.api import vehicles_kanban
+from leetrental.leetrental.api.vehicle_schema import clear_vehicle_schema, get_vehicle_schema
+
+PLATES = ("KNBN-101", "KNBN-102", "KNBN-103", "KNBN-104", "KNBN-105")
+# Only the test vehicles, whatever else the site holds
+PLATE_FILTER = [["license_plate", "like", "KNBN-%"]]
+
+
+class TestVehiclesKanban(FrappeTestCase):
+	def setUp(self):
+		"""Set up test vehicles, all Available and modified at the same instant"""
+		self.status_field = get_vehicle_schema().status_field or "workflow_state"
+		self.vehicles = []
+		for i, plate in enumerate(PLATES):
+			if frappe.db.exists("Vehicles", plate):
+				frappe.delete_doc("Vehicles", plate, force=True)
+			self.vehicles.append(frappe.get_doc({
+				"doctype": "Vehicles",
+				"license_plate": plate,
+				"chassis_number": f"KNBNVIN0000010{i}",
+				"custom_engine_number": f"KNBN-ENG-{i}",
+				"model_year": 2023
+			}).insert())
+
+		self.modified = "2024-01-01 10:00:00.000000"
+		frappe.db.sql(f"""
+			UPDATE `tabVehicles` SET `{self.status_field}` = 'Available', `modified` = %s
+			WHERE `name` IN %s
+		""", (self.modified, PLATES))
+
+	def tearDown(self):
+		"""Bulk moves commit, so clean up explicitly"""
+		frappe.db.rollback()
+		for plate in PLATES:
+			if frappe.db.exists("Vehicles", plate):
+				frappe.delete_doc("Vehicles", plate, force=True)
+		frappe.db.delete("Version", {"ref_doctype": "Vehicles", "docname": ("in", PLATES)})
+		frappe.db.delete("Deleted Document", {"deleted_doctype": "Vehicles", "deleted_name": ("in", PLATES)})
+		frappe.db.commit()
+
+	def test_cursor_stable_with_equal_sort_keys(self):
+		"""Pages never repeat or skip cards that share a modified timestamp"""
+		seen, cursor = [], None
+		while True:
+			page = vehicles_kanban.get_kanban_column("Available", cursor=cursor, filters=PLATE_FILTER, page_length=2)
+			seen += [v.name for v in page["vehicles"]]
+			cursor = page["cursor"]
+			if not page["has_more"]:
+				break
+
+		self.assertEqual(seen, sorted(PLATES, reverse=True))
+
+	def test_filter_operators(self):
+		"""List-style filters work like they do with frappe.get_all"""
+		page = vehicles_kanban.get_kanban_column(
+			"Available",
+			filters=PLATE_FILTER + [["license_plate", "in", ["KNBN-101", "KNBN-103"]]]
+		)
+		self.assertEqual(sorted(v.name for v in page["vehicles"]), ["KNBN-101", "KNBN-103"])
+
+		self.assertRaises(
+			frappe.ValidationError,
+			vehicles_kanban.get_kanban_column, "Available", filters=[["license_plate", "between", ["A", "B"]]]
+		)
+
+	def test_column_requires_read_permission(self):
+		"""Users without Vehicles read permission get no cards"""
+		frappe.set_user("Guest")
+		try:
+			self.assertRaises(frappe.PermissionError, vehicles_kanban.get_kanban_column, "Available")
+		finally:
+			frappe.set_user("Administrator")
+
+	def test_changes_after_since(self):
+		"""The delta feed returns rows changed after the watermark, late commits included, once"""
+		watermark = vehicles_kanban.get_kanban_changes()["watermark"]
+		since = vehicles_kanban.decode_changes_watermark(watermark)[0]
+
+		now = frappe.utils.now()
+		late = str(frappe.utils.add_to_date(since, seconds=-(vehicles_kanban.KANBAN_CHANGES_OVERLAP // 2)))
+		frappe.db.sql(f"UPDATE `tabVehicles` SET `{self.status_field}` = 'Reserved', `modified` = %s WHERE `name` = 'KNBN-101'", now)
+		frappe.db.sql("UPDATE `tabVehicles` SET `modified` = %s WHERE `name` = 'KNBN-102'", late)
+
+		changes = vehicles_kanban.get_kanban_changes(since=watermark)
+		changed = {v.name: v for v in changes["vehicles"]}
+		self.assertEqual(changed["KNBN-101"]["new_state"], "Reserved")
+		self.assertIn("KNBN-102", changed)
+		self.assertNotIn("KNBN-103", changed)
+
+		again = vehicles_kanban.get_kanban_changes(since=changes["watermark"])
+		self.assertFalse({"KNBN-101", "KNBN-102"} & {v.name for v in again["vehicles"]})
+
+	def test_deletions_are_sent_once(self):
+		"""Deletions follow their own position, an idle fleet does not resend them"""
+		watermark = vehicles_kanban.get_kanban_changes()["watermark"]
+		frappe.delete_doc("Vehicles", "KNBN-101", force=True)
+
+		changes = vehicles_kanban.get_kanban_changes(since=watermark)
+		self.assertEqual(changes["deleted"], ["KNBN-101"])
+
+		again = vehicles_kanban.get_kanban_changes(since=changes["watermark"])
+		self.assertEqual(again["deleted"], [])
+
+	def test_bulk_move_partial_failure(self):
+		"""A vehicle in another column fails alone; blank statuses move out of Available with a Version"""
+		frappe.db.sql(f"UPDATE `tabVehicles` SET `{self.status_field}` = 'Reserved' WHERE `name` = 'KNBN-102'")
+		frappe.db.sql(f"UPDATE `tabVehicles` SET `{self.status_field}` = NULL WHERE `name` = 'KNBN-103'")
+
+		response = vehicles_kanban.complete_vehicle_moves_bulk([
+			{"vehicle_name": plate, "from_state": "Available", "to_state": "Out for Delivery"}
+			for plate in PLATES[:3]
+		])
+		results = {result["vehicle"]: result for result in response["results"]}
+
+		self.assertTrue(results["KNBN-101"]["success"])
+		self.assertTrue(results["KNBN-103"]["success"])
+		self.assertFalse(results["KNBN-102"]["success"])
+		self.assertIn("mismatch", results["KNBN-102"]["message"])
+		self.assertEqual(frappe.db.get_value("Vehicles", "KNBN-102", self.status_field), "Reserved")
+		self.assertEqual(frappe.db.get_value("Vehicles", "KNBN-103", self.status_field), "Out for Delivery")
+
+		versions = frappe.get_all("Version", filters={"ref_doctype": "Vehicles", "docname": ("in", PLATES)}, pluck="docname")
+		self.assertEqual(sorted(versions), ["KNBN-101", "KNBN-103"])
+
+	def test_bulk_move_rejects_shared_form(self):
+		"""One form filled in for several vehicles is refused"""
+		form_data = {"driver": "KNBN Customer", "start_time": "2024-01-02 09:00:00", "end_time": "2024-01-03 09:00:00"}
+		response = vehicles_kanban.complete_vehicle_moves_bulk([
+			{"vehicle_name": plate, "from_state": "Available", "to_state": "Reserved", "form_data": form_data}
+			for plate in PLATES[:2]
+		])
+
+		self.assertFalse(any(result["success"] for result in response["results"]))
+		self.assertEqual(frappe.db.get_value("Vehicles", "KNBN-101", self.status_field), "Available")
+
+	def test_columnar_round_trip(self):
+		"""format=columnar expands back to the row format, as leetrental.columnar.decode does"""
+		rows = vehicles_kanban.build_kanban_data(PLATE_FILTER, 2, None)
+		packed = vehicles_kanban.build_kanban_data(PLATE_FILTER, 2, vehicles_kanban.COLUMNAR_FORMAT)
+
+		fields, dictionaries = packed["fields"], packed["dictionaries"]
+		for state, column in packed["columns"].items():
+			decoded = [
+				{
+					field: dictionaries[field][value] if field in dictionaries and value is not None else value
+					for field, value in zip(fields, row)
+				}
+				for row in column["vehicles"]
+			]
+			self.assertEqual(decoded, rows[state]["vehicles"])
+			self.assertEqual(column["cursor"], rows[state]["cursor"])
+
+	def test_normalized_cards(self):
+		"""Every card carries the default fields and a workflow_state"""
+		vehicles = vehicles_kanban.get_kanban_column("Available", filters=PLATE_FILTER)["vehicles"]
+		for vehicle in vehicles:
+			self.assertTrue(set(vehicles_kanban.KANBAN_CARD_DEFAULTS) <= set(vehicle))
+			self.assertIn("image", vehicle)
+			self.assertEqual(vehicle["workflow_state"], "Available")
+
+	def test_transition_graph_follows_schema(self):
+		"""The compiled graph is rebuilt when the schema plan changes and never offers a no-op move"""
+		graph = vehicles_kanban.get_transition_graph()
+		self.assertEqual(graph.schema_version, get_vehicle_schema().version)
+
+		clear_vehicle_schema()
+		self.assertEqual(vehicles_kanban.get_transition_graph().schema_version, get_vehicle_schema().version)
+
+		matrix = vehicles_kanban.get_transition_matrix()
+		for state, targets in matrix["allowed"].items():
+			self.assertNotIn(state, targets)
+
+	def test_counts(self):
+		"""Column counts match the cards and follow status changes"""
+		counts = vehicles_kanban.get_kanban_counts(filters=PLATE_FILTER)
+		self.assertEqual(counts["columns"]["Available"]["count"], len(PLATES))
+		self.assertEqual(counts["total"], len(PLATES))
+
+		frappe.db.sql(f"UPDATE `tabVehicles` SET `{self.status_field}` = NULL WHERE `name` = 'KNBN-101'")
+		vehicles_kanban.bump_fleet_version()
+		counts = vehicles_kanban.get_kanban_counts(filters=PLATE_FILTER + [["license_plate", "!=", "KNBN-102"]])
+		# Blank statuses are counted under Available
+		self.assertEqual(counts["columns"]["Available"]["count"], len(PLATES) - 1)
+
+	def test_conflicting_move_reports_mismatch(self):
+		"""A move from a column the vehicle already left is refused, not applied over the newer status"""
+		frappe.db.sql(f"UPDATE `tabVehicles` SET `{self.status_field}` = 'Reserved' WHERE `name` = 'KNBN-101'")
+
+		self.assertIsNone(vehicles_kanban.transition_vehicle_status("KNBN-101", "Available", "Out for Delivery"))
+
+		response = vehicles_kanban.complete_vehicle_move("KNBN-101", "Available", "Out for Delivery")
+		self.assertFalse(response["success"])
+		self.assertIn("mismatch", response["message"])
+		self.assertEqual(frappe.db.get_value("Vehicles", "KNBN-101", self.status_field), "Reserved")
+
+		response = vehicles_kanban.complete_vehicle_move("KNBN-102", "Available", "Out for Delivery")
+		self.assertTrue(response["success"])
+		self.assertEqual(frappe.db.get_value("Vehicles", "KNBN-102", self.status_field), "Out for Delivery")
+
+	def test_matching_etag_is_unchanged(self):
+		"""A matching ETag answers without data, any Vehicles write changes it"""
+		first = vehicles_kanban.get_kanban_data(filters=PLATE_FILTER, page_length=2, etag="")
+		self.assertFalse(first["unchanged"])
+		self.assertIn("Available", first["data"])
+
+		again = vehicles_kanban.get_kanban_data(filters=PLATE_FILTER, page_length=2, etag=f'W/"{first["etag"]}"')
+		self.assertTrue(again["unchanged"])
+		self.assertNotIn("data", again)
+
+		frappe.get_doc("Vehicles", "KNBN-101").save()
+		changed = vehicles_kanban.get_kanban_data(filters=PLATE_FILTER, page_length=2, etag=first["etag"])
+		self.assertFalse(changed["unchanged"])
+		self.assertNotEqual(changed["etag"], first["etag"])
@@ -0,0 +1,41 @@
+frappe.provide('leetrental.columnar');
+
+// Expand format=columnar responses back into plain objects.
+//   {format, fields, dictionaries, rows}    -> [vehicle, ...]
+//   {format, fields, dictionaries, columns} -> {state: {..., vehicles: [vehicle, ...]}}
+// Anything else is returned unchanged.
+(function () {
+  function expand_rows(rows, fields, dictionaries) {
+    const lookups = fields.map(field => dictionaries[field] || null);
+    return rows.map(row => {
+      const doc = {};
+      for (let i = 0; i < fields.length; i++) {
+        const value = row[i];
+        doc[fields[i]] = lookups[i] && value !== null ? lookups[i][value] : value;
+      }
+      return doc;
+    });
+  }
+
+  leetrental.columnar.decode = function (message) {
+    if (!message || message.format !== 'columnar') {
+      return message;
+    }
+
+    const fields = message.fields || [];
+    const dictionaries = message.dictionaries || {};
+
+    if (message.columns) {
+      const columns = {};
+      Object.keys(message.columns).forEach(state => {
+        const column = message.columns[state];
+        columns[state] = Object.assign({}, column, {
+          vehicles: expand_rows(column.vehicles || [], fields, dictionaries)
+        });
+      });
+      return columns;
+    }
+
+    return expand_rows(message.rows || [], fields, dictionaries);
+  };
+})();
@@ -25,6 +25,7 @@
       choice.innerHTML = `
         <div class="flex gap-3" style="margin:6px 0;">
           <button class="btn btn-primary" id="auto-reg">${__("Auto registration")}</button>
+          <button class="btn btn-default" id="batch-reg">${__("Batch registration")}</button>
           <button class="btn btn-default" id="manual-reg">${__("Manual registration")}</button>
         </div>
       `;
@@ -39,12 +40,175 @@
           <div class="text-muted" style="margin-top:6px;">
             ${__("Accepted: JPG, PNG, PDF")}
           </div>
+          <div id="scan-status" class="text-muted" style="margin-top:6px;"></div>
+        </div>
+        <div id="batch-pane" style="display:none; margin-top:10px;">
+          <button class="btn btn-default" id="choose-files">${__("Upload documents")}</button>
+          <table class="table table-condensed" style="margin-top:8px;"><tbody id="batch-files"></tbody></table>
         </div>
       `;
       const autoPane = autoWrap.querySelector("#auto-pane");
+      const statusEl = autoWrap.querySelector("#scan-status");
+      const setStatus = (text) => { statusEl.textContent = text || ""; };
+
+      // The scan runs in a background job, its progress arrives over realtime
+      const stageLabels = {
+        queued: __("Queued…"),
+        analyzing: __("Analyzing document…"),
+        reading: __("Reading text…"),
+        creating: __("Creating customer…")
+      };
+      let activeJob = null;
+
+      const scanFailed = (message) => {
+        activeJob = null;
+        setStatus("");
+        d.get_primary_btn().prop("disabled", false);
+        frappe.msgprint(__("Failed: {0}", [message]));
+      };
+
+      const scanDone = (result) => {
+        activeJob = null;
+        const name = result && result.name;
+        if (!name) return scanFailed(__("Customer was not created."));
+        d.hide();
+        if (result.updated) {
+          frappe.show_alert({ message: __("Matched existing customer {0}", [name]), indicator: "blue" });
+        }
+        if (typeof after_insert === "function") after_insert(name);
+        frappe.set_route("Form", "Customer", name);
+      };
+
+      const onScanState = (data) => {
+        if (!data || data.job_id !== activeJob) return;
+        if (data.status === "done") return scanDone(data.result);
+        if (data.status === "failed") return scanFailed(data.error);
+        if (stageLabels[data.status]) setStatus(stageLabels[data.status]);
+      };
+
+      const watchScan = (job_id) => {
+        activeJob = job_id;
+        // Catch up in case the job finished before we started listening
+        frappe.call({
+          method: "leetrental.leetrental.azure_di.get_scan_job",
+          args: { job_id },
+          callback: (r) => onScanState(r.message)
+        });
+      };
+
+      // Batch: one job for many documents, each row follows its file
+      const batchPane = autoWrap.querySelector("#batch-pane");
+      const batchRows = {};
+      let activeBatch = null;
+
+      const batchLabels = {
+        analyzed: __("Analyzed"),
+        failed: __("Failed"),
+        created: __("Created"),
+        updated: __("Updated existing customer"),
+        duplicate: __("Same document as another file")
+      };
+
+      const addBatchFile = (file_doc) => {
+        if (batchRows[file_doc.file_url]) return;
+        const row = document.createElement("tr");
+        row.innerHTML = `<td></td><td class="text-muted">${__("Waiting")}</td>`;
+        row.cells[0].textContent = file_doc.file_name;
+        batchPane.querySelector("#batch-files").appendChild(row);
+        batchRows[file_doc.file_url] = row;
+      };
+
+      const onBatchFile = (data) => {
+        if (!data || data.job_id !== activeBatch) return;
+        const row = batchRows[data.file_url];
+        if (!row) return;
+        const cell = row.cells[1];
+        const name = data.result && data.result.name;
+        if (name) {
+          cell.innerHTML = `<a href="/app/customer/${encodeURIComponent(name)}"></a>`;
+          cell.firstChild.textContent = `${batchLabels[data.status]}: ${name}`;
+        } else {
+          cell.textContent = batchLabels[data.status] + (data.error ? `: ${data.error}` : "");
+        }
+      };
+
+      const onBatchState = (data) => {
+        if (!data || data.job_id !== activeBatch) return;
+        if (data.status === "done") {
+          // Replay final states, in case per-file events were missed
+          (data.result.files || []).filter(Boolean)
+            .forEach(file => onBatchFile(Object.assign({ job_id: data.job_id }, file)));
+          activeBatch = null;
+          d.get_primary_btn().prop("disabled", false);
+          frappe.show_alert({
+            message: __("{0} customers created, {1} updated, {2} failed",
+              [data.result.created, data.result.updated || 0, data.result.failed]),
+            indicator: data.result.failed ? "orange" : "green"
+          });
+        } else if (data.status === "failed") {
+          activeBatch = null;
+          d.get_primary_btn().prop("disabled", false);
+          frappe.msgprint(__("Failed: {0}", [data.error]));
+        }
+      };
+
+      const startBatch = () => {
+        autoPane.style.display = "none";
+        batchPane.style.display = "";
+        d.set_primary_action(__("Analyze & Create All"), async () => {
+          const file_urls = Object.keys(batchRows);
+          if (!file_urls.length) {
+            frappe.msgprint(__("Please upload the documents."));
+            return;
+          }
+          d.get_primary_btn().prop("disabled", true);
+          try {
+            const r = await frappe.call({
+              method: "leetrental.leetrental.azure_di.create_customers_from_scans",
+              args: {
+                file_urls,
+                use_urlsource: d.get_value("use_urlsource") ? 1 : 0,
+                set_docname_to_name: 1,
+                debug: d.get_value("debug") ? 1 : 0
+              }
+            });
+            activeBatch = r.message && r.message.job_id;
+            frappe.call({
+              method: "leetrental.leetrental.azure_di.get_scan_job",
+              args: { job_id: activeBatch },
+              callback: (res) => onBatchState(res.message)
+            });
+          } catch (e) {
+            d.get_primary_btn().prop("disabled", false);
+            frappe.msgprint(__("Failed: {0}", [e.message || e]));
+          }
+        });
+        d.get_primary_btn().text(__("Analyze & Create All"));
+      };
+
+      batchPane.querySelector("#choose-files").addEventListener("click", () => {
+        new frappe.ui.FileUploader({
+          allow_multiple: true,
+          as_dataurl: false,
+          restrictions: { allowed_file_types: [".jpg",".jpeg",".png",".pdf"] },
+          on_success: addBatchFile
+        });
+      });
+
+      frappe.realtime.on("id_scan_progress", onScanState);
+      frappe.realtime.on("id_scan_progress", onBatchState);
+      frappe.realtime.on("id_scan_batch_progress", onBatchFile);
+      d.onhide = () => {
+        activeJob = null;
+        activeBatch = null;
+        frappe.realtime.off("id_scan_progress", onScanState);
+        frappe.realtime.off("id_scan_progress", onBatchState);
+        frappe.realtime.off("id_scan_batch_progress", onBatchFile);
+      };
 
       // Actions
       const startAuto = () => {
+        batchPane.style.display = "none";
         autoPane.style.display = "";
         // swap primary to Analyze & Create
         d.set_primary_action(__("Analyze & Create"), async () => {
@@ -53,26 +217,24 @@
             frappe.msgprint(__("Please upload a document.")); 
             return;
           }
+          d.get_primary_btn().prop("disabled", true);
+          setStatus(__("Queued…"));
           try {
-            frappe.dom.freeze(__("Analyzing…"));
             const r = await frappe.call({
               method: "leetrental.leetrental.azure_di.create_customer_from_scan",
               args: {
                 file_url: v.file_url,
                 use_urlsource: v.use_urlsource ? 1 : 0,
                 set_docname_to_name: 1,
-                debug: v.debug ? 1 : 0
+                debug: v.debug ? 1 : 0,
+                run_async: 1
               }
             });
-            frappe.dom.unfreeze();
-            const name = r.message && r.message.name;
-            if (!name) throw new Error("Customer was not created.");
-            d.hide();
-            if (typeof after_insert === "function") after_insert(name);
-            frappe.set_route("Form", "Customer", name);
+            const job_id = r.message && r.message.job_id;
+            if (!job_id) throw new Error("Scan was not queued.");
+            watchScan(job_id);
           } catch (e) {
-            frappe.dom.unfreeze();
-            frappe.msgprint(__("Failed: {0}", [e.message || e]));
+            scanFailed(e.message || e);
           }
         });
         d.get_primary_btn().text(__("Analyze & Create"));
@@ -85,6 +247,7 @@
 
       // Wire buttons
       choice.querySelector("#auto-reg").addEventListener("click", startAuto);
+      choice.querySelector("#batch-reg").addEventListener("click", startBatch);
       choice.querySelector("#manual-reg").addEventListener("click", goManual);
 
       // File uploader for Auto